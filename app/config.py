@@ -14,12 +14,40 @@ else:
 
 class Settings(BaseSettings):
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
     HOST: str = os.getenv("DB_HOST")
     PORT: int = os.getenv("PORT")
     DEBUG: bool = True
     AVTODOR_USERNAME: str = os.getenv("AVTODOR_USERNAME")
     AVTODOR_PASSWORD: str = os.getenv("AVTODOR_PASSWORD")
     LOGIN_URL: str = os.getenv("LOGIN_URL")
+    CABINET_URL: str = "https://lk.avtodor-tr.ru"
+    RAW_RETENTION_DAYS: int = 90
+    JOURNEY_GAP_MINUTES: int = 90
+    ANOMALY_DUPLICATE_MINUTES: int = 10
+    ANOMALY_MAX_SPEED_KMH: int = 180
+    TARIFF_TOLERANCE: float = 1.0
+    TARIFF_REFERENCE_MIN_SAMPLES: int = 5
+    TARIFF_REFERENCE_TOLERANCE_PCT: float = 5.0
+    TARIFF_REFERENCE_MONTHS: int = 3
+    ARCHIVE_DIR: str = "data/archive"
+    ARCHIVE_AFTER_MONTHS: int = 12
+    ARCHIVE_ON_STARTUP: bool = False
+    COLUMNAR_SNAPSHOT: bool = False
+    COLUMNAR_MEMORY_MB: int = 512
+    CHANGE_LOG_RETENTION_DAYS: int = 7
+    BROWSER_COMMAND_TIMEOUT: int = 120
+    BROWSER_SCRAPE_TIMEOUT: int = 900
+    SCRAPE_DAY_RETRIES: int = 2
+    SCRAPE_CAPTURE_DIR: str = ""
+    SCRAPE_SNAPSHOT_PARSER: bool = False
+    SCRAPE_SNAPSHOT_CHECK_ROWS: int = 20
+    SCRAPE_RESUME_HOURS: int = 24
+    SCRAPE_RESUME_ON_STARTUP: bool = True
+    BROWSER_PROFILE: str = "lean"
+    BROWSER_MAX_NAVIGATIONS: int = 200
+    BROWSER_MAX_RSS_MB: int = 1024
+    BROWSER_IDLE_MINUTES: int = 15
 
     model_config = ConfigDict(
         env_file=ENV_PATH if ENV_PATH.exists() else None,
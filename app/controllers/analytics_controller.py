@@ -0,0 +1,39 @@
+from datetime import date
+from fastapi import APIRouter, Query, HTTPException
+from ..services.analytics_service import AnalyticsService
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+@router.get("/series")
+async def get_series(
+        bucket: str = Query(default="day", description="day | week | month"),
+        group_by: str | None = Query(default=None, description="transponder | pvp"),
+        date_from: date | None = Query(default=None),
+        date_to: date | None = Query(default=None),
+        transponder: str | None = Query(default=None),
+        pvp: str | None = Query(default=None)
+):
+    try:
+        return await AnalyticsService.series(bucket, group_by, date_from, date_to, transponder, pvp)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/top")
+async def get_top(
+        by: str = Query(default="transponder", description="transponder | pvp"),
+        metric: str = Query(default="paid", description="paid | trips | base_tariff"),
+        limit: int = Query(default=10, ge=1, le=100),
+        date_from: date | None = Query(default=None),
+        date_to: date | None = Query(default=None),
+        transponder: str | None = Query(default=None),
+        pvp: str | None = Query(default=None)
+):
+    try:
+        return await AnalyticsService.top(by, metric, limit, date_from, date_to, transponder, pvp)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/rebuild")
+async def rebuild_aggregates(full: bool = False):
+    """Пересчитывает дневные корзины по новым транзакциям (full=true - все)"""
+    return await AnalyticsService.update(full=full)
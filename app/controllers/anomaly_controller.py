@@ -0,0 +1,21 @@
+from datetime import datetime
+from fastapi import APIRouter, Query
+from ..services.anomaly_scanner import AnomalyScanner
+
+router = APIRouter(prefix="/anomalies", tags=["Anomalies"])
+
+@router.get("/info")
+async def get_anomalies(
+        page: int = 1,
+        page_size: int = 50,
+        kind: str | None = Query(default=None, description="duplicate | impossible_speed"),
+        transponder: str = Query(default=""),
+        date_from: datetime | None = Query(default=None),
+        date_to: datetime | None = Query(default=None)
+):
+    return await AnomalyScanner.get_anomalies(kind, date_from, date_to, transponder, page, page_size)
+
+@router.post("/scan")
+async def scan_anomalies(full: bool = False):
+    """Проверяет новые транзакции (full=true - всю историю)"""
+    return await AnomalyScanner.update(full=full)
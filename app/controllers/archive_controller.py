@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Query, HTTPException
+from ..services.archive_store import archive_store
+
+router = APIRouter(prefix="/archive", tags=["Archive"])
+
+@router.get("/info")
+async def get_archive():
+    return {
+        "available": archive_store.available(),
+        "months": archive_store.months() if archive_store.available() else [],
+        "archived_until": archive_store.archived_until() if archive_store.available() else None,
+    }
+
+@router.post("/run")
+async def run_archive(
+        months: int | None = Query(default=None, ge=1, description="Архивировать месяцы старше N месяцев"),
+        vacuum: bool = False
+):
+    """Переносит закрытые месяцы в Parquet (vacuum=true - сжать файл БД после переноса)"""
+    try:
+        return await archive_store.archive(months, vacuum)
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
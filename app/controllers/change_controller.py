@@ -0,0 +1,53 @@
+import orjson
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from ..services.change_feed import ChangeFeed
+from ..services.data_version import data_version
+
+router = APIRouter(prefix="/changes", tags=["Changes"])
+
+# Пауза между комментариями SSE, чтобы прокси не закрывали простаивающее соединение
+KEEPALIVE_SECONDS = 15
+
+@router.get("")
+async def get_changes(
+        since: int | None = Query(default=None, ge=0, description="Последний полученный номер изменения"),
+        limit: int = Query(default=1000, ge=1, le=10000),
+        wait: float = Query(default=0, ge=0, le=60, description="Long-poll: ждать изменений до N секунд"),
+):
+    """Вставленные и удалённые транзакции и нарушения после since; без since - только текущий номер"""
+    if since is None:
+        return {"seq": await ChangeFeed.latest()}
+    if wait:
+        result = await ChangeFeed.wait_changes(since, limit, wait)
+    else:
+        result = await ChangeFeed.changes(since, limit)
+    return ORJSONResponse(result)
+
+@router.get("/stream")
+async def stream_changes(
+        request: Request,
+        since: int | None = Query(default=None, ge=0),
+        limit: int = Query(default=1000, ge=1, le=10000),
+):
+    """Лента изменений как Server-Sent Events; при переподключении номер берётся из Last-Event-ID"""
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    if since is None:
+        since = await ChangeFeed.latest()
+
+    async def events():
+        cursor = since
+        while not await request.is_disconnected():
+            version = data_version.value
+            result = await ChangeFeed.changes(cursor, limit)
+            if result["reset"] or result["seq"] > cursor:
+                cursor = result["seq"]
+                yield b"id: %d\ndata: %s\n\n" % (cursor, orjson.dumps(result))
+                if result["more"]:
+                    continue
+            if not await data_version.wait(version, KEEPALIVE_SECONDS):
+                yield b": keepalive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
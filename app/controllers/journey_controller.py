@@ -0,0 +1,20 @@
+from datetime import datetime
+from fastapi import APIRouter, Query
+from ..services.journey_builder import JourneyBuilder
+
+router = APIRouter(prefix="/journeys", tags=["Journeys"])
+
+@router.get("/info")
+async def get_journeys(
+        page: int = 1,
+        page_size: int = 20,
+        transponder: str = Query(default=""),
+        date_from: datetime | None = Query(default=None),
+        date_to: datetime | None = Query(default=None)
+):
+    return await JourneyBuilder.get_journeys(date_from, date_to, transponder, page, page_size)
+
+@router.post("/rebuild")
+async def rebuild_journeys(full: bool = False):
+    """Достраивает поездки по новым транзакциям (full=true - пересобирает все)"""
+    return await JourneyBuilder.update(full=full)
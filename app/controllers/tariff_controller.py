@@ -0,0 +1,25 @@
+from datetime import datetime
+from fastapi import APIRouter, Query
+from ..services.tariff_reconciler import TariffReconciler
+
+router = APIRouter(prefix="/tariffs", tags=["Tariffs"])
+
+@router.get("/reference")
+async def get_references():
+    return {"items": await TariffReconciler.get_references()}
+
+@router.get("/deltas")
+async def get_deltas(
+        page: int = 1,
+        page_size: int = 50,
+        overcharge_only: bool = True,
+        transponder: str = Query(default=""),
+        date_from: datetime | None = Query(default=None),
+        date_to: datetime | None = Query(default=None)
+):
+    return await TariffReconciler.get_deltas(overcharge_only, date_from, date_to, transponder, page, page_size)
+
+@router.post("/reconcile")
+async def reconcile(full: bool = False):
+    """Сверяет новые транзакции с эталонными тарифами (full=true - всю историю)"""
+    return await TariffReconciler.update(full=full)
@@ -1,39 +1,67 @@
-from fastapi import APIRouter, HTTPException, Query, UploadFile, File
-import asyncio
+from fastapi import APIRouter, HTTPException, Query, UploadFile, File, Request, Response
+from fastapi.responses import ORJSONResponse
 from ..database import async_session_maker
 from ..services.scraper_service import scraper_service
+from ..services.scrape_coordinator import scrape_coordinator
+from ..services.scrape_runs import ScrapeRuns
 from ..services.get_date import get_month_range, get_today_range
 from ..services.file_import import FileImport
+from ..services.batch_import import BatchImport
 from ..services.models_service.transaction_service import TransactionService
 from ..services.progress_tracker import progress_tracker
+from ..services.raw_payload import RawPayload
+from ..services.http_cache import HttpCache
 
 router = APIRouter(prefix="/transactions", tags=["Transactions"])
 
-async def run_scrape_range(date_from, date_to):
-    async with async_session_maker() as session:
-        service = TransactionService(session)
-        await service.scrape_between(date_from, date_to)
-
 @router.get("/info")
 async def get_transactions(
+        request: Request,
+        response: Response,
         page: int = 1,
         page_size: int = 50,
         transponder: str = Query(default=""),
         date_from: str | None = Query(default=None),
-        date_to: str | None = Query(default=None)
+        date_to: str | None = Query(default=None),
+        fields: str | None = Query(default=None, description="Поля строк через запятую, по умолчанию все")
 ):
+    not_modified = HttpCache.check(request, response)
+    if not_modified:
+        return not_modified
     async with async_session_maker() as session:
         service = TransactionService(session)
-        return await service.get_transactions(
-            page=page,
-            page_size=page_size,
-            transponder=transponder,
-            date_from=date_from,
-            date_to=date_to
-        )
+        try:
+            result = await service.get_transactions(
+                page=page,
+                page_size=page_size,
+                transponder=transponder,
+                date_from=date_from,
+                date_to=date_to,
+                fields=fields
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    # Строки уже простые словари, orjson сериализует их без jsonable_encoder
+    return ORJSONResponse(result, headers=dict(response.headers))
+
+@router.get("/{id_transaction}/detail")
+async def get_transaction_detail(id_transaction: int):
+    """Транзакция вместе с исходной строкой, загружаемой по запросу"""
+    async with async_session_maker() as session:
+        service = TransactionService(session)
+        transaction = await service.get_transaction(id_transaction)
+    if transaction is None:
+        raise HTTPException(status_code=404, detail="Транзакция не найдена")
+    return {
+        "transaction": transaction,
+        "raw_row": await RawPayload.get(id_transaction),
+    }
 
 @router.get("/stats")
-async def get_transactions_stats():
+async def get_transactions_stats(request: Request, response: Response):
+    not_modified = HttpCache.check(request, response, daily=True)
+    if not_modified:
+        return not_modified
     async with async_session_maker() as session:
         service = TransactionService(session)
         start, end = get_today_range()
@@ -41,15 +69,38 @@ async def get_transactions_stats():
         return await service.get_stats(start, end, start_month, end_month)
 
 @router.get("/transponders")
-async def get_transponders():
+async def get_transponders(request: Request, response: Response):
+    not_modified = HttpCache.check(request, response)
+    if not_modified:
+        return not_modified
     async with async_session_maker() as session:
         service = TransactionService(session)
         return {"items": await service.get_transponders()}
 
 @router.post("/scrape-range")
 async def scrape_range(date_from: str = Query(...), date_to: str = Query(...)):
-    asyncio.create_task(run_scrape_range(date_from, date_to))
-    return {"status": "started"}
+    """
+    Ставит скрапинг диапазона в общую очередь. Пересекающиеся запросы объединяются:
+    status joined - диапазон уже скрапится, queued - ждёт окончания текущего скрапинга
+    """
+    try:
+        jobs, status = scrape_coordinator.submit(
+            TransactionService.parse_date_required(date_from),
+            TransactionService.parse_date_required(date_to),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": status, "ranges": [job.as_dict() for job in jobs]}
+
+@router.get("/scrape-queue")
+async def get_scrape_queue():
+    """Выполняющийся скрапинг и ожидающие диапазоны"""
+    return scrape_coordinator.status()
+
+@router.get("/scrape-runs")
+async def get_scrape_runs(limit: int = Query(default=20, ge=1, le=200)):
+    """Последние скрапинги с количеством сохранённых дней"""
+    return await ScrapeRuns.recent(limit)
 
 @router.get("/session-status")
 async def get_session_status():
@@ -70,10 +121,18 @@ async def reset_session():
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/import")
-async def import_file(file: UploadFile = File(...)):
+async def import_file(
+        file: UploadFile = File(...),
+        chunk_size: int | None = Query(default=None, ge=100, le=5000)
+):
     ext = file.filename.split(".")[-1].lower()
-    saved, total = await FileImport.import_file(ext, file.file)
-    return {"saved": saved, "total": total}
+    return await FileImport.import_file(ext, file.file, filename=file.filename, chunk_size=chunk_size)
+
+@router.post("/import-batch")
+async def import_files(files: list[UploadFile] = File(...)):
+    """Пакетный импорт нескольких файлов и ZIP-архивов"""
+    payloads = [(file.filename, await file.read()) for file in files]
+    return await BatchImport.import_files(payloads)
 
 @router.get("/progress")
 async def get_scrape_progress():
@@ -1,40 +1,92 @@
-from fastapi import APIRouter, Query
-from sqlmodel import select
+from fastapi import APIRouter, Query, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse
 from ..database import async_session_maker
-from ..models.transaction import Transaction
+from ..models.pvp_point import PVPPointCreate, ViolationSimulation
 from ..services.models_service.violation_service import ViolationService
+from ..services.http_cache import HttpCache
 
 router = APIRouter(prefix="/violations", tags=["Violations"])
 
 @router.get("/info")
 async def get_violations(
+        request: Request,
+        response: Response,
         page: int = 1,
         page_size: int = 50,
         transponder: str = Query(default=""),
         date_from: str | None = Query(default=None),
-        date_to: str | None = Query(default=None)
+        date_to: str | None = Query(default=None),
+        fields: str | None = Query(default=None, description="Поля строк через запятую, по умолчанию все")
 ):
+    not_modified = HttpCache.check(request, response)
+    if not_modified:
+        return not_modified
     async with async_session_maker() as session:
         service = ViolationService(session)
-        tx_result = await session.execute(select(Transaction))
-        transactions = tx_result.scalars().all()
-        created = await service.process_transactions(transactions)
-        items = await service.get_violations(page, page_size, transponder, date_from, date_to)
-    return {
+        try:
+            items = await service.get_violations(page, page_size, transponder, date_from, date_to, fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return ORJSONResponse({
         "total": items["total"],
-        "created": created,
         "page": page,
         "items": items["items"],
-    }
+    }, headers=dict(response.headers))
 
 @router.get("/stats")
-async def get_violations_stats():
+async def get_violations_stats(request: Request, response: Response):
+    not_modified = HttpCache.check(request, response, daily=True)
+    if not_modified:
+        return not_modified
     async with async_session_maker() as session:
         service = ViolationService(session)
         return await service.get_stats()
 
 @router.get("/transponders")
-async def get_transponders():
+async def get_transponders(request: Request, response: Response):
+    not_modified = HttpCache.check(request, response)
+    if not_modified:
+        return not_modified
     async with async_session_maker() as session:
         service = ViolationService(session)
-        return {"items": await service.get_transponders()}
\ No newline at end of file
+        return {"items": await service.get_transponders()}
+
+@router.post("/recompute")
+async def recompute_violations():
+    """Пересчёт нарушений по всей истории на стороне БД"""
+    async with async_session_maker() as session:
+        service = ViolationService(session)
+        return await service.recompute_all()
+
+@router.get("/rules")
+async def get_rules():
+    async with async_session_maker() as session:
+        service = ViolationService(session)
+        return {"items": await service.get_rules()}
+
+@router.post("/rules")
+async def add_rule(rule: PVPPointCreate):
+    async with async_session_maker() as session:
+        service = ViolationService(session)
+        try:
+            created = await service.add_rule(rule)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        recomputed = await service.recompute_all()
+    return {"rule": created, "recomputed": recomputed}
+
+@router.delete("/rules/{id_pvp}")
+async def delete_rule(id_pvp: int):
+    async with async_session_maker() as session:
+        service = ViolationService(session)
+        if not await service.delete_rule(id_pvp):
+            raise HTTPException(status_code=404, detail="Правило не найдено")
+        recomputed = await service.recompute_all()
+    return {"recomputed": recomputed}
+
+@router.post("/simulate")
+async def simulate_rules(simulation: ViolationSimulation):
+    """Сколько нарушений и на какую сумму дал бы набор правил за период"""
+    async with async_session_maker() as session:
+        service = ViolationService(session)
+        return await service.simulate(simulation.rules, simulation.date_from, simulation.date_to)
@@ -1,10 +1,95 @@
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
-from sqlmodel import SQLModel
+from sqlalchemy.schema import CreateTable
+from sqlmodel import SQLModel, inspect, text
 from .config import settings
+from .models.change_log import CHANGE_LOG_TRIGGERS
+from .models.import_record import IMPORT_LEDGER_TRIGGERS
 
 engine = create_async_engine(settings.DATABASE_URL, echo=settings.DEBUG)
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
+@event.listens_for(engine.sync_engine, "connect")
+def _configure_sqlite(dbapi_connection, connection_record):
+    """
+    WAL: читатели не блокируют писателя и не видят незафиксированное.
+    busy_timeout: соединение ждёт освобождения блокировки, а не падает с "database is locked"
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.close()
+
+# Индексы прежних версий, которые заменены индексами по ID справочников.
+# Удаляются только они: индексы, созданные вручную, не трогаются
+OBSOLETE_INDEXES = {
+    "transaction": ["ix_transaction_PVP_code", "ix_transaction_transponder"],
+}
+
+def _enable_autoincrement(conn, table):
+    """
+    Пересоздаёт таблицу прежней версии с AUTOINCREMENT: SQLite не меняет это свойство через ALTER TABLE.
+    Строки копируются с прежними ID, индексы и триггеры создаются заново после пересоздания.
+    """
+    sql = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table.name}
+    ).scalar()
+    if not sql or "AUTOINCREMENT" in sql.upper():
+        return
+    rebuilt = f"{table.name}__autoincrement"
+    create = str(CreateTable(table).compile(dialect=conn.dialect))
+    conn.execute(text(create.replace(f'CREATE TABLE "{table.name}"', f'CREATE TABLE "{rebuilt}"', 1)))
+    # Колонки, которых нет в модели (например, raw_row до переноса), сохраняются вместе с данными
+    existing_columns = inspect(conn).get_columns(table.name)
+    for column in existing_columns:
+        if column["name"] not in table.columns:
+            column_type = column["type"].compile(dialect=conn.dialect)
+            conn.execute(text(f'ALTER TABLE "{rebuilt}" ADD COLUMN "{column["name"]}" {column_type}'))
+    columns = ", ".join(f'"{c["name"]}"' for c in existing_columns)
+    conn.execute(text(f'INSERT INTO "{rebuilt}" ({columns}) SELECT {columns} FROM "{table.name}"'))
+    conn.execute(text(f'DROP TABLE "{table.name}"'))
+    conn.execute(text(f'ALTER TABLE "{rebuilt}" RENAME TO "{table.name}"'))
+
+def _sync_schema(conn):
+    """
+    Дополняет таблицы, созданные прежними версиями приложения:
+    добавляет недостающие nullable-колонки и колонки со значением по умолчанию,
+    создаёт новые и удаляет устаревшие индексы.
+    """
+    inspector = inspect(conn)
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        if table.kwargs.get("sqlite_autoincrement"):
+            _enable_autoincrement(conn, table)
+            inspector = inspect(conn)
+        existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            if column.nullable:
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+            elif column.server_default is not None:
+                # SQLite добавляет NOT NULL колонку только вместе со значением по умолчанию
+                default = column.server_default.arg
+                default = default.text if hasattr(default, "text") else "'{}'".format(str(default).replace("'", "''"))
+                conn.execute(text(
+                    f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type} NOT NULL DEFAULT {default}'
+                ))
+        existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        for name in OBSOLETE_INDEXES.get(table.name, []):
+            if name in existing_indexes:
+                conn.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(conn, checkfirst=True)
+
 async def init_db():
     async with engine.begin() as conn:
-        await conn.run_sync(SQLModel.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.run_sync(_sync_schema)
+        for trigger in CHANGE_LOG_TRIGGERS + IMPORT_LEDGER_TRIGGERS:
+            await conn.execute(text(trigger))
@@ -3,12 +3,12 @@ import sys
 import asyncio
 from contextlib import asynccontextmanager
 from pathlib import Path
-from fastapi import FastAPI, Request, UploadFile, File, HTTPException
+from fastapi import FastAPI, Request, Response, UploadFile, File, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from sqlmodel import select, func
 from .database import init_db
-from .controllers import violation_controller, transaction_controller
+from .controllers import violation_controller, transaction_controller, journey_controller, anomaly_controller, tariff_controller, analytics_controller, archive_controller, change_controller
 from .services.web_scraper.avtodor_session import avtodor_session
 from .models.transaction import Transaction
 from .models.violation import Violation
@@ -16,7 +16,16 @@ from .services.get_date import get_month_range, get_today_range
 from .database import async_session_maker
 from .config import settings
 from .services.avtodor_manager import avtodor_manager
-from .services.web_scraper.browser_manager import browser_manager
+from .services.raw_payload import RawPayload
+from .services.dimension_cache import dimension_cache
+from .services.models_service.violation_service import ViolationService
+from .services.ingest_hooks import after_ingest
+from .services.archive_store import archive_store
+from .services.db_writer import db_writer
+from .services.http_cache import HttpCache
+from .services.change_feed import ChangeFeed
+from .services.scrape_runs import ScrapeRuns
+from .services.scrape_coordinator import scrape_coordinator
 
 if getattr(sys, "frozen", False):
     base_path = Path(sys._MEIPASS) / "app"
@@ -30,10 +39,29 @@ static_dir = StaticFiles(directory=str(base_path / "static"))
 async def lifespan(app: FastAPI):
     os.makedirs("data", exist_ok=True)
     await init_db()
+    db_writer.start()
+    await RawPayload.migrate_inline()
+    await archive_store.reserve_ids()
+    await dimension_cache.backfill()
+    async with async_session_maker() as session:
+        service = ViolationService(session)
+        await service.seed_rules()
+        # Догоняем нарушения для данных, сохранённых до проверки при записи
+        await service.recompute_all()
+    await RawPayload.purge()
+    await ChangeFeed.purge()
+    await after_ingest()
+    # Архивация удаляет строки из БД, поэтому при запуске выполняется только по явной настройке
+    if settings.ARCHIVE_ON_STARTUP and archive_store.available():
+        await archive_store.archive()
+    if settings.SCRAPE_RESUME_ON_STARTUP:
+        # Скрапинги, прерванные остановкой приложения или сбоем, продолжаются с первого несохранённого дня
+        for run in await ScrapeRuns.interrupted():
+            scrape_coordinator.submit(run.date_from, run.date_to)
     async def init_avtodor():
         await asyncio.sleep(1)
         try:
-            success = await browser_manager.init()
+            success = await avtodor_session.call(avtodor_session.initialize)
             if success:
                 print("Avtodor менеджер успешно инициализирован")
             else:
@@ -45,11 +73,14 @@ async def lifespan(app: FastAPI):
 
     asyncio.create_task(init_avtodor())
 
+    await db_writer.stop()
+
     try:
-        await browser_manager.close()
+        await avtodor_session.call(avtodor_session.close)
         print("Avtodor сессия закрыта")
     except Exception as e:
         print(f"Ошибка при закрытии сессии: {e}")
+    avtodor_session.browser.worker.stop()
 
 app = FastAPI(
     title="Autodor Monitor",
@@ -60,6 +91,12 @@ app.mount("/static", StaticFiles(directory=str(base_path / "static")), name="sta
 
 app.include_router(transaction_controller.router)
 app.include_router(violation_controller.router)
+app.include_router(journey_controller.router)
+app.include_router(anomaly_controller.router)
+app.include_router(tariff_controller.router)
+app.include_router(analytics_controller.router)
+app.include_router(archive_controller.router)
+app.include_router(change_controller.router)
 
 @app.get("/")
 async def index(request: Request):
@@ -82,7 +119,10 @@ async def violations_page(request: Request):
     })
 
 @app.get("/stats")
-async def get_dashboard_stats():
+async def get_dashboard_stats(request: Request, response: Response):
+    not_modified = HttpCache.check(request, response, daily=True)
+    if not_modified:
+        return not_modified
     async with async_session_maker() as session:
         start, end = get_today_range()
         start_month, end_month = get_month_range()
@@ -125,30 +165,24 @@ async def get_dashboard_stats():
 @app.get("/check-avtodor-auth")
 async def check_avtodor_authentication():
     try:
-        def ensure_authenticated():
-            if not avtodor_session.is_authenticated():
-                return browser_manager.init(headless=True)
-            return True
-        valid = await asyncio.to_thread(ensure_authenticated)
+        valid = await avtodor_session.call(avtodor_session.ensure_authenticated)
         return {"valid": valid}
     except Exception as e:
         raise HTTPException(500, str(e))
 
+@app.get("/browser-stats")
+async def get_browser_stats():
+    """Состояние браузера: переходы, перезапуски, память процессов Chrome"""
+    return avtodor_session.browser.stats()
+
 @app.get("/balance")
 async def get_balance():
     try:
-        if not avtodor_session.is_authenticated():
-            success = await asyncio.to_thread(
-                avtodor_session.login,
-                settings.AVTODOR_USERNAME,
-                settings.AVTODOR_PASSWORD
-            )
-            if not success:
-                raise HTTPException(401, "Failed to authenticate")
-        valid = await asyncio.to_thread(
-            avtodor_session.has_balance
-        )
-        balance = await asyncio.to_thread(avtodor_session.get_balance)
+        success = await avtodor_session.call(avtodor_session.ensure_authenticated)
+        if not success:
+            raise HTTPException(401, "Failed to authenticate")
+        valid = await avtodor_session.call(avtodor_session.has_balance)
+        balance = await avtodor_session.call(avtodor_session.get_balance)
         return {
             "balance": balance,
             "valid": valid,
@@ -0,0 +1,22 @@
+from sqlmodel import SQLModel, Field, Index
+from typing import Optional
+from datetime import datetime, UTC
+
+class Anomaly(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_anomaly_transponder_occurred", "transponder_id", "occurred_at"),
+    )
+
+    id_anomaly: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field(nullable=False, index=True, description="Тип аномалии: duplicate | impossible_speed")
+    id_transaction: int = Field(nullable=False, foreign_key="transaction.id_transaction", index=True, description="ID транзакции")
+    related_transaction_id: int = Field(nullable=False, description="ID предыдущей транзакции пары")
+    transponder_id: int = Field(nullable=False, foreign_key="transponder.id_transponder", description="ID транспондера")
+    transponder: str = Field(nullable=False, description="Номер транспондера")
+    occurred_at: datetime = Field(nullable=False, index=True, description="Дата и время транзакции")
+    PVP_code: str = Field(nullable=False, description="Код ПВП")
+    related_PVP_code: str = Field(nullable=False, description="Код ПВП предыдущей транзакции")
+    paid: float = Field(default=0, description="Оплачено")
+    elapsed_minutes: float = Field(nullable=False, description="Минут между транзакциями")
+    distance_km: Optional[float] = Field(default=None, description="Расстояние между ПВП по трассе")
+    detected_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
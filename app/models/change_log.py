@@ -0,0 +1,38 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import datetime
+
+class ChangeLog(SQLModel, table=True):
+    # AUTOINCREMENT: номера не переиспользуются после очистки старых записей
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq: Optional[int] = Field(default=None, primary_key=True, description="Порядковый номер изменения")
+    entity: str = Field(nullable=False, description="Таблица: transaction или violation")
+    action: str = Field(nullable=False, description="Действие: insert или delete")
+    row_id: int = Field(nullable=False, description="ID строки")
+    transponder: Optional[str] = Field(default=None, description="Транспондер строки для фильтров клиента")
+    occurred_at: Optional[datetime] = Field(default=None, description="Дата строки для фильтров клиента")
+    changed_at: Optional[datetime] = Field(default=None, index=True, description="Время изменения")
+
+
+def _trigger(name: str, event: str, table: str, key: str, *entries) -> str:
+    """Триггер, добавляющий в журнал записи (действие, NEW|OLD) для изменённой строки"""
+    inserts = " ".join(
+        f"INSERT INTO changelog (entity, action, row_id, transponder, occurred_at, changed_at) "
+        f"VALUES ('{table}', '{action}', {row}.{key}, {row}.transponder, {row}.occurred_at, CURRENT_TIMESTAMP);"
+        for action, row in entries
+    )
+    return f'CREATE TRIGGER IF NOT EXISTS "{name}" AFTER {event} ON "{table}" BEGIN {inserts} END'
+
+# Журнал ведут триггеры SQLite, поэтому его не обходит ни один путь записи.
+# Изменение нарушения при пересчёте правил записывается как удаление и вставка.
+CHANGE_LOG_TRIGGERS = [
+    _trigger("changelog_transaction_insert", "INSERT", "transaction", "id_transaction", ("insert", "NEW")),
+    _trigger("changelog_transaction_delete", "DELETE", "transaction", "id_transaction", ("delete", "OLD")),
+    _trigger("changelog_violation_insert", "INSERT", "violation", "id_violation", ("insert", "NEW")),
+    _trigger("changelog_violation_delete", "DELETE", "violation", "id_violation", ("delete", "OLD")),
+    _trigger(
+        "changelog_violation_update", "UPDATE OF reason, base_tariff, occurred_at, transponder, PVP_code",
+        "violation", "id_violation", ("delete", "OLD"), ("insert", "NEW"),
+    ),
+]
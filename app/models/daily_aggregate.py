@@ -0,0 +1,16 @@
+from sqlmodel import SQLModel, Field, Index
+from typing import Optional
+from datetime import date
+
+class DailyAggregate(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_daily_aggregate_key", "day", "transponder_id", "pvp_id", unique=True),
+    )
+
+    id_aggregate: Optional[int] = Field(default=None, primary_key=True)
+    day: date = Field(nullable=False, description="День проездов")
+    transponder_id: int = Field(nullable=False, foreign_key="transponder.id_transponder", index=True, description="ID транспондера")
+    pvp_id: int = Field(nullable=False, foreign_key="pvp.id_pvp", index=True, description="ID ПВП")
+    trips: int = Field(default=0, description="Количество проездов")
+    paid: float = Field(default=0, description="Сумма оплаты")
+    base_tariff: float = Field(default=0, description="Сумма базовых тарифов")
@@ -0,0 +1,26 @@
+from sqlmodel import SQLModel, Field, Index
+from typing import Optional
+from datetime import datetime, UTC
+
+class ImportRecord(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_importrecord_range", "date_from", "date_to"),
+    )
+
+    id_import: Optional[int] = Field(default=None, primary_key=True)
+    digest: str = Field(nullable=False, unique=True, index=True, description="SHA-256 содержимого файла или чанка")
+    kind: str = Field(default="file", nullable=False, description="Тип записи: file или chunk")
+    filename: Optional[str] = Field(default=None, description="Имя загруженного файла")
+    saved: int = Field(default=0, description="Количество сохранённых записей")
+    total: int = Field(default=0, description="Количество записей в файле")
+    date_from: Optional[datetime] = Field(default=None, description="Дата самой ранней записи файла")
+    date_to: Optional[datetime] = Field(default=None, description="Дата самой поздней записи файла")
+    imported_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+
+
+# Удаление транзакции любым путём - заменой диапазона, архивацией или вручную - снимает отметку
+# об импорте файлов, которые её покрывали, и повторная загрузка такого файла снова записывает строки
+IMPORT_LEDGER_TRIGGERS = [
+    'CREATE TRIGGER IF NOT EXISTS "importrecord_transaction_delete" AFTER DELETE ON "transaction" BEGIN '
+    "DELETE FROM importrecord WHERE date_from <= OLD.occurred_at AND date_to >= OLD.occurred_at; END",
+]
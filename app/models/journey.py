@@ -0,0 +1,19 @@
+from sqlmodel import SQLModel, Field, JSON, Index
+from typing import List, Optional
+from datetime import datetime
+
+class Journey(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_journey_transponder_ended", "transponder_id", "ended_at"),
+    )
+
+    id_journey: Optional[int] = Field(default=None, primary_key=True)
+    transponder_id: int = Field(nullable=False, foreign_key="transponder.id_transponder", description="ID транспондера")
+    transponder: str = Field(nullable=False, description="Номер транспондера")
+    started_at: datetime = Field(nullable=False, index=True, description="Время первого проезда ПВП в поездке")
+    ended_at: datetime = Field(nullable=False, description="Время последнего проезда ПВП в поездке")
+    first_transaction_id: int = Field(nullable=False, description="ID первой транзакции поездки")
+    last_transaction_id: int = Field(nullable=False, description="ID последней транзакции поездки")
+    pvp_path: List[str] = Field(default_factory=list, sa_type=JSON, description="Последовательность ПВП")
+    trips_count: int = Field(default=0, description="Количество проездов ПВП")
+    total_paid: float = Field(default=0, description="Итоговая стоимость поездки")
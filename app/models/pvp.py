@@ -0,0 +1,7 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+
+class PVP(SQLModel, table=True):
+    id_pvp: Optional[int] = Field(default=None, primary_key=True)
+    code: str = Field(nullable=False, unique=True, index=True, description="Код ПВП")
+    normalized: str = Field(nullable=False, index=True, description="Нормализованный код ПВП для сравнения с правилами")
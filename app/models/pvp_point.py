@@ -1,7 +1,31 @@
-from sqlmodel import SQLModel, Field
-from typing import Optional
+from sqlmodel import SQLModel, Field, JSON
+from typing import List, Optional
 
-class PVPPoint(SQLModel, table=True):
-    id_PVP: Optional[int] = Field(default=None, primary_key=True, description="ID запрещенного ПВП")
+class PVPPointBase(SQLModel):
     code: str = Field(nullable=False, description="Код ПВП")
-    description: Optional[str] = Field(default=None, description="Описание нарушения")
\ No newline at end of file
+    description: Optional[str] = Field(default=None, description="Описание нарушения")
+    match_type: str = Field(default="exact", sa_column_kwargs={"server_default": "exact"},
+                            description="Способ сравнения: exact или contains")
+    priority: int = Field(default=10, sa_column_kwargs={"server_default": "10"},
+                          description="Приоритет правила, меньше - важнее")
+    vehicle_class: Optional[int] = Field(default=None, description="Правило действует только для класса ТС")
+    time_from: Optional[str] = Field(default=None, description="Начало интервала времени суток ЧЧ:ММ")
+    time_to: Optional[str] = Field(default=None, description="Конец интервала времени суток ЧЧ:ММ (не включительно)")
+    weekdays: Optional[str] = Field(default=None, description="Дни недели через запятую, 0 - понедельник")
+    allowed_transponders: Optional[List[str]] = Field(default=None, sa_type=JSON, description="Транспондеры, которым проезд разрешён")
+    min_tariff: Optional[float] = Field(default=None, description="Правило действует при тарифе не ниже")
+    max_tariff: Optional[float] = Field(default=None, description="Правило действует при тарифе не выше")
+
+class PVPPoint(PVPPointBase, table=True):
+    id_PVP: Optional[int] = Field(default=None, primary_key=True, description="ID запрещенного ПВП")
+    # Строки, добавленные до появления колонки, получают пустое значение и заполняются при запуске
+    normalized: str = Field(default="", index=True, sa_column_kwargs={"server_default": ""},
+                            description="Нормализованный код ПВП")
+
+class PVPPointCreate(PVPPointBase):
+    pass
+
+class ViolationSimulation(SQLModel):
+    rules: List[PVPPointCreate] = Field(default_factory=list, description="Набор правил-кандидатов")
+    date_from: Optional[str] = Field(default=None, description="Начало периода, по умолчанию прошлый квартал")
+    date_to: Optional[str] = Field(default=None, description="Конец периода")
@@ -0,0 +1,9 @@
+from sqlmodel import SQLModel, Field
+from datetime import date, datetime, UTC
+
+class ScrapeCheckpoint(SQLModel, table=True):
+    id_run: int = Field(primary_key=True, foreign_key="scraperun.id_run", description="ID скрапинга")
+    day: date = Field(primary_key=True, description="День, поездки которого сохранены")
+    scraped: int = Field(default=0, description="Количество поездок в личном кабинете")
+    saved: int = Field(default=0, description="Количество сохранённых транзакций")
+    completed_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
@@ -0,0 +1,14 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import date, datetime, UTC
+
+class ScrapeRun(SQLModel, table=True):
+    id_run: Optional[int] = Field(default=None, primary_key=True)
+    date_from: date = Field(nullable=False, description="Первый день диапазона")
+    date_to: date = Field(nullable=False, description="Последний день диапазона")
+    status: str = Field(default="running", index=True, description="Статус: running, done, failed или resumed")
+    days_total: int = Field(default=0, description="Количество дней в диапазоне")
+    days_done: int = Field(default=0, description="Количество дней с контрольной точкой")
+    error: Optional[str] = Field(default=None, description="Ошибка, на которой скрапинг остановился")
+    started_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    finished_at: Optional[datetime] = Field(default=None)
@@ -0,0 +1,9 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import datetime, UTC
+
+class SyncState(SQLModel, table=True):
+    key: str = Field(primary_key=True, description="Имя фоновой обработки")
+    value: Optional[int] = Field(default=None, description="Последний обработанный ID транзакции")
+    marker: Optional[datetime] = Field(default=None, description="Дата, начиная с которой данные требуют пересчёта")
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
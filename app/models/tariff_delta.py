@@ -0,0 +1,22 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import datetime, UTC
+
+class TariffDelta(SQLModel, table=True):
+    id_delta: Optional[int] = Field(default=None, primary_key=True)
+    id_transaction: int = Field(nullable=False, foreign_key="transaction.id_transaction", unique=True, index=True, description="ID транзакции")
+    transponder_id: Optional[int] = Field(default=None, foreign_key="transponder.id_transponder", index=True, description="ID транспондера")
+    transponder: str = Field(nullable=False, description="Номер транспондера")
+    occurred_at: datetime = Field(nullable=False, index=True, description="Дата и время проезда ПВП")
+    pvp_id: Optional[int] = Field(default=None, foreign_key="pvp.id_pvp", index=True, description="ID ПВП")
+    PVP_code: str = Field(nullable=False, description="Код ПВП")
+    vehicle_class: Optional[int] = Field(default=None, description="Класс транспортного средства")
+    base_tariff: Optional[float] = Field(default=None, description="Базовая стоимость дороги")
+    discount: Optional[int] = Field(default=None, description="Скидка на дорогу")
+    paid: Optional[float] = Field(default=None, description="Итоговая стоимость проезда")
+    expected_paid: Optional[float] = Field(default=None, description="Ожидаемая стоимость: base_tariff × (1 − discount)")
+    paid_delta: Optional[float] = Field(default=None, description="Переплата относительно ожидаемой стоимости")
+    reference_tariff: Optional[float] = Field(default=None, description="Эталонный тариф для ПВП и класса")
+    tariff_delta: Optional[float] = Field(default=None, description="Превышение базовой стоимости над эталоном")
+    overcharge: bool = Field(default=False, index=True, description="Переплата или тариф выше эталона")
+    detected_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
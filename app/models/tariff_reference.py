@@ -0,0 +1,16 @@
+from sqlmodel import SQLModel, Field, Index
+from typing import Optional
+from datetime import datetime, UTC
+
+class TariffReference(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_tariff_reference_key", "pvp_id", "vehicle_class"),
+    )
+
+    id_reference: Optional[int] = Field(default=None, primary_key=True)
+    pvp_id: int = Field(nullable=False, foreign_key="pvp.id_pvp", description="ID ПВП")
+    PVP_code: str = Field(nullable=False, description="Код ПВП")
+    vehicle_class: Optional[int] = Field(default=None, description="Класс транспортного средства")
+    tariff: float = Field(nullable=False, description="Эталонный тариф (медиана базовой стоимости)")
+    samples: int = Field(nullable=False, description="Количество транзакций в выборке")
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
@@ -1,15 +1,22 @@
-from sqlmodel import SQLModel, Field, JSON, Column
+from sqlmodel import SQLModel, Field, Index
 from typing import Optional
 from datetime import datetime, UTC
 
 class Transaction(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_transaction_dedup", "transponder_id", "pvp_id", "occurred_at"),
+        # ID не переиспользуются после удаления: архивированные транзакции остаются адресуемыми по ID
+        {"sqlite_autoincrement": True},
+    )
+
     id_transaction: Optional[int] = Field(default=None, primary_key=True)
     occurred_at: datetime = Field(nullable=False, index=True, description="Дата и время проезда ПВП")
-    PVP_code: str = Field(nullable=False, index=True, description="Код ПВП")
-    transponder: str = Field(nullable=False, index=True, description="Номер транспондера")
+    PVP_code: str = Field(nullable=False, description="Код ПВП")
+    transponder: str = Field(nullable=False, description="Номер транспондера")
+    pvp_id: Optional[int] = Field(default=None, foreign_key="pvp.id_pvp", index=True, description="ID ПВП в справочнике")
+    transponder_id: Optional[int] = Field(default=None, foreign_key="transponder.id_transponder", index=True, description="ID транспондера в справочнике")
     vehicle_class: Optional[int] = Field(default=None, description="Класс транспортного средства")
     base_tariff: Optional[float] = Field(default=None, description="Базовая стоимость дороги")
     discount: Optional[int] = Field(default=None, description="Скидка на дорогу")
     paid: Optional[float] = Field(default=None, description="Итоговая стоимость проезда")
-    raw_row: Optional[dict] = Field(default=None, sa_column=Column(JSON), description="Полученная строка CSV")
     created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
\ No newline at end of file
@@ -0,0 +1,8 @@
+from sqlmodel import SQLModel, Field, Column, LargeBinary
+from datetime import datetime, UTC
+
+class TransactionRaw(SQLModel, table=True):
+    id_transaction: int = Field(primary_key=True, foreign_key="transaction.id_transaction", description="ID транзакции")
+    codec: str = Field(nullable=False, description="Алгоритм сжатия: zlib или zstd")
+    payload: bytes = Field(sa_column=Column(LargeBinary, nullable=False), description="Сжатая исходная строка")
+    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC), index=True)
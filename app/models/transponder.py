@@ -0,0 +1,6 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+
+class Transponder(SQLModel, table=True):
+    id_transponder: Optional[int] = Field(default=None, primary_key=True)
+    code: str = Field(nullable=False, unique=True, index=True, description="Номер транспондера в каноническом виде")
@@ -4,10 +4,12 @@ from datetime import datetime, UTC
 
 class Violation(SQLModel, table=True):
     id_violation: Optional[int] = Field(default=None, primary_key=True)
-    id_transaction: Optional[int] = Field(default=None, foreign_key="transaction.id_transaction", description="ID транзакции")
+    id_transaction: Optional[int] = Field(default=None, foreign_key="transaction.id_transaction", index=True, description="ID транзакции")
     transponder: str = Field(nullable=False, description="Номер транспондера")
+    transponder_id: Optional[int] = Field(default=None, foreign_key="transponder.id_transponder", index=True, description="ID транспондера в справочнике")
     occurred_at: datetime = Field(nullable=False, index=True, description="Дата и время нарушения")
     PVP_code: str = Field(nullable=False, description="Код ПВП")
+    pvp_id: Optional[int] = Field(default=None, foreign_key="pvp.id_pvp", index=True, description="ID ПВП в справочнике")
     base_tariff: float = Field(nullable=False, description="Сумма нарушения")
     reason: Optional[str] = Field(default=None, description="Причина нарушения")
     detected_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
\ No newline at end of file
@@ -0,0 +1,239 @@
+import asyncio
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional
+from sqlmodel import select, delete, insert, func
+from ..models.daily_aggregate import DailyAggregate
+from ..models.pvp import PVP
+from ..models.transaction import Transaction
+from ..models.transponder import Transponder
+from ..services.data_version import data_version, VersionedCache
+from ..services.dimension_cache import dimension_cache
+from ..services.watermark import Watermark
+from ..services.db_writer import db_writer
+from ..services.archive_store import archive_store
+from ..database import async_session_maker
+
+class AnalyticsService:
+    """
+    Аналитика по заранее агрегированным дневным корзинам (день × транспондер × ПВП).
+    Корзины дней, которых коснулись новые транзакции, пересчитываются после импорта,
+    готовые ответы кэшируются до следующего изменения версии данных.
+    Корзины архивированных месяцев не пересчитываются: их транзакций в БД больше нет.
+    """
+
+    STATE_KEY = "analytics"
+    DAYS_PER_QUERY = 200
+
+    METRICS = ("paid", "trips", "base_tariff")
+
+    _lock = asyncio.Lock()
+    _cache = VersionedCache(data_version)
+
+    @staticmethod
+    def _aggregate_query():
+        day = func.date(Transaction.occurred_at)
+        return (
+            select(
+                day, Transaction.transponder_id, Transaction.pvp_id,
+                func.count(), func.coalesce(func.sum(Transaction.paid), 0),
+                func.coalesce(func.sum(Transaction.base_tariff), 0),
+            )
+            .where(Transaction.transponder_id.is_not(None), Transaction.pvp_id.is_not(None))
+            .group_by(day, Transaction.transponder_id, Transaction.pvp_id)
+        )
+
+    @classmethod
+    async def _rebuild_days(cls, session, days: List[date]):
+        """Пересчитывает корзины указанных дней одним INSERT ... SELECT на порцию"""
+        columns = ["day", "transponder_id", "pvp_id", "trips", "paid", "base_tariff"]
+        for offset in range(0, len(days), cls.DAYS_PER_QUERY):
+            chunk = days[offset:offset + cls.DAYS_PER_QUERY]
+            await session.execute(delete(DailyAggregate).where(DailyAggregate.day.in_(chunk)))
+            query = cls._aggregate_query().where(
+                Transaction.occurred_at >= datetime.combine(min(chunk), time.min),
+                Transaction.occurred_at < datetime.combine(max(chunk) + timedelta(days=1), time.min),
+                func.date(Transaction.occurred_at).in_([d.isoformat() for d in chunk]),
+            )
+            await session.execute(insert(DailyAggregate).from_select(columns, query))
+
+    @classmethod
+    async def mark_dirty(cls, date_from: datetime):
+        await Watermark.mark_dirty(cls.STATE_KEY, date_from)
+
+    @classmethod
+    async def update(cls, full: bool = False) -> Dict:
+        """Пересчитывает корзины дней с новыми транзакциями (full=True - все корзины)"""
+        async with cls._lock:
+            async def write(session):
+                state = await Watermark.get(session, cls.STATE_KEY)
+                last_id = (await session.execute(select(func.max(Transaction.id_transaction)))).scalar() or 0
+
+                archived = archive_store.months()
+                if full or not state.value:
+                    clear, query = delete(DailyAggregate), cls._aggregate_query()
+                    if archived:
+                        clear = clear.where(func.strftime("%Y-%m", DailyAggregate.day).not_in(archived))
+                        query = query.where(func.strftime("%Y-%m", Transaction.occurred_at).not_in(archived))
+                    await session.execute(clear)
+                    await session.execute(insert(DailyAggregate).from_select(
+                        ["day", "transponder_id", "pvp_id", "trips", "paid", "base_tariff"], query,
+                    ))
+                    days = None
+                else:
+                    days = {
+                        date.fromisoformat(day) for day in (await session.execute(
+                            select(func.date(Transaction.occurred_at)).distinct().where(
+                                Transaction.id_transaction > state.value,
+                                Transaction.id_transaction <= last_id,
+                                Transaction.occurred_at.is_not(None),
+                            )
+                        )).scalars().all()
+                    }
+                    if state.marker is not None:
+                        days |= set((await session.execute(
+                            select(DailyAggregate.day).distinct()
+                            .where(DailyAggregate.day >= state.marker.date())
+                        )).scalars().all())
+                    days = sorted(d for d in days if d.strftime("%Y-%m") not in archived)
+                    await cls._rebuild_days(session, days)
+
+                Watermark.advance(state, last_id)
+                return {"days": None if days is None else len(days), "last_transaction_id": last_id}
+
+            return await db_writer.submit(write)
+
+    @staticmethod
+    def _bucket(bucket: str):
+        if bucket == "day":
+            return func.date(DailyAggregate.day)
+        if bucket == "week":
+            # Понедельник недели
+            return func.date(DailyAggregate.day, "weekday 0", "-6 days")
+        if bucket == "month":
+            return func.strftime("%Y-%m-01", DailyAggregate.day)
+        raise ValueError(f"Неизвестный интервал: {bucket}")
+
+    @staticmethod
+    async def _filters(
+            date_from: Optional[date],
+            date_to: Optional[date],
+            transponder: Optional[str],
+            pvp: Optional[str],
+    ) -> Optional[list]:
+        """Условия по корзинам; None, если фильтр заведомо ничего не вернёт"""
+        conditions = []
+        if date_from:
+            conditions.append(DailyAggregate.day >= date_from)
+        if date_to:
+            conditions.append(DailyAggregate.day <= date_to)
+        if transponder:
+            transponder_id = await dimension_cache.find_transponder(transponder)
+            if transponder_id is None:
+                return None
+            conditions.append(DailyAggregate.transponder_id == transponder_id)
+        if pvp:
+            await dimension_cache.load()
+            pvp_id = dimension_cache.pvp_id(pvp)
+            if pvp_id is None:
+                return None
+            conditions.append(DailyAggregate.pvp_id == pvp_id)
+        return conditions
+
+    @staticmethod
+    def _group_column(group_by: str):
+        if group_by == "transponder":
+            return Transponder.code, DailyAggregate.transponder_id == Transponder.id_transponder, Transponder
+        if group_by == "pvp":
+            return PVP.code, DailyAggregate.pvp_id == PVP.id_pvp, PVP
+        raise ValueError(f"Неизвестная группировка: {group_by}")
+
+    @classmethod
+    async def series(
+            cls,
+            bucket: str = "day",
+            group_by: Optional[str] = None,
+            date_from: Optional[date] = None,
+            date_to: Optional[date] = None,
+            transponder: Optional[str] = None,
+            pvp: Optional[str] = None,
+    ) -> Dict:
+        """Временной ряд сумм и количества проездов, при group_by - отдельно по транспондерам или ПВП"""
+        key = ("series", bucket, group_by, date_from, date_to, transponder, pvp)
+        cached = cls._cache.get(key)
+        if cached is not None:
+            return cached
+
+        version = data_version.value
+        bucket_column = cls._bucket(bucket).label("bucket")
+        conditions = await cls._filters(date_from, date_to, transponder, pvp)
+        items = []
+        if conditions is not None:
+            columns = [bucket_column]
+            if group_by:
+                group_column, on, table = cls._group_column(group_by)
+                columns.append(group_column.label("key"))
+            query = select(
+                *columns,
+                func.sum(DailyAggregate.trips),
+                func.sum(DailyAggregate.paid),
+                func.sum(DailyAggregate.base_tariff),
+            ).where(*conditions)
+            if group_by:
+                query = query.join(table, on)
+            query = query.group_by(*columns).order_by(*columns)
+            async with async_session_maker() as session:
+                rows = (await session.execute(query)).all()
+            for row in rows:
+                item = {"bucket": row[0]}
+                if group_by:
+                    item["key"] = row[1]
+                item.update({"trips": row[-3], "paid": round(row[-2] or 0, 2), "base_tariff": round(row[-1] or 0, 2)})
+                items.append(item)
+
+        result = {"bucket": bucket, "group_by": group_by, "items": items}
+        cls._cache.put(key, result, version)
+        return result
+
+    @classmethod
+    async def top(
+            cls,
+            by: str = "transponder",
+            metric: str = "paid",
+            limit: int = 10,
+            date_from: Optional[date] = None,
+            date_to: Optional[date] = None,
+            transponder: Optional[str] = None,
+            pvp: Optional[str] = None,
+    ) -> Dict:
+        """Первые N транспондеров или ПВП по сумме оплаты или количеству проездов"""
+        if metric not in cls.METRICS:
+            raise ValueError(f"Неизвестная метрика: {metric}")
+        key = ("top", by, metric, limit, date_from, date_to, transponder, pvp)
+        cached = cls._cache.get(key)
+        if cached is not None:
+            return cached
+
+        version = data_version.value
+        group_column, on, table = cls._group_column(by)
+        conditions = await cls._filters(date_from, date_to, transponder, pvp)
+        items = []
+        if conditions is not None:
+            sums = {name: func.sum(getattr(DailyAggregate, name)).label(name) for name in cls.METRICS}
+            query = (
+                select(group_column.label("key"), *sums.values())
+                .join(table, on)
+                .where(*conditions)
+                .group_by(group_column)
+                .order_by(sums[metric].desc())
+                .limit(limit)
+            )
+            async with async_session_maker() as session:
+                rows = (await session.execute(query)).all()
+            items = [
+                {"key": key_value, "trips": trips, "paid": round(paid or 0, 2), "base_tariff": round(base or 0, 2)}
+                for key_value, paid, trips, base in rows
+            ]
+
+        result = {"by": by, "metric": metric, "items": items}
+        cls._cache.put(key, result, version)
+        return result
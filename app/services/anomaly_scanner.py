@@ -0,0 +1,299 @@
+import asyncio
+import re
+from collections import deque
+from datetime import datetime, timedelta
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple
+import numpy as np
+from sqlmodel import select, delete, func, and_, or_
+from ..models.anomaly import Anomaly
+from ..models.pvp import PVP
+from ..models.transaction import Transaction
+from ..services.watermark import Watermark
+from ..services.db_writer import db_writer
+from ..database import async_session_maker
+from ..config import settings
+
+class AnomalyScanner:
+    """
+    Поиск подозрительных списаний: повторов (тот же ПВП и сумма в пределах N минут)
+    и невозможных последовательностей (два ПВП, между которыми нельзя успеть доехать).
+    Транзакции транспондера просматриваются одним проходом в порядке времени,
+    минимальное время между ПВП берётся из заранее построенной матрицы.
+    После импорта проверяются только окна вокруг новых транзакций.
+    """
+
+    STATE_KEY = "anomaly"
+    STREAM_BATCH = 1000
+    FLUSH_BATCH = 500
+    TRANSPONDERS_PER_QUERY = 200
+
+    DUPLICATE = "duplicate"
+    IMPOSSIBLE_SPEED = "impossible_speed"
+
+    _PVP_LOCATION = re.compile(r"^([a-zа-яё]+\d+)-(\d+(?:[.,]\d+)?)")
+
+    _lock = asyncio.Lock()
+    _pvp_ids: Dict[int, int] = {}
+    _min_minutes: Optional[np.ndarray] = None
+    _distance: Optional[np.ndarray] = None
+
+    @classmethod
+    def pvp_location(cls, normalized: str) -> Optional[Tuple[str, float]]:
+        """Трасса и километр ПВП из нормализованного кода ('м4-1046-мск' -> ('м4', 1046.0))"""
+        match = cls._PVP_LOCATION.match(normalized or "")
+        if not match:
+            return None
+        return match.group(1), float(match.group(2).replace(",", "."))
+
+    @classmethod
+    async def load_matrix(cls):
+        """Строит матрицы расстояний и минимального времени в пути между всеми ПВП"""
+        async with async_session_maker() as session:
+            pvps = (await session.execute(select(PVP.id_pvp, PVP.normalized))).all()
+        cls._pvp_ids = {id_pvp: index for index, (id_pvp, _) in enumerate(pvps)}
+        roads = np.array([(cls.pvp_location(n) or ("", np.nan))[0] for _, n in pvps], dtype=object)
+        km = np.array([(cls.pvp_location(n) or ("", np.nan))[1] for _, n in pvps], dtype=float)
+        distance = np.abs(km[:, None] - km[None, :])
+        # Между разными трассами расстояние неизвестно, такие пары не проверяются
+        distance[(roads[:, None] != roads[None, :]) | (roads[:, None] == "")] = np.nan
+        cls._distance = distance
+        cls._min_minutes = distance / settings.ANOMALY_MAX_SPEED_KMH * 60
+
+    @classmethod
+    def lookback(cls) -> timedelta:
+        """Наибольший интервал, в пределах которого пара транзакций может оказаться аномалией"""
+        longest = 0.0
+        if cls._min_minutes is not None and np.isfinite(cls._min_minutes).any():
+            longest = float(np.nanmax(cls._min_minutes))
+        return timedelta(minutes=max(longest, settings.ANOMALY_DUPLICATE_MINUTES))
+
+    @classmethod
+    async def _sweep(cls, rows: AsyncIterable, windows: Optional[Dict[int, Tuple]]) -> AsyncIterator[Anomaly]:
+        """
+        Один проход по транзакциям, упорядоченным по (transponder_id, occurred_at).
+        Аномалия записывается на более позднюю транзакцию пары и только если она попала в окно проверки.
+        """
+        duplicate_window = timedelta(minutes=settings.ANOMALY_DUPLICATE_MINUTES)
+        previous = None
+        recent: deque = deque()
+        async for row in rows:
+            id_transaction, transponder_id, transponder, occurred_at, pvp_id, pvp_code, paid = row
+            if previous is None or previous[1] != transponder_id:
+                previous = None
+                recent.clear()
+            while recent and occurred_at - recent[0][3] > duplicate_window:
+                recent.popleft()
+
+            window = windows.get(transponder_id) if windows is not None else None
+            in_window = window is None or (
+                occurred_at >= window[0] and (window[1] is None or occurred_at <= window[1])
+            )
+            if in_window:
+                for earlier in recent:
+                    if earlier[4] == pvp_id and (earlier[6] or 0) == (paid or 0):
+                        yield cls._build(cls.DUPLICATE, row, earlier, None)
+                        break
+                if previous is not None and previous[4] != pvp_id:
+                    anomaly = cls._check_speed(row, previous)
+                    if anomaly is not None:
+                        yield anomaly
+            previous = row
+            recent.append(row)
+
+    @classmethod
+    def _check_speed(cls, row, previous) -> Optional[Anomaly]:
+        i = cls._pvp_ids.get(previous[4])
+        j = cls._pvp_ids.get(row[4])
+        if i is None or j is None:
+            return None
+        elapsed = (row[3] - previous[3]).total_seconds() / 60
+        if elapsed < cls._min_minutes[i, j]:
+            return cls._build(cls.IMPOSSIBLE_SPEED, row, previous, float(cls._distance[i, j]))
+        return None
+
+    @staticmethod
+    def _build(kind: str, row, earlier, distance_km: Optional[float]) -> Anomaly:
+        return Anomaly(
+            kind=kind,
+            id_transaction=row[0],
+            related_transaction_id=earlier[0],
+            transponder_id=row[1],
+            transponder=row[2],
+            occurred_at=row[3],
+            PVP_code=row[5],
+            related_PVP_code=earlier[5],
+            paid=row[6] or 0,
+            elapsed_minutes=round((row[3] - earlier[3]).total_seconds() / 60, 2),
+            distance_km=distance_km,
+        )
+
+    @classmethod
+    async def _scan(cls, session, windows: Optional[Dict[int, Tuple]], transponders: Optional[List[int]] = None) -> int:
+        """
+        Перепроверяет окна транспондеров и сохраняет найденные аномалии.
+        windows=None - всю историю транспондеров из transponders.
+        """
+        query = (
+            select(
+                Transaction.id_transaction, Transaction.transponder_id, Transaction.transponder,
+                Transaction.occurred_at, Transaction.pvp_id, Transaction.PVP_code, Transaction.paid,
+            )
+            .where(Transaction.transponder_id.is_not(None), Transaction.occurred_at.is_not(None))
+            .order_by(Transaction.transponder_id, Transaction.occurred_at, Transaction.id_transaction)
+            .execution_options(yield_per=cls.STREAM_BATCH)
+        )
+        if windows is not None:
+            lookback = cls.lookback()
+            query = query.where(or_(*[
+                and_(
+                    Transaction.transponder_id == transponder_id,
+                    Transaction.occurred_at >= start - lookback,
+                    *([Transaction.occurred_at <= end] if end is not None else []),
+                )
+                for transponder_id, (start, end) in windows.items()
+            ]))
+            await session.execute(delete(Anomaly).where(or_(*[
+                and_(
+                    Anomaly.transponder_id == transponder_id,
+                    Anomaly.occurred_at >= start,
+                    *([Anomaly.occurred_at <= end] if end is not None else []),
+                )
+                for transponder_id, (start, end) in windows.items()
+            ])))
+        else:
+            query = query.where(Transaction.transponder_id.in_(transponders))
+            await session.execute(delete(Anomaly).where(Anomaly.transponder_id.in_(transponders)))
+
+        found = 0
+        pending: List[Anomaly] = []
+        rows = await session.stream(query)
+        async for anomaly in cls._sweep(rows, windows):
+            pending.append(anomaly)
+            if len(pending) >= cls.FLUSH_BATCH:
+                session.add_all(pending)
+                await session.flush()
+                found += len(pending)
+                pending = []
+        session.add_all(pending)
+        await session.flush()
+        return found + len(pending)
+
+    @classmethod
+    async def mark_dirty(cls, date_from: datetime):
+        await Watermark.mark_dirty(cls.STATE_KEY, date_from)
+
+    @classmethod
+    async def _scan_all(cls) -> Dict:
+        """
+        Проверка всей истории порциями транспондеров: каждая порция - отдельная операция писателя,
+        чтобы другие записи не ждали проверки всей истории.
+        """
+        async with async_session_maker() as session:
+            last_id = (await session.execute(select(func.max(Transaction.id_transaction)))).scalar() or 0
+            transponders = (await session.execute(
+                select(Transaction.transponder_id).distinct()
+                .where(Transaction.transponder_id.is_not(None), Transaction.id_transaction <= last_id)
+                .order_by(Transaction.transponder_id)
+            )).scalars().all()
+
+        found = 0
+        for offset in range(0, len(transponders), cls.TRANSPONDERS_PER_QUERY):
+            chunk = transponders[offset:offset + cls.TRANSPONDERS_PER_QUERY]
+            found += await db_writer.submit(lambda session, chunk=chunk: cls._scan(session, None, chunk))
+
+        async def finish(session):
+            # Аномалии транспондеров, у которых не осталось транзакций
+            await session.execute(delete(Anomaly).where(Anomaly.transponder_id.not_in(
+                select(Transaction.transponder_id).where(Transaction.transponder_id.is_not(None))
+            )))
+            Watermark.advance(await Watermark.get(session, cls.STATE_KEY), last_id)
+
+        await db_writer.submit(finish)
+        return {"found": found, "transponders": None, "last_transaction_id": last_id}
+
+    @classmethod
+    async def update(cls, full: bool = False) -> Dict:
+        """
+        Проверяет транзакции, появившиеся после прошлого запуска, вместе с их соседями по времени.
+        full=True - перепроверить всю историю.
+        """
+        async with cls._lock:
+            await cls.load_matrix()
+            if full or not await Watermark.position(cls.STATE_KEY):
+                return await cls._scan_all()
+
+            async def write(session):
+                state = await Watermark.get(session, cls.STATE_KEY)
+                last_id = (await session.execute(select(func.max(Transaction.id_transaction)))).scalar() or 0
+
+                lookback = cls.lookback()
+                windows = {
+                    transponder_id: (started, ended + lookback)
+                    for transponder_id, started, ended in (await session.execute(
+                        select(
+                            Transaction.transponder_id,
+                            func.min(Transaction.occurred_at),
+                            func.max(Transaction.occurred_at),
+                        )
+                        .where(
+                            Transaction.id_transaction > state.value,
+                            Transaction.id_transaction <= last_id,
+                            Transaction.transponder_id.is_not(None),
+                            Transaction.occurred_at.is_not(None),
+                        )
+                        .group_by(Transaction.transponder_id)
+                    )).all()
+                }
+                if state.marker is not None:
+                    dirty = (await session.execute(
+                        select(Transaction.transponder_id).distinct()
+                        .where(Transaction.occurred_at >= state.marker, Transaction.transponder_id.is_not(None))
+                    )).scalars().all()
+                    for transponder_id in dirty:
+                        started = windows.get(transponder_id, (state.marker,))[0]
+                        windows[transponder_id] = (min(started, state.marker), None)
+                found = 0
+                items = list(windows.items())
+                for offset in range(0, len(items), cls.TRANSPONDERS_PER_QUERY):
+                    found += await cls._scan(session, dict(items[offset:offset + cls.TRANSPONDERS_PER_QUERY]))
+
+                Watermark.advance(state, last_id)
+                return {"found": found, "transponders": len(windows), "last_transaction_id": last_id}
+
+            return await db_writer.submit(write)
+
+    @staticmethod
+    async def get_anomalies(
+            kind: str | None = None,
+            date_from: datetime | None = None,
+            date_to: datetime | None = None,
+            transponder: str | None = None,
+            page: int = 1,
+            page_size: int = 50,
+    ) -> Dict:
+        from ..services.dimension_cache import dimension_cache
+        conditions = []
+        if kind:
+            conditions.append(Anomaly.kind == kind)
+        if transponder:
+            transponder_id = await dimension_cache.find_transponder(transponder)
+            if transponder_id is None:
+                return {"items": [], "total": 0, "page": page}
+            conditions.append(Anomaly.transponder_id == transponder_id)
+        if date_from:
+            conditions.append(Anomaly.occurred_at >= date_from)
+        if date_to:
+            conditions.append(Anomaly.occurred_at <= date_to)
+
+        async with async_session_maker() as session:
+            total = (await session.execute(
+                select(func.count()).select_from(Anomaly).where(*conditions)
+            )).scalar() or 0
+            result = await session.execute(
+                select(Anomaly).where(*conditions)
+                .order_by(Anomaly.occurred_at.desc())
+                .offset((page - 1) * page_size)
+                .limit(page_size)
+            )
+            items = result.scalars().all()
+        return {"items": items, "total": total, "page": page}
@@ -0,0 +1,331 @@
+import asyncio
+from datetime import datetime, date, time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+from sqlmodel import select, delete, func, text, or_
+from ..models.transaction import Transaction
+from ..models.transaction_raw import TransactionRaw
+from ..models.violation import Violation
+from ..models.anomaly import Anomaly
+from ..models.tariff_delta import TariffDelta
+from ..models.journey import Journey
+from ..models.change_log import ChangeLog
+from ..services.columnar_snapshot import columnar_snapshot
+from ..services.db_writer import db_writer
+from ..database import async_session_maker, engine
+from ..config import settings
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+class ArchiveStore:
+    """
+    Холодный архив закрытых месяцев в Parquet: <ARCHIVE_DIR>/<таблица>/month=ГГГГ-ММ/*.parquet.
+    Строки архивированных месяцев удаляются из SQLite, списки транзакций и нарушений
+    дочитывают их из архива, если фильтр по датам туда попадает.
+    Аналитика работает по дневным корзинам, которые при архивации остаются в БД;
+    поездки, аномалии и сверка тарифов архивированных месяцев удаляются вместе с транзакциями.
+    Записи в архивированные месяцы отклоняются и возвращаются вызывающему: архив неизменяем.
+    """
+
+    TRANSACTION = "transaction"
+    VIOLATION = "violation"
+
+    # Размер списка ID в одном DELETE: SQLite ограничивает число параметров запроса
+    DELETE_CHUNK = 500
+
+    SCHEMAS = {
+        TRANSACTION: [
+            ("id_transaction", "int64"), ("occurred_at", "timestamp"), ("PVP_code", "string"),
+            ("transponder", "string"), ("pvp_id", "int64"), ("transponder_id", "int64"),
+            ("vehicle_class", "int64"), ("base_tariff", "float64"), ("discount", "int64"),
+            ("paid", "float64"), ("created_at", "timestamp"),
+        ],
+        VIOLATION: [
+            ("id_violation", "int64"), ("id_transaction", "int64"), ("transponder", "string"),
+            ("transponder_id", "int64"), ("occurred_at", "timestamp"), ("PVP_code", "string"),
+            ("pvp_id", "int64"), ("base_tariff", "float64"), ("reason", "string"),
+            ("detected_at", "timestamp"), ("discount", "int64"), ("paid", "float64"),
+        ],
+    }
+
+    def __init__(self):
+        self.root = Path(settings.ARCHIVE_DIR)
+        self._lock = asyncio.Lock()
+        self._months: Optional[List[str]] = None
+
+    @staticmethod
+    def available() -> bool:
+        return pa is not None
+
+    def _schema(self, kind: str):
+        types = {"int64": pa.int64(), "float64": pa.float64(), "string": pa.string(), "timestamp": pa.timestamp("us")}
+        return pa.schema([(name, types[type_name]) for name, type_name in self.SCHEMAS[kind]])
+
+    def months(self) -> List[str]:
+        """Архивированные месяцы по каталогам партиций"""
+        if self._months is None:
+            folder = self.root / self.TRANSACTION
+            self._months = sorted(
+                entry.name.split("=", 1)[1] for entry in folder.iterdir()
+                if entry.is_dir() and entry.name.startswith("month=")
+            ) if folder.exists() else []
+        return self._months
+
+    def archived_until(self) -> Optional[datetime]:
+        """Начало первого месяца, которого нет в архиве; всё раньше может лежать в Parquet"""
+        months = self.months()
+        if not months:
+            return None
+        year, month = map(int, months[-1].split("-"))
+        return datetime(year + month // 12, month % 12 + 1, 1)
+
+    def archived(self, moment: Optional[datetime]) -> bool:
+        """Перенесён ли в архив месяц, в который попадает момент"""
+        return moment is not None and moment.strftime("%Y-%m") in self.months()
+
+    def overlaps(self, date_from: datetime, date_to: datetime) -> List[str]:
+        """Архивированные месяцы, которые задевает диапазон"""
+        return [month for month in self.months() if date_from < self._bounds(month)[1] and self._bounds(month)[0] <= date_to]
+
+    def covers(self, date_from: Optional[date]) -> bool:
+        """Попадает ли фильтр по датам в архив"""
+        if not self.available():
+            return False
+        until = self.archived_until()
+        return until is not None and (date_from is None or datetime.combine(date_from, time.min) < until)
+
+    def max_id(self) -> int:
+        """Наибольший ID архивированной транзакции по именам частей part-<первый>-<последний>.parquet"""
+        folder = self.root / self.TRANSACTION
+        if not folder.exists():
+            return 0
+        last = 0
+        for path in folder.glob("month=*/part-*-*.parquet"):
+            try:
+                last = max(last, int(path.stem.rsplit("-", 1)[1]))
+            except ValueError:
+                continue
+        return last
+
+    async def reserve_ids(self) -> int:
+        """
+        Поднимает счётчик AUTOINCREMENT таблицы транзакций выше ID из архива.
+        Нужен для архивов, собранных до перехода таблицы на AUTOINCREMENT: иначе новые строки
+        получили бы ID, которые уже есть в Parquet.
+        """
+        last = await asyncio.to_thread(self.max_id)
+        if not last:
+            return 0
+
+        async def write(session) -> int:
+            params = {"name": Transaction.__tablename__, "seq": last}
+            updated = await session.execute(
+                text("UPDATE sqlite_sequence SET seq = :seq WHERE name = :name AND seq < :seq"), params
+            )
+            if not updated.rowcount:
+                await session.execute(text(
+                    "INSERT INTO sqlite_sequence (name, seq) SELECT :name, :seq "
+                    "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :name)"
+                ), params)
+            return last
+
+        return await db_writer.submit(write)
+
+    @staticmethod
+    def cutoff(months: int | None = None) -> datetime:
+        """Начало месяца, с которого данные считаются горячими"""
+        months = settings.ARCHIVE_AFTER_MONTHS if months is None else months
+        today = date.today()
+        index = today.year * 12 + today.month - 1 - months
+        return datetime(index // 12, index % 12 + 1, 1)
+
+    def _write(self, kind: str, month: str, frame: pd.DataFrame):
+        if frame.empty:
+            return
+        for name, type_name in self.SCHEMAS[kind]:
+            if type_name in ("int64", "float64"):
+                # Старые загрузки могли сохранить '-' вместо пустых чисел
+                frame[name] = pd.to_numeric(frame[name], errors="coerce")
+                if type_name == "int64":
+                    frame[name] = frame[name].round().astype("Int64")
+        folder = self.root / kind / f"month={month}"
+        folder.mkdir(parents=True, exist_ok=True)
+        # Имя части по диапазону ID: повторная архивация того же набора перезаписывает файл
+        first, last = frame.iloc[:, 0].min(), frame.iloc[:, 0].max()
+        table = pa.Table.from_pandas(frame, schema=self._schema(kind), preserve_index=False)
+        pq.write_table(table, folder / f"part-{first}-{last}.parquet", compression="zstd")
+
+    @staticmethod
+    def _bounds(month: str) -> Tuple[datetime, datetime]:
+        year, number = map(int, month.split("-"))
+        return datetime(year, number, 1), datetime(year + number // 12, number % 12 + 1, 1)
+
+    async def _export(self, month: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Строки месяца на чтение, без участия писателя"""
+        start, end = self._bounds(month)
+        in_month = (Transaction.occurred_at >= start, Transaction.occurred_at < end)
+        violation_columns = [name for name, _ in self.SCHEMAS[self.VIOLATION]][:-2]
+        async with async_session_maker() as session:
+            transactions = pd.DataFrame(
+                (await session.execute(
+                    select(*[getattr(Transaction, name) for name, _ in self.SCHEMAS[self.TRANSACTION]])
+                    .where(*in_month)
+                )).all(),
+                columns=[name for name, _ in self.SCHEMAS[self.TRANSACTION]],
+            )
+            violations = pd.DataFrame(
+                (await session.execute(
+                    select(*[getattr(Violation, name) for name in violation_columns],
+                           Transaction.discount, Transaction.paid)
+                    .join(Transaction, Transaction.id_transaction == Violation.id_transaction)
+                    .where(*in_month)
+                )).all(),
+                columns=violation_columns + ["discount", "paid"],
+            )
+        return transactions, violations
+
+    async def _drop(self, session, month: str, ids: List[int], violation_ids: List[int]) -> int:
+        """Операция писателя: удаляет из БД только выгруженные в Parquet строки месяца"""
+        logged = (await session.execute(select(func.max(ChangeLog.seq)))).scalar() or 0
+        deleted = 0
+        for i in range(0, len(ids), self.DELETE_CHUNK):
+            chunk = ids[i:i + self.DELETE_CHUNK]
+            # Нарушение, появившееся после выгрузки, пропало бы вместе с транзакцией
+            fresh = (await session.execute(
+                select(func.count(Violation.id_violation))
+                .where(Violation.id_transaction.in_(chunk), Violation.id_violation.not_in(violation_ids))
+            )).scalar()
+            if fresh:
+                raise RuntimeError(f"Нарушения за {month} изменились во время выгрузки, повторите архивацию")
+            await session.execute(delete(TransactionRaw).where(TransactionRaw.id_transaction.in_(chunk)))
+            await session.execute(delete(Violation).where(Violation.id_transaction.in_(chunk)))
+            # Производные строки ссылаются на удаляемые транзакции и уходят вместе с ними
+            await session.execute(delete(TariffDelta).where(TariffDelta.id_transaction.in_(chunk)))
+            await session.execute(delete(Anomaly).where(or_(
+                Anomaly.id_transaction.in_(chunk),
+                Anomaly.related_transaction_id.in_(chunk),
+            )))
+            result = await session.execute(delete(Transaction).where(Transaction.id_transaction.in_(chunk)))
+            deleted += result.rowcount or 0
+        start, end = self._bounds(month)
+        await session.execute(delete(Journey).where(Journey.started_at >= start, Journey.started_at < end))
+        # Строки переехали в архив и остаются видны в списках, для ленты изменений это не удаление
+        await session.execute(delete(ChangeLog).where(ChangeLog.seq > logged))
+        return deleted
+
+    async def _archive_month(self, month: str) -> Dict:
+        """
+        Выгружает месяц в Parquet и удаляет его строки из БД.
+        Чтение и запись файлов идут вне писателя, в его операции остаётся только удаление.
+        """
+        transactions, violations = await self._export(month)
+        await asyncio.to_thread(self._write, self.TRANSACTION, month, transactions)
+        await asyncio.to_thread(self._write, self.VIOLATION, month, violations)
+
+        ids = [int(i) for i in transactions["id_transaction"]]
+        violation_ids = [int(i) for i in violations["id_violation"]]
+        deleted = await db_writer.submit(
+            lambda session: self._drop(session, month, ids, violation_ids)
+        )
+        return {"month": month, "transactions": deleted, "violations": len(violations)}
+
+    async def archive(self, months: int | None = None, vacuum: bool = False) -> Dict:
+        """Переносит закрытые месяцы старше порога в Parquet и удаляет их из БД"""
+        if not self.available():
+            raise RuntimeError("Для архивации требуется пакет pyarrow")
+        border = self.cutoff(months)
+        archived = []
+        async with self._lock:
+            async with async_session_maker() as session:
+                month_keys = (await session.execute(
+                    select(func.strftime("%Y-%m", Transaction.occurred_at)).distinct()
+                    .where(Transaction.occurred_at < border)
+                )).scalars().all()
+
+            for month in sorted(month_keys):
+                archived.append(await self._archive_month(month))
+                columnar_snapshot.invalidate()
+
+            self._months = None
+            if vacuum and archived:
+                async with engine.connect() as conn:
+                    await conn.execution_options(isolation_level="AUTOCOMMIT")
+                    await conn.execute(text("VACUUM"))
+        return {"cutoff": border, "months": archived}
+
+    def _filter(self, transponder_id: Optional[int], date_from: Optional[date], date_to: Optional[date]):
+        expression = None
+
+        def combine(condition):
+            return condition if expression is None else expression & condition
+
+        if transponder_id is not None:
+            expression = combine(ds.field("transponder_id") == transponder_id)
+        if date_from:
+            start = datetime.combine(date_from, time.min)
+            # Условие по партиции отсекает целые месяцы ещё до чтения файлов
+            expression = combine(ds.field("month") >= start.strftime("%Y-%m"))
+            expression = combine(ds.field("occurred_at") >= pa.scalar(start, type=pa.timestamp("us")))
+        if date_to:
+            end = datetime.combine(date_to, time.max)
+            expression = combine(ds.field("month") <= end.strftime("%Y-%m"))
+            expression = combine(ds.field("occurred_at") <= pa.scalar(end, type=pa.timestamp("us")))
+        return expression
+
+    def _scan(self, kind, transponder_id, date_from, date_to, offset, limit, fields) -> Tuple[int, List[Dict]]:
+        folder = self.root / kind
+        if not folder.exists():
+            return 0, []
+        dataset = ds.dataset(
+            str(folder), format="parquet",
+            partitioning=ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive"),
+        )
+        expression = self._filter(transponder_id, date_from, date_to)
+        total = dataset.count_rows(filter=expression)
+        if limit <= 0 or offset >= total:
+            return total, []
+        columns = [name for name, _ in self.SCHEMAS[kind] if fields is None or name in fields or name == "occurred_at"]
+        table = dataset.to_table(columns=columns, filter=expression)
+        table = table.sort_by([("occurred_at", "descending")]).slice(offset, limit)
+        if fields is not None:
+            table = table.select(list(fields))
+        rows = table.to_pylist()
+        for row in rows:
+            row["archived"] = True
+        return total, rows
+
+    async def query(
+            self,
+            kind: str,
+            transponder_id: Optional[int] = None,
+            date_from: Optional[date] = None,
+            date_to: Optional[date] = None,
+            offset: int = 0,
+            limit: int = 50,
+            fields: Optional[List[str]] = None,
+    ) -> Tuple[int, List[Dict]]:
+        """Количество подходящих архивных строк и страница из них, новые сначала; fields - только эти колонки"""
+        if not self.covers(date_from):
+            return 0, []
+        return await asyncio.to_thread(self._scan, kind, transponder_id, date_from, date_to, offset, limit, fields)
+
+    async def page(self, kind, db_total: int, items: List, offset: int, page_size: int,
+                   transponder_id=None, date_from=None, date_to=None, fields=None) -> Tuple[int, List]:
+        """
+        Дополняет страницу из БД архивными строками.
+        Архив содержит только закрытые месяцы, поэтому при сортировке по убыванию даты он идёт после БД.
+        """
+        archive_total, archived = await self.query(
+            kind, transponder_id, date_from, date_to,
+            offset=max(0, offset - db_total), limit=page_size - len(items), fields=fields,
+        )
+        return db_total + archive_total, list(items) + archived
+
+
+archive_store = ArchiveStore()
@@ -1,6 +1,7 @@
 import re
 from typing import Dict, Optional, Tuple
 from datetime import datetime
+from .normalize_files import normalize_transponder
 
 class AvtodorData:
     """Класс для парсинга и нормализации данных Avtodor"""
@@ -33,13 +34,8 @@ class AvtodorData:
 
     @staticmethod
     def _normalize_transponder(transponder: str) -> str:
-        """Нормализует номер транспондера"""
-        if not transponder:
-            return ""
-
-        normalized = transponder.replace('\n', ' ').replace('\r', ' ')
-        normalized = re.sub(r'\s+', ' ', normalized).strip()
-        return normalized[:22]
+        """Нормализует номер транспондера к тому же виду, что и при импорте файлов"""
+        return normalize_transponder(transponder)
 
     @staticmethod
     def _extract_pvp_and_vehicle_class(road: str) -> Tuple[str, Optional[int]]:
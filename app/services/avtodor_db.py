@@ -1,65 +1,141 @@
-from typing import List, Dict, Optional
+from typing import Awaitable, Callable, List, Dict, Optional, Tuple
 from datetime import datetime
-from sqlmodel import select, delete, tuple_, and_
+from sqlmodel import select, delete, tuple_, and_, or_
 from ..models.transaction import Transaction
+from ..models.transaction_raw import TransactionRaw
+from ..models.violation import Violation
+from ..services.raw_payload import RawPayload
+from ..services.dimension_cache import dimension_cache
+from ..services.rule_matcher import rule_matcher
+from ..services.models_service.violation_service import ViolationService
+from ..services.journey_builder import JourneyBuilder
+from ..services.anomaly_scanner import AnomalyScanner
+from ..services.analytics_service import AnalyticsService
+from ..services.columnar_snapshot import columnar_snapshot
+from ..services.archive_store import archive_store
+from ..models.anomaly import Anomaly
+from ..models.tariff_delta import TariffDelta
+from ..services.db_writer import db_writer
 from ..database import async_session_maker
 
 class AvtodorDB:
     @staticmethod
     async def create_transaction(transaction_data: Dict) -> Optional[Transaction]:
         """Создает новую транзакцию"""
+        transaction_data = (await dimension_cache.resolve([dict(transaction_data)]))[0]
+        transaction_data.pop("raw_row", None)
+        AvtodorDB._ensure_hot([transaction_data])
+
+        async def write(session) -> Transaction:
+            transaction = Transaction(**transaction_data)
+            existing = await AvtodorDB._find_duplicate(
+                session,
+                transaction.transponder_id,
+                transaction.occurred_at,
+                transaction.pvp_id
+            )
+            if existing:
+                return existing
+            session.add(transaction)
+            await session.flush()
+            return transaction
+
         try:
-            async with async_session_maker() as session:
-                transaction = Transaction(**transaction_data)
-                existing = await AvtodorDB._find_duplicate(
-                    session,
-                    transaction.transponder,
-                    transaction.occurred_at,
-                    transaction.PVP_code
-                )
-                if existing:
-                    return existing
-                session.add(transaction)
-                await session.commit()
-                await session.refresh(transaction)
-                return transaction
+            return await db_writer.submit(write)
         except Exception:
-            await session.rollback()
             return None
 
     @staticmethod
-    async def bulk_create_transactions(transactions_data: List[Dict]) -> int:
-        """Массовое создание транзакций с проверкой дубликатов батчем"""
+    async def _prepare(transactions_data: List[Dict]) -> List[Dict]:
+        """Проставляет ID справочников и подгружает правила до входа в писателя"""
+        transactions_data = await dimension_cache.resolve([dict(t) for t in transactions_data])
+        await rule_matcher.load()
+        return transactions_data
+
+    @staticmethod
+    def split_archived(transactions_data: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Делит строки на те, что можно записать, и строки архивированных месяцев.
+        Вторые не записываются: дубликаты в Parquet по ключу не проверить.
+        """
+        hot, archived = [], []
+        for t in transactions_data:
+            (archived if archive_store.archived(t.get("occurred_at")) else hot).append(t)
+        return hot, archived
+
+    @staticmethod
+    def _ensure_hot(transactions_data: List[Dict]):
+        archived = sorted({t["occurred_at"].strftime("%Y-%m") for t in AvtodorDB.split_archived(transactions_data)[1]})
+        if archived:
+            raise ValueError(f"Месяцы {', '.join(archived)} перенесены в архив, запись в них невозможна")
+
+    @staticmethod
+    async def _insert(session, transactions_data: List[Dict]) -> int:
+        """
+        Вставляет новые транзакции с их исходными строками и нарушениями; дубликаты пропускаются.
+        Строки архивированных месяцев вызывающий отделяет заранее через split_archived.
+        """
         if not transactions_data:
             return 0
+        AvtodorDB._ensure_hot(transactions_data)
+        # 1. Получаем ключи всех новых транзакций
+        new_keys = [
+            (t["transponder_id"], t["occurred_at"], t["pvp_id"])
+            for t in transactions_data
+        ]
 
-        async with async_session_maker() as session:
-            # 1. Получаем ключи всех новых транзакций
-            new_keys = [
-                (t["transponder"], t["occurred_at"], t["PVP_code"])
-                for t in transactions_data
-            ]
-
-            # 2. Выбираем уже существующие транзакции по этим ключам
-            stmt = select(Transaction.transponder, Transaction.occurred_at, Transaction.PVP_code).where(
-                tuple_(Transaction.transponder, Transaction.occurred_at, Transaction.PVP_code).in_(new_keys)
-            )
-            result = await session.execute(stmt)
-            existing_keys = set(result.all())
+        # 2. Выбираем уже существующие транзакции по этим ключам
+        stmt = select(Transaction.transponder_id, Transaction.occurred_at, Transaction.pvp_id).where(
+            tuple_(Transaction.transponder_id, Transaction.occurred_at, Transaction.pvp_id).in_(new_keys)
+        )
+        result = await session.execute(stmt)
+        existing_keys = set(result.all())
 
-            # 3. Фильтруем только новые транзакции
-            to_insert = [
-                Transaction(**t)
-                for t, key in zip(transactions_data, new_keys)
-                if key not in existing_keys
-            ]
+        # 3. Фильтруем только новые транзакции, исходные строки откладываем в боковую таблицу
+        to_insert = []
+        raw_rows = []
+        for t, key in zip(transactions_data, new_keys):
+            if key in existing_keys:
+                continue
+            existing_keys.add(key)
+            fields = {k: v for k, v in t.items() if k != "raw_row"}
+            to_insert.append(Transaction(**fields))
+            raw_rows.append(t.get("raw_row"))
 
-            # 4. Добавляем батчем
-            session.add_all(to_insert)
-            await session.commit()
+        # 4. Добавляем батчем, после flush известны ID для сжатых исходных строк
+        session.add_all(to_insert)
+        await session.flush()
+        session.add_all([
+            RawPayload.build(transaction.id_transaction, raw)
+            for transaction, raw in zip(to_insert, raw_rows)
+            if raw
+        ])
 
+        # 5. Проверяем батч по закэшированным правилам
+        reasons = await rule_matcher.evaluate(to_insert)
+        for transaction, reason in zip(to_insert, reasons):
+            if reason is not None:
+                session.add(ViolationService.build_violation(transaction, reason))
+        await session.flush()
         return len(to_insert)
 
+    @staticmethod
+    async def bulk_create_transactions(transactions_data: List[Dict]) -> int:
+        """
+        Массовое создание транзакций с проверкой дубликатов батчем.
+        Нарушения по вставленным строкам записываются в той же транзакции.
+        """
+        if not transactions_data:
+            return 0
+
+        transactions_data = await AvtodorDB._prepare(transactions_data)
+
+        async def write(session) -> int:
+            return await AvtodorDB._insert(session, transactions_data)
+
+        # Фиксация - групповым commit писателя БД
+        return await db_writer.submit(write)
+
     @staticmethod
     async def get_all_transactions() -> List[Transaction]:
         """Получает все транзакции"""
@@ -77,24 +153,84 @@ class AvtodorDB:
             return len(result.scalars().all())
 
     @staticmethod
-    async def _find_duplicate(session, transponder: str, occurred_at: datetime, pvp_code: str) -> Optional[Transaction]:
+    async def _find_duplicate(session, transponder_id: int, occurred_at: datetime, pvp_id: int) -> Optional[Transaction]:
         """Ищет дубликат транзакции"""
         stmt = select(Transaction).where(
             and_(
-                Transaction.transponder == transponder,
+                Transaction.transponder_id == transponder_id,
                 Transaction.occurred_at == occurred_at,
-                Transaction.PVP_code == pvp_code
+                Transaction.pvp_id == pvp_id
             )
         )
         result = await session.execute(stmt)
         return result.scalars().first()
 
+    @staticmethod
+    async def _delete_range(session, date_from: datetime, date_to: datetime):
+        in_range = select(Transaction.id_transaction).where(
+            Transaction.occurred_at >= date_from,
+            Transaction.occurred_at <= date_to
+        )
+        await session.execute(
+            delete(TransactionRaw).where(TransactionRaw.id_transaction.in_(in_range))
+        )
+        await session.execute(
+            delete(Violation).where(Violation.id_transaction.in_(in_range))
+        )
+        await session.execute(
+            delete(TariffDelta).where(TariffDelta.id_transaction.in_(in_range))
+        )
+        await session.execute(
+            delete(Anomaly).where(or_(
+                Anomaly.id_transaction.in_(in_range),
+                Anomaly.related_transaction_id.in_(in_range),
+            ))
+        )
+        stmt = delete(Transaction).where(
+            Transaction.occurred_at >= date_from,
+            Transaction.occurred_at <= date_to
+        )
+        await session.execute(stmt)
+
+    @staticmethod
+    async def _after_delete(date_from: datetime):
+        columnar_snapshot.invalidate()
+        await JourneyBuilder.mark_dirty(date_from)
+        await AnomalyScanner.mark_dirty(date_from)
+        await AnalyticsService.mark_dirty(date_from)
+
     @staticmethod
     async def delete_in_range(date_from: datetime, date_to: datetime):
-        async with async_session_maker() as session:
-            stmt = delete(Transaction).where(
-                Transaction.occurred_at >= date_from,
-                Transaction.occurred_at <= date_to
-            )
-            await session.execute(stmt)
-            await session.commit()
+        async def write(session):
+            await AvtodorDB._delete_range(session, date_from, date_to)
+
+        await db_writer.submit(write)
+        await AvtodorDB._after_delete(date_from)
+
+    @staticmethod
+    async def replace_range(
+            date_from: datetime,
+            date_to: datetime,
+            transactions_data: List[Dict],
+            extra: Optional[Callable[[object, int], Awaitable]] = None,
+    ) -> int:
+        """
+        Заменяет транзакции диапазона одной транзакцией БД.
+        extra(session, saved) выполняется в ней же, например для записи контрольной точки скрапинга.
+        Диапазон, задевающий архивированные месяцы, не заменяется.
+        """
+        archived = archive_store.overlaps(date_from, date_to)
+        if archived:
+            raise ValueError(f"Месяцы {', '.join(archived)} перенесены в архив, замена в них невозможна")
+        transactions_data = await AvtodorDB._prepare(transactions_data)
+
+        async def write(session) -> int:
+            await AvtodorDB._delete_range(session, date_from, date_to)
+            saved = await AvtodorDB._insert(session, transactions_data)
+            if extra is not None:
+                await extra(session, saved)
+            return saved
+
+        saved = await db_writer.submit(write)
+        await AvtodorDB._after_delete(date_from)
+        return saved
@@ -1,13 +1,15 @@
 import asyncio
 import logging
-from typing import Dict
-from datetime import datetime
+from typing import Dict, Tuple
+from datetime import date, datetime, time
 from ..services.web_scraper.avtodor_session import avtodor_session
 from .avtodor_data import AvtodorData
 from .avtodor_db import AvtodorDB
 from ..config import settings
 from ..services.progress_tracker import progress_tracker
-from ..services.web_scraper.browser_manager import browser_manager
+from ..services.ingest_hooks import after_ingest
+from ..services.scrape_runs import ScrapeRuns
+from ..services.archive_store import archive_store
 
 logger = logging.getLogger(__name__)
 
@@ -24,75 +26,104 @@ class AvtodorManager:
             raise Exception("Учетные данные Avtodor не настроены. Проверьте .env файл.")
 
     async def sync_transactions(self, date_from: datetime, date_to: datetime) -> Dict:
+        """
+        Скрапинг диапазона по дням. Каждый день сохраняется вместе с контрольной точкой,
+        при сбое день повторяется с новой сессией, а дни, сохранённые прерванными запусками, пропускаются.
+        """
         await progress_tracker.set(0)
+        days = ScrapeRuns.days(date_from.date(), date_to.date())
+        id_run, done = await ScrapeRuns.start(days[0], days[-1])
+        resumed_days = len(done)
+        scraped_count = saved_count = 0
+        archived_days = []
         try:
-            browser_manager.init()
-            await progress_tracker.set(10)
-            await progress_tracker.set(20)
-            await progress_tracker.set(30)
-            await progress_tracker.set(40)
-            df_str = date_from.strftime("%d.%m.%Y")
-            dt_str = date_to.strftime("%d.%m.%Y")
-            scraped_trips = await self._get_trips_data(df_str, dt_str)
-            await progress_tracker.set(50)
-
-            start_dt = datetime.combine(date_from.date(), datetime.min.time())
-            end_dt = datetime.combine(date_to.date(), datetime.max.time())
-            await AvtodorDB.delete_in_range(start_dt, end_dt)
-            await progress_tracker.set(60)
-            await progress_tracker.set(70)
-            await progress_tracker.set(80)
-            await progress_tracker.set(90)
-
-            parsed = [AvtodorData.parse_trip_data(t) for t in scraped_trips]
-            total = len(parsed)
-            saved_count = 0
-            batch_size = 20
-            for i in range(0, total, batch_size):
-                batch = parsed[i:i + batch_size]
-                saved = await AvtodorDB.bulk_create_transactions(batch)
+            for day in days:
+                if day in done:
+                    continue
+                if archive_store.archived(datetime.combine(day, time.min)):
+                    # День архивированного месяца не заменить; он попадает в ответ, а не теряется молча
+                    archived_days.append(day)
+                    done.add(day)
+                    continue
+                scraped, saved = await self._sync_day(id_run, day)
+                scraped_count += scraped
                 saved_count += saved
-                percent = 60 + int((saved_count / total) * 40)
-                await progress_tracker.set(percent)
-
-            await progress_tracker.set(100)
-            await progress_tracker.set_items(len(scraped_trips))
-
-            return {
-                "success": True,
-                "scraped_count": len(scraped_trips),
-                "saved_count": saved_count,
-                "message": f"Обновлено поездок: {saved_count}"
-            }
-
+                done.add(day)
+                await progress_tracker.set(int(len(done) / len(days) * 100))
         except Exception as e:
             await progress_tracker.set(0)
+            await ScrapeRuns.finish(id_run, error=str(e) or type(e).__name__)
             try:
-                await asyncio.get_event_loop().run_in_executor(None, avtodor_session.close)
+                await avtodor_session.call(avtodor_session.close)
             except Exception:
                 pass
             self._is_initialized = False
             logger.exception("Ошибка в sync_transactions")
             raise
+        finally:
+            # Сохранённые дни обрабатываются и при сбое; удаление дня тоже меняет поездки
+            await after_ingest()
+
+        await ScrapeRuns.finish(id_run)
+        await progress_tracker.set(100)
+        await progress_tracker.set_items(scraped_count)
+        return {
+            "success": True,
+            "scraped_count": scraped_count,
+            "saved_count": saved_count,
+            "resumed_days": resumed_days,
+            "archived_days": archived_days,
+            "message": f"Обновлено поездок: {saved_count}"
+        }
+
+    async def _sync_day(self, id_run: int, day: date) -> Tuple[int, int]:
+        """Скрапит и сохраняет один день; при ошибке повторяет его после повторной авторизации"""
+        attempt = 0
+        while True:
+            try:
+                if not await avtodor_session.call(avtodor_session.ensure_authenticated):
+                    raise Exception("Не удалось авторизоваться в личном кабинете Avtodor")
+                self._is_initialized = True
+                day_str = day.strftime("%d.%m.%Y")
+                scraped_trips = await self._get_trips_data(day_str, day_str)
+                break
+            except Exception:
+                attempt += 1
+                if attempt > settings.SCRAPE_DAY_RETRIES:
+                    raise
+                logger.warning("Скрапинг %s прерван, повтор %s", day, attempt, exc_info=True)
+                try:
+                    await avtodor_session.call(avtodor_session.close)
+                except Exception:
+                    pass
+
+        parsed = [AvtodorData.parse_trip_data(t) for t in scraped_trips]
+        saved = await AvtodorDB.replace_range(
+            datetime.combine(day, time.min),
+            datetime.combine(day, time.max),
+            parsed,
+            extra=lambda session, saved: ScrapeRuns.checkpoint(session, id_run, day, len(scraped_trips), saved),
+        )
+        return len(scraped_trips), saved
 
     async def _get_trips_data(self, date_from, date_to):
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, avtodor_session.get_trips, date_from, date_to)
+        return await avtodor_session.call(
+            avtodor_session.get_trips, date_from, date_to, timeout=settings.BROWSER_SCRAPE_TIMEOUT
+        )
 
     async def check_status(self) -> Dict:
         """Проверяет статус менеджера"""
         return {
             "initialized": self._is_initialized,
-            "authenticated": avtodor_session.is_authenticated,
-            "driver_initialized": avtodor_session.driver is not None,
+            "authenticated": avtodor_session.is_authenticated(),
+            "driver_initialized": avtodor_session.browser.driver is not None,
             "username_configured": bool(self.username),
             "password_configured": bool(self.password)
         }
 
     async def close(self):
         """Закрывает сессию"""
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, avtodor_session.close)
+        await avtodor_session.call(avtodor_session.close)
         self._is_initialized = False
         logger.info("🔒 Avtodor сессия закрыта")
 
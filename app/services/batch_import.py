@@ -0,0 +1,158 @@
+import asyncio
+import io
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Tuple
+from ..services.file_import import FileImport
+from ..services.avtodor_db import AvtodorDB
+from ..services.import_ledger import ImportLedger
+from ..services.normalize_files import normalize_dataframe
+from ..services.progress_tracker import progress_tracker
+from ..services.ingest_hooks import after_ingest
+
+
+def _parse_payload(ext: str, data: bytes) -> List[Dict]:
+    """Разбирает и нормализует содержимое одного файла (выполняется в рабочем процессе)"""
+    parser = FileImport.PARSERS.get(ext)
+    if not parser:
+        raise ValueError(f"Неподдерживаемый тип файла: {ext}")
+    df = parser.parse(io.BytesIO(data))
+    if df is None:
+        raise ValueError(f"Парсер {ext} не вернул данных")
+    return normalize_dataframe(df)
+
+
+class BatchImport:
+    """Пакетный импорт нескольких файлов и ZIP-архивов"""
+
+    BATCH_SIZE = 1000
+    MAX_WORKERS = os.cpu_count() or 2
+
+    @staticmethod
+    def _extension(filename: str) -> str:
+        return filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+
+    @classmethod
+    def expand(cls, payloads: List[Tuple[str, bytes]]) -> List[Tuple[str, str, bytes]]:
+        """Раскрывает ZIP-архивы, возвращает список (имя, расширение, содержимое)"""
+        expanded = []
+        for filename, data in payloads:
+            ext = cls._extension(filename)
+            if ext != "zip":
+                expanded.append((filename, ext, data))
+                continue
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                for member in archive.infolist():
+                    if member.is_dir():
+                        continue
+                    name = f"{filename}/{member.filename}"
+                    expanded.append((name, cls._extension(member.filename), archive.read(member)))
+        return expanded
+
+    @classmethod
+    async def _parse_all(cls, files: List[Tuple[str, str, bytes, str]]) -> List[Tuple[List[Dict] | None, str | None]]:
+        """Параллельно разбирает файлы, ошибки возвращаются по каждому файлу отдельно"""
+        workers = min(len(files), cls.MAX_WORKERS)
+        # Для одного файла не стоит платить за запуск отдельного процесса
+        pool_cls = ProcessPoolExecutor if workers > 1 else ThreadPoolExecutor
+        loop = asyncio.get_running_loop()
+        results = []
+        with pool_cls(max_workers=max(workers, 1)) as pool:
+            futures = [
+                loop.run_in_executor(pool, _parse_payload, ext, data)
+                for _, ext, data, _ in files
+            ]
+            done = 0
+            for future in futures:
+                try:
+                    results.append((await future, None))
+                except Exception as e:
+                    results.append((None, str(e)))
+                done += 1
+                await progress_tracker.set(10 + int(done / len(files) * 50))
+        return results
+
+    @classmethod
+    async def import_files(cls, payloads: List[Tuple[str, bytes]]) -> Dict:
+        """Импортирует набор файлов: параллельный разбор, дедупликация в памяти, запись крупными батчами"""
+        started = time.perf_counter()
+        await progress_tracker.set(5)
+        files = []
+        summary = []
+        for name, ext, data in cls.expand(payloads):
+            digest = ImportLedger.fingerprint(data)
+            previous = await ImportLedger.lookup(digest)
+            if previous:
+                summary.append({
+                    "file": name, "rows": previous.total, "unique": 0, "skipped": 0, "archived": 0,
+                    "error": None, "cached": True, "imported_at": previous.imported_at,
+                })
+                continue
+            files.append((name, ext, data, digest))
+        if not files:
+            await progress_tracker.set(100)
+            return {"files": summary, "total": 0, "unique": 0, "saved": 0, "archived": 0,
+                    "elapsed": 0.0, "rows_per_second": 0.0}
+
+        parsed = await cls._parse_all(files)
+
+        seen = set()
+        merged = []
+        imported = []
+        total = 0
+        archived = 0
+        for (name, _, _, digest), (rows, error) in zip(files, parsed):
+            if error is not None:
+                summary.append({"file": name, "rows": 0, "unique": 0, "skipped": 0, "archived": 0,
+                                "error": error, "cached": False})
+                continue
+            unique = []
+            skipped = 0
+            for row in rows:
+                if row["occurred_at"] is None:
+                    skipped += 1
+                    continue
+                key = (row["transponder"], row["occurred_at"], row["PVP_code"])
+                if key in seen:
+                    continue
+                seen.add(key)
+                unique.append(row)
+            # Строки архивированных месяцев не записываются, файл отчитывается о них отдельно
+            unique, archived_rows = AvtodorDB.split_archived(unique)
+            merged.extend(unique)
+            total += len(rows)
+            archived += len(archived_rows)
+            imported.append((digest, name, unique, rows))
+            summary.append({"file": name, "rows": len(rows), "unique": len(unique), "skipped": skipped,
+                            "archived": len(archived_rows), "error": None, "cached": False})
+        await progress_tracker.set_items(len(merged))
+        await progress_tracker.set(60)
+
+        # Батчи не пересекают границы файлов, чтобы в журнал попало число строк, реально записанных из файла
+        saved = 0
+        written = 0
+        for digest, name, unique, rows in imported:
+            file_saved = 0
+            for i in range(0, len(unique), cls.BATCH_SIZE):
+                batch = unique[i:i + cls.BATCH_SIZE]
+                file_saved += await AvtodorDB.bulk_create_transactions(batch)
+                written += len(batch)
+                await progress_tracker.set(60 + int(written / len(merged) * 40))
+            saved += file_saved
+            await ImportLedger.record(digest, "file", name, file_saved, len(rows), *ImportLedger.date_range(rows))
+        if saved:
+            await after_ingest()
+        await progress_tracker.set(100)
+
+        elapsed = time.perf_counter() - started
+        return {
+            "files": summary,
+            "total": total,
+            "unique": len(merged),
+            "saved": saved,
+            "archived": archived,
+            "elapsed": round(elapsed, 3),
+            "rows_per_second": round(total / elapsed, 1) if elapsed else 0.0,
+        }
@@ -0,0 +1,132 @@
+import asyncio
+from datetime import datetime, timedelta, UTC
+from typing import Dict, List, Tuple
+from sqlmodel import select, delete, func
+from ..models.change_log import ChangeLog
+from ..models.transaction import Transaction
+from ..models.violation import Violation
+from ..models.sync_state import SyncState
+from ..services.data_version import data_version
+from ..services.db_writer import db_writer
+from ..services.projection import to_dicts
+from ..services.watermark import Watermark
+from ..services.models_service.transaction_service import TransactionService
+from ..services.models_service.violation_service import ViolationService
+from ..database import async_session_maker
+from ..config import settings
+
+class ChangeFeed:
+    """
+    Лента изменений транзакций и нарушений по номеру seq из журнала ChangeLog.
+    Клиент передаёт последний полученный номер и получает только вставленные и удалённые с тех пор строки.
+    reset=true означает, что нужных записей журнала уже нет и данные надо перечитать целиком.
+    """
+
+    STATE_KEY = "change_log"
+    TRANSACTION = "transaction"
+    VIOLATION = "violation"
+
+    @staticmethod
+    def _columns(entity: str) -> Dict:
+        if entity == ChangeFeed.TRANSACTION:
+            return {name: getattr(Transaction, name) for name in TransactionService.LIST_FIELDS}
+        return ViolationService.list_columns()
+
+    @classmethod
+    async def _bounds(cls, session) -> Tuple[int, int]:
+        """Последний удалённый при очистке и последний выданный номер журнала"""
+        state = await session.get(SyncState, cls.STATE_KEY)
+        purged = state.value or 0 if state else 0
+        latest = (await session.execute(select(func.max(ChangeLog.seq)))).scalar() or 0
+        return purged, max(purged, latest)
+
+    @classmethod
+    async def latest(cls) -> int:
+        async with async_session_maker() as session:
+            return (await cls._bounds(session))[1]
+
+    @classmethod
+    async def _rows(cls, session, entity: str, ids: List[int]) -> List[Dict]:
+        if not ids:
+            return []
+        columns = cls._columns(entity)
+        key = columns["id_transaction" if entity == cls.TRANSACTION else "id_violation"]
+        query = select(*columns.values()).where(key.in_(ids)).order_by(columns["occurred_at"].desc())
+        if entity == cls.VIOLATION:
+            query = query.select_from(Violation).join(
+                Transaction, Transaction.id_transaction == Violation.id_transaction
+            )
+        return to_dicts(list(columns), (await session.execute(query)).all())
+
+    @classmethod
+    async def changes(cls, since: int, limit: int = 1000) -> Dict:
+        """
+        Изменения после since, не больше limit записей журнала.
+        По каждой строке учитываются первое и последнее действие: строка попадает в deleted,
+        если существовала до since, и в upserted, если существует сейчас.
+        """
+        async with async_session_maker() as session:
+            purged, latest = await cls._bounds(session)
+            if since < purged or since > latest:
+                return {"seq": latest, "reset": True, "more": False}
+
+            entries = (await session.execute(
+                select(ChangeLog).where(ChangeLog.seq > since).order_by(ChangeLog.seq).limit(limit)
+            )).scalars().all()
+
+            first: Dict = {}
+            last: Dict = {}
+            for entry in entries:
+                key = (entry.entity, entry.row_id)
+                first.setdefault(key, entry)
+                last[key] = entry
+
+            result = {"seq": entries[-1].seq if entries else since, "reset": False, "more": len(entries) == limit}
+            for entity, name in ((cls.TRANSACTION, "transactions"), (cls.VIOLATION, "violations")):
+                deleted = [
+                    {"id": row_id, "transponder": entry.transponder, "occurred_at": entry.occurred_at}
+                    for (kind, row_id), entry in first.items()
+                    if kind == entity and entry.action == "delete"
+                ]
+                present = [
+                    row_id for (kind, row_id), entry in last.items()
+                    if kind == entity and entry.action == "insert"
+                ]
+                result[name] = {"upserted": await cls._rows(session, entity, present), "deleted": deleted}
+        return result
+
+    @classmethod
+    async def wait_changes(cls, since: int, limit: int = 1000, timeout: float = 25.0) -> Dict:
+        """Long-poll: ждёт первых изменений после since не дольше timeout секунд"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            version = data_version.value
+            result = await cls.changes(since, limit)
+            if result["reset"] or result["seq"] > since:
+                return result
+            remaining = deadline - loop.time()
+            if remaining <= 0 or not await data_version.wait(version, remaining):
+                return result
+
+    @classmethod
+    async def purge(cls, retention_days: int | None = None) -> int:
+        """Удаляет записи журнала старше срока хранения и запоминает последний удалённый номер"""
+        days = settings.CHANGE_LOG_RETENTION_DAYS if retention_days is None else retention_days
+        if days <= 0:
+            return 0
+        border = datetime.now(UTC).replace(tzinfo=None) - timedelta(days=days)
+
+        async def write(session):
+            last = (await session.execute(
+                select(func.max(ChangeLog.seq)).where(ChangeLog.changed_at < border)
+            )).scalar()
+            if last is None:
+                return 0
+            result = await session.execute(delete(ChangeLog).where(ChangeLog.seq <= last))
+            state = await Watermark.get(session, cls.STATE_KEY)
+            state.value = last
+            state.updated_at = datetime.now(UTC)
+            return result.rowcount or 0
+
+        return await db_writer.submit(write)
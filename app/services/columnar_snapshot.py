@@ -0,0 +1,172 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sqlmodel import select, func
+from ..models.transaction import Transaction
+from ..database import async_session_maker
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+class ColumnarSnapshot:
+    """
+    Колоночный снимок транзакций в памяти процесса для интерактивных фильтров.
+    Массивы NumPy отсортированы по (occurred_at, id_transaction), поэтому диапазон дат - это
+    срез через searchsorted, а остальные фильтры - векторные маски.
+    Снимок включается настройкой COLUMNAR_SNAPSHOT и отключается, если не помещается в бюджет памяти;
+    пока он не готов, запросы идут в SQL.
+    """
+
+    LOAD_BATCH = 50000
+    # id + occurred_at + paid + base_tariff (по 8 байт) и два int32-ключа
+    BYTES_PER_ROW = 8 * 4 + 4 * 2
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._stale = True
+        # Счётчик сбросов: refresh, во время которого снимок сбросили, не должен объявлять его готовым
+        self._generation = 0
+        self.ready = False
+        self.last_id = 0
+        self._set_arrays(*[np.empty(0, dtype=dtype) for dtype in (
+            np.int64, "datetime64[us]", np.int32, np.int32, np.float64, np.float64,
+        )])
+
+    @staticmethod
+    def enabled() -> bool:
+        return settings.COLUMNAR_SNAPSHOT
+
+    def _set_arrays(self, ids, occurred_at, transponder_ids, pvp_ids, paid, base_tariff):
+        self.ids = ids
+        self.occurred_at = occurred_at
+        self.transponder_ids = transponder_ids
+        self.pvp_ids = pvp_ids
+        self.paid = paid
+        self.base_tariff = base_tariff
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (
+            self.ids, self.occurred_at, self.transponder_ids, self.pvp_ids, self.paid, self.base_tariff,
+        ))
+
+    def _budget(self) -> int:
+        return settings.COLUMNAR_MEMORY_MB * 1024 * 1024
+
+    @staticmethod
+    def _peak(nbytes: int) -> int:
+        """Пик памяти при сборке: склейка и сортировка держат одновременно старые и новые массивы"""
+        return nbytes * 2
+
+    def invalidate(self):
+        """Сбрасывает снимок после удаления строк; следующий refresh загрузит его заново"""
+        self._generation += 1
+        self._stale = True
+        self.ready = False
+
+    @staticmethod
+    def _to_arrays(rows: List) -> Tuple[np.ndarray, ...]:
+        frame = pd.DataFrame(rows, columns=["id", "occurred_at", "transponder_id", "pvp_id", "paid", "base_tariff"])
+        return (
+            frame["id"].to_numpy(dtype=np.int64),
+            pd.to_datetime(frame["occurred_at"]).to_numpy(dtype="datetime64[us]"),
+            frame["transponder_id"].fillna(-1).to_numpy(dtype=np.int32),
+            frame["pvp_id"].fillna(-1).to_numpy(dtype=np.int32),
+            # Старые загрузки могли сохранить '-' вместо пустых чисел
+            pd.to_numeric(frame["paid"], errors="coerce").to_numpy(dtype=np.float64),
+            pd.to_numeric(frame["base_tariff"], errors="coerce").to_numpy(dtype=np.float64),
+        )
+
+    async def _load_after(self, session, last_id: int) -> List[Tuple[np.ndarray, ...]]:
+        chunks = []
+        while True:
+            rows = (await session.execute(
+                select(
+                    Transaction.id_transaction, Transaction.occurred_at, Transaction.transponder_id,
+                    Transaction.pvp_id, Transaction.paid, Transaction.base_tariff,
+                )
+                .where(Transaction.id_transaction > last_id, Transaction.occurred_at.is_not(None))
+                .order_by(Transaction.id_transaction)
+                .limit(self.LOAD_BATCH)
+            )).all()
+            if not rows:
+                return chunks
+            chunks.append(self._to_arrays(rows))
+            last_id = rows[-1][0]
+
+    async def refresh(self) -> bool:
+        """Загружает снимок или дописывает в него новые транзакции; False - снимок недоступен"""
+        if not self.enabled():
+            return False
+        async with self._lock:
+            generation = self._generation
+            async with async_session_maker() as session:
+                if self._stale:
+                    count = (await session.execute(select(func.count(Transaction.id_transaction)))).scalar() or 0
+                    if self._peak(count * self.BYTES_PER_ROW) > self._budget():
+                        logger.warning("Колоночный снимок не помещается в бюджет памяти, запросы идут в SQL")
+                        self.ready = False
+                        return False
+                    self._set_arrays(*[a[:0] for a in (
+                        self.ids, self.occurred_at, self.transponder_ids, self.pvp_ids, self.paid, self.base_tariff,
+                    )])
+                    self.last_id = 0
+                chunks = await self._load_after(session, self.last_id)
+
+            if generation != self._generation:
+                # Строки удалили во время загрузки: прочитанное может содержать их ID
+                return False
+            if chunks:
+                incoming = sum(a.nbytes for chunk in chunks for a in chunk)
+                if self._peak(self.nbytes + incoming) > self._budget():
+                    logger.warning("Колоночный снимок превысил бюджет памяти, запросы идут в SQL")
+                    self.invalidate()
+                    return False
+                current = (self.ids, self.occurred_at, self.transponder_ids, self.pvp_ids, self.paid, self.base_tariff)
+                merged = [np.concatenate([current[i]] + [chunk[i] for chunk in chunks]) for i in range(len(current))]
+                order = np.lexsort((merged[0], merged[1]))
+                self._set_arrays(*[a[order] for a in merged])
+                self.last_id = int(self.ids.max())
+            self._stale = False
+            self.ready = True
+            return True
+
+    def _range(self, start: Optional[datetime], end: Optional[datetime]) -> slice:
+        """Срез отсортированных массивов по включительному диапазону дат"""
+        left = 0 if start is None else np.searchsorted(self.occurred_at, np.datetime64(start, "us"), side="left")
+        right = len(self.ids) if end is None else np.searchsorted(self.occurred_at, np.datetime64(end, "us"), side="right")
+        return slice(int(left), int(right))
+
+    def page(
+            self,
+            transponder_id: Optional[int],
+            start: Optional[datetime],
+            end: Optional[datetime],
+            offset: int,
+            limit: int,
+    ) -> Tuple[int, List[int]]:
+        """Количество подходящих транзакций и ID страницы, новые сначала"""
+        window = self._range(start, end)
+        ids = self.ids[window]
+        if transponder_id is not None:
+            ids = ids[self.transponder_ids[window] == transponder_id]
+        total = len(ids)
+        # Массивы отсортированы по возрастанию, страница по убыванию берётся с конца
+        stop = max(total - offset, 0)
+        begin = max(stop - limit, 0)
+        return total, ids[begin:stop][::-1].tolist()
+
+    def stats(self, ranges: Dict[str, Tuple[datetime, datetime]], sum_range: Tuple[datetime, datetime]) -> Dict:
+        """Количество транзакций по диапазонам дат и сумма оплат за диапазон"""
+        result = {name: int(self._range(*bounds).stop - self._range(*bounds).start) for name, bounds in ranges.items()}
+        window = self._range(*sum_range)
+        paid = self.paid[window]
+        result["sum"] = float(np.nansum(paid)) if len(paid) else None
+        result["total"] = len(self.ids)
+        return result
+
+
+columnar_snapshot = ColumnarSnapshot()
@@ -0,0 +1,68 @@
+import asyncio
+import hashlib
+import uuid
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+class DataVersion:
+    """
+    Счётчик версии данных процесса.
+    Увеличивается после каждой записи, по нему сбрасываются кэши вычисленных ответов
+    и считаются ETag HTTP-ответов.
+    """
+
+    def __init__(self):
+        self.value = 0
+        # Счётчик начинается с нуля при каждом запуске, эпоха отличает версии разных запусков
+        self.epoch = uuid.uuid4().hex[:8]
+        self._changed: Optional[asyncio.Event] = None
+
+    def bump(self) -> int:
+        self.value += 1
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
+        return self.value
+
+    async def wait(self, value: int, timeout: float) -> bool:
+        """Ждёт, пока версия станет больше value; False - истёк таймаут"""
+        if self.value > value:
+            return True
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def tag(self, *parts: Any) -> str:
+        """Метка текущей версии данных с учётом дополнительных частей ключа"""
+        key = "|".join(map(str, (self.epoch, self.value) + parts))
+        return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+
+class VersionedCache:
+    """LRU-кэш результатов, записи которого действительны только для текущей версии данных"""
+
+    def __init__(self, version: DataVersion, max_size: int = 256):
+        self._version = version
+        self._max_size = max_size
+        self._items: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable) -> Any:
+        item = self._items.get(key)
+        if item is None or item[0] != self._version.value:
+            return None
+        self._items.move_to_end(key)
+        return item[1]
+
+    def put(self, key: Hashable, value: Any, version: int):
+        """Сохраняет результат под версией данных, прочитанной до запроса"""
+        self._items[key] = (version, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self._max_size:
+            self._items.popitem(last=False)
+
+
+data_version = DataVersion()
@@ -0,0 +1,125 @@
+import asyncio
+import contextvars
+import logging
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+from ..database import async_session_maker
+from ..services.data_version import data_version
+
+logger = logging.getLogger(__name__)
+
+WriteOperation = Callable[[Any], Awaitable[Any]]
+
+_inside_writer = contextvars.ContextVar("inside_writer", default=False)
+
+class DbWriter:
+    """
+    Единственный писатель БД.
+    Операции записи - корутины, принимающие сессию и не делающие commit - ставятся в очередь,
+    задача-писатель собирает их в группы (до MAX_BATCH операций или MAX_DELAY секунд ожидания)
+    и фиксирует одной транзакцией. Вызывающий получает результат своей операции после commit.
+    Если одна операция группы падает, группа откатывается и операции повторяются по одной.
+    Пока писатель не запущен, операции выполняются сразу в собственной сессии.
+    """
+
+    MAX_BATCH = 50
+    MAX_DELAY = 0.05
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.commits = 0
+        self.operations = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Дописывает очередь и останавливает писателя"""
+        if not self.running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    async def submit(self, operation: WriteOperation) -> Any:
+        """Ставит операцию в очередь и ждёт её фиксации"""
+        if _inside_writer.get():
+            raise RuntimeError("Операция записи не может ставить в очередь другую операцию")
+        if not self.running:
+            return await self._execute_alone(operation)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((operation, future))
+        return await future
+
+    async def _execute_alone(self, operation: WriteOperation) -> Any:
+        async with async_session_maker() as session:
+            result = await operation(session)
+            await session.commit()
+        self.commits += 1
+        self.operations += 1
+        data_version.bump()
+        return result
+
+    async def _collect(self, first) -> Tuple[List, bool]:
+        """Добирает группу до MAX_BATCH операций или пока не истечёт MAX_DELAY"""
+        batch = [first]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.MAX_DELAY
+        while len(batch) < self.MAX_BATCH:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self):
+        _inside_writer.set(True)
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch, stopping = await self._collect(first)
+            batch = [(operation, future) for operation, future in batch if not future.cancelled()]
+            if batch:
+                await self._commit_group(batch)
+        _inside_writer.set(False)
+
+    async def _commit_group(self, batch: List):
+        try:
+            async with async_session_maker() as session:
+                results = [await operation(session) for operation, _ in batch]
+                await session.commit()
+        except Exception as error:
+            if len(batch) == 1:
+                future = batch[0][1]
+                if not future.done():
+                    future.set_exception(error)
+                return
+            logger.warning("Групповая запись не удалась, операции повторяются по одной")
+            for item in batch:
+                await self._commit_group([item])
+            return
+        self.commits += 1
+        self.operations += len(batch)
+        data_version.bump()
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+db_writer = DbWriter()
@@ -0,0 +1,162 @@
+import asyncio
+from typing import Dict, Iterable, List, Optional
+from sqlmodel import select, update, or_
+from ..models.transponder import Transponder
+from ..models.pvp import PVP
+from ..models.transaction import Transaction
+from ..models.violation import Violation
+from ..database import async_session_maker
+from ..services.db_writer import db_writer
+from ..services.normalize_files import normalize_transponder
+
+class DimensionCache:
+    """
+    Справочники транспондеров и ПВП с целочисленными ключами.
+    Соответствие код -> ID держится в памяти процесса, новые значения
+    записываются через писателя БД, и кэш пополняется только после их фиксации.
+    """
+
+    BACKFILL_BATCH = 2000
+
+    def __init__(self):
+        self._transponders: Dict[str, int] = {}
+        self._pvps: Dict[str, int] = {}
+        self._transponder_codes: Dict[int, str] = {}
+        self._pvp_codes: Dict[int, str] = {}
+        self._lock = asyncio.Lock()
+        self._loaded = False
+
+    @staticmethod
+    def normalize_pvp(code: str) -> str:
+        from ..services.models_service.violation_service import ViolationService
+        return ViolationService.normalize_pvp(code)
+
+    async def load(self):
+        """Загружает справочники целиком (они небольшие)"""
+        async with self._lock:
+            if self._loaded:
+                return
+            async with async_session_maker() as session:
+                for id_transponder, code in (await session.execute(
+                        select(Transponder.id_transponder, Transponder.code))).all():
+                    self._remember_transponder(code, id_transponder)
+                for id_pvp, code in (await session.execute(select(PVP.id_pvp, PVP.code))).all():
+                    self._remember_pvp(code, id_pvp)
+            self._loaded = True
+
+    def reset(self):
+        self._transponders.clear()
+        self._pvps.clear()
+        self._transponder_codes.clear()
+        self._pvp_codes.clear()
+        self._loaded = False
+
+    def _remember_transponder(self, code: str, id_transponder: int):
+        self._transponders[code] = id_transponder
+        self._transponder_codes[id_transponder] = code
+
+    def _remember_pvp(self, code: str, id_pvp: int):
+        self._pvps[code] = id_pvp
+        self._pvp_codes[id_pvp] = code
+
+    def transponder_id(self, code: str) -> Optional[int]:
+        """ID транспондера по номеру в любом формате, без обращения к БД"""
+        return self._transponders.get(normalize_transponder(code))
+
+    def pvp_id(self, code: str) -> Optional[int]:
+        return self._pvps.get(code)
+
+    def transponder_code(self, id_transponder: int) -> Optional[str]:
+        return self._transponder_codes.get(id_transponder)
+
+    def pvp_code(self, id_pvp: int) -> Optional[str]:
+        return self._pvp_codes.get(id_pvp)
+
+    async def find_transponder(self, code: str) -> Optional[int]:
+        await self.load()
+        return self.transponder_id(code)
+
+    async def transponder_ids(self, codes: Iterable[str]) -> Dict[str, int]:
+        """Возвращает ID для канонических номеров, недостающие создаёт"""
+        await self.load()
+        missing = {c for c in codes if c not in self._transponders}
+        if missing:
+            async with self._lock:
+                missing = {c for c in missing if c not in self._transponders}
+                if missing:
+                    for code, id_transponder in await db_writer.submit(
+                            lambda session: self._insert_missing(session, Transponder, Transponder.id_transponder,
+                                                                 missing, lambda code: Transponder(code=code))):
+                        self._remember_transponder(code, id_transponder)
+        return {c: self._transponders[c] for c in codes}
+
+    async def pvp_ids(self, codes: Iterable[str]) -> Dict[str, int]:
+        """Возвращает ID для кодов ПВП, недостающие создаёт"""
+        await self.load()
+        missing = {c for c in codes if c not in self._pvps}
+        if missing:
+            async with self._lock:
+                missing = {c for c in missing if c not in self._pvps}
+                if missing:
+                    for code, id_pvp in await db_writer.submit(
+                            lambda session: self._insert_missing(
+                                session, PVP, PVP.id_pvp, missing,
+                                lambda code: PVP(code=code, normalized=self.normalize_pvp(code)))):
+                        self._remember_pvp(code, id_pvp)
+        return {c: self._pvps[c] for c in codes}
+
+    @staticmethod
+    async def _insert_missing(session, model, id_column, codes, factory) -> List:
+        """Операция писателя: возвращает пары (код, ID), недостающие значения вставляет"""
+        # Повторная выборка: значение могло появиться из другого процесса
+        existing = (await session.execute(
+            select(model.code, id_column).where(model.code.in_(codes))
+        )).all()
+        existing_codes = {row[0] for row in existing}
+        new_rows = [factory(code) for code in codes if code not in existing_codes]
+        session.add_all(new_rows)
+        await session.flush()
+        return [tuple(row) for row in existing] + [(row.code, getattr(row, id_column.key)) for row in new_rows]
+
+    async def resolve(self, rows: List[Dict]) -> List[Dict]:
+        """Приводит транспондеры к каноническому виду и проставляет transponder_id и pvp_id"""
+        for row in rows:
+            row["transponder"] = normalize_transponder(row.get("transponder") or "")
+        transponders = await self.transponder_ids({row["transponder"] for row in rows})
+        pvps = await self.pvp_ids({row["PVP_code"] for row in rows})
+        for row in rows:
+            row["transponder_id"] = transponders[row["transponder"]]
+            row["pvp_id"] = pvps[row["PVP_code"]]
+        return rows
+
+    async def backfill(self) -> int:
+        """Проставляет ключи справочников строкам, сохранённым до их появления"""
+        filled = 0
+        for model, id_column in ((Transaction, Transaction.id_transaction), (Violation, Violation.id_violation)):
+            while True:
+                async with async_session_maker() as session:
+                    rows = (await session.execute(
+                        select(id_column, model.transponder, model.PVP_code)
+                        .where(or_(model.transponder_id.is_(None), model.pvp_id.is_(None)))
+                        .limit(self.BACKFILL_BATCH)
+                    )).all()
+                if not rows:
+                    break
+                resolved = await self.resolve([
+                    {"id": row[0], "transponder": row[1], "PVP_code": row[2]} for row in rows
+                ])
+                params = [
+                    {
+                        id_column.key: row["id"],
+                        "transponder": row["transponder"],
+                        "transponder_id": row["transponder_id"],
+                        "pvp_id": row["pvp_id"],
+                    }
+                    for row in resolved
+                ]
+                await db_writer.submit(lambda session: session.execute(update(model), params))
+                filled += len(rows)
+        return filled
+
+
+dimension_cache = DimensionCache()
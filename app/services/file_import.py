@@ -1,10 +1,13 @@
+import io
 from ..services.strategy_parser.pdf_strategy import PdfStrategy
 from ..services.strategy_parser.csv_strategy import CsvStrategy
 from ..services.strategy_parser.xlsx_strategy import XlsxStrategy
 from ..services.strategy_parser.base_strategy import BaseStrategy
 from ..services.avtodor_db import AvtodorDB
+from ..services.import_ledger import ImportLedger
 from ..services.normalize_files import normalize_dataframe
 from ..services.progress_tracker import progress_tracker
+from ..services.ingest_hooks import after_ingest
 
 class FileImport:
 
@@ -15,23 +18,75 @@ class FileImport:
     }
 
     @classmethod
-    async def import_file(cls, ext: str, file):
+    async def import_file(cls, ext: str, file, filename: str | None = None, chunk_size: int | None = None) -> dict:
         await progress_tracker.set(10)
         parser: BaseStrategy = cls.PARSERS.get(ext)
         await progress_tracker.set(20)
         if not parser:
             raise ValueError(f"Неподдерживаемый тип файла: {ext}")
+        data = file.read()
+        digest = ImportLedger.fingerprint(data)
+        previous = await ImportLedger.lookup(digest)
+        if previous:
+            await progress_tracker.set_items(previous.total)
+            await progress_tracker.set(100)
+            return {
+                "saved": previous.saved,
+                "total": previous.total,
+                "archived": 0,
+                "cached": True,
+                "imported_at": previous.imported_at,
+            }
         await progress_tracker.set(30)
-        await progress_tracker.set(40)
-        await progress_tracker.set(50)
-        df = parser.parse(file)
-        await progress_tracker.set_items(len(df))
-        await progress_tracker.set(60)
-        await progress_tracker.set(70)
-        df_norm = normalize_dataframe(df)
-        await progress_tracker.set_items(len(df_norm))
-        await progress_tracker.set(80)
-        await progress_tracker.set(90)
-        saved = await AvtodorDB.bulk_create_transactions(df_norm)
+        if chunk_size:
+            saved, total, archived, date_from, date_to = await cls._import_chunks(
+                parser, io.BytesIO(data), filename, chunk_size
+            )
+        else:
+            await progress_tracker.set(40)
+            await progress_tracker.set(50)
+            df = parser.parse(io.BytesIO(data))
+            await progress_tracker.set_items(len(df))
+            await progress_tracker.set(60)
+            await progress_tracker.set(70)
+            df_norm = normalize_dataframe(df)
+            await progress_tracker.set_items(len(df_norm))
+            await progress_tracker.set(80)
+            await progress_tracker.set(90)
+            hot, archived_rows = AvtodorDB.split_archived(df_norm)
+            saved = await AvtodorDB.bulk_create_transactions(hot)
+            archived = len(archived_rows)
+            total = len(df_norm)
+            date_from, date_to = ImportLedger.date_range(df_norm)
+        record = await ImportLedger.record(digest, "file", filename, saved, total, date_from, date_to)
+        if saved:
+            await after_ingest()
         await progress_tracker.set(100)
-        return saved, len(df_norm)
+        # archived - строки месяцев, уже перенесённых в архив: они не записываются
+        return {"saved": saved, "total": total, "archived": archived, "cached": False, "imported_at": record.imported_at}
+
+    @classmethod
+    async def _import_chunks(cls, parser: BaseStrategy, file, filename: str | None, chunk_size: int):
+        """Потоковый импорт: каждый чанк сверяется с журналом отдельно"""
+        saved = 0
+        total = 0
+        archived = 0
+        date_from = date_to = None
+        for chunk in parser.iter_chunks(file, chunk_size):
+            digest = ImportLedger.fingerprint_frame(chunk)
+            previous = await ImportLedger.lookup(digest)
+            if previous:
+                total += previous.total
+                date_from, date_to = ImportLedger.date_range([], date_from, date_to, previous.date_from, previous.date_to)
+                continue
+            rows = normalize_dataframe(chunk)
+            hot, archived_rows = AvtodorDB.split_archived(rows)
+            chunk_saved = await AvtodorDB.bulk_create_transactions(hot)
+            archived += len(archived_rows)
+            chunk_from, chunk_to = ImportLedger.date_range(rows)
+            await ImportLedger.record(digest, "chunk", filename, chunk_saved, len(rows), chunk_from, chunk_to)
+            date_from, date_to = ImportLedger.date_range([], date_from, date_to, chunk_from, chunk_to)
+            saved += chunk_saved
+            total += len(rows)
+            await progress_tracker.set_items(total)
+        return saved, total, archived, date_from, date_to
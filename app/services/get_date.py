@@ -10,4 +10,11 @@ def get_month_range():
     today = datetime.today()
     start = datetime.combine((today - timedelta(days=30)).date(), time.min)
     end = datetime.combine(today.date(), time.max)
-    return start, end
\ No newline at end of file
+    return start, end
+
+def get_last_quarter_range():
+    today = date.today()
+    quarter_start = date(today.year, 3 * ((today.month - 1) // 3) + 1, 1)
+    end = quarter_start - timedelta(days=1)
+    start = date(end.year, 3 * ((end.month - 1) // 3) + 1, 1)
+    return datetime.combine(start, time.min), datetime.combine(end, time.max)
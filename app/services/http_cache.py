@@ -0,0 +1,37 @@
+from datetime import date
+from typing import Any, Optional
+from fastapi import Request, Response
+from ..services.data_version import data_version
+
+class HttpCache:
+    """
+    Условные GET-запросы по версии данных.
+    ETag зависит от версии, пути и параметров запроса, поэтому совпадение If-None-Match
+    означает, что с момента прошлого ответа записей не было, и отвечать можно 304 без обращения к БД.
+    """
+
+    CACHE_CONTROL = "private, no-cache"
+
+    @staticmethod
+    def _matches(header: Optional[str], etag: str) -> bool:
+        if not header:
+            return False
+        if header.strip() == "*":
+            return True
+        candidates = (value.strip() for value in header.split(","))
+        return etag in (value[2:] if value.startswith("W/") else value for value in candidates)
+
+    @classmethod
+    def check(cls, request: Request, response: Response, *parts: Any, daily: bool = False) -> Optional[Response]:
+        """
+        Проставляет ETag и Cache-Control; возвращает готовый ответ 304, если клиент прислал тот же ETag.
+        daily=True - ответ зависит от текущей даты (счётчики «за сегодня»).
+        """
+        if daily:
+            parts += (date.today(),)
+        etag = '"' + data_version.tag(request.url.path, request.url.query, *parts) + '"'
+        headers = {"ETag": etag, "Cache-Control": cls.CACHE_CONTROL}
+        if cls._matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+        return None
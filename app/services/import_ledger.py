@@ -0,0 +1,78 @@
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+from sqlmodel import select
+from ..models.import_record import ImportRecord
+from ..services.db_writer import db_writer
+from ..database import async_session_maker
+
+class ImportLedger:
+    """
+    Журнал импортов: отпечатки уже загруженных файлов и чанков.
+    Запись хранит диапазон дат файла и удаляется триггером, как только из этого диапазона удаляется транзакция.
+    """
+
+    @staticmethod
+    def fingerprint(data: bytes) -> str:
+        """Отпечаток содержимого файла"""
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def fingerprint_frame(df: pd.DataFrame) -> str:
+        """Отпечаток чанка: хеш значений строк и имён колонок"""
+        digest = hashlib.sha256("\x1f".join(map(str, df.columns)).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def date_range(rows: List[Dict], *bounds: Optional[datetime]) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """Первая и последняя даты записей; bounds - уже известные границы, например предыдущих чанков"""
+        dates = [row["occurred_at"] for row in rows if row.get("occurred_at") is not None]
+        dates += [bound for bound in bounds if bound is not None]
+        if not dates:
+            return None, None
+        return min(dates), max(dates)
+
+    @staticmethod
+    async def lookup(digest: str) -> Optional[ImportRecord]:
+        """
+        Возвращает запись о предыдущем импорте или None.
+        Записи без диапазона дат остались от прежних версий: их нельзя снять при удалении строк, поэтому они не учитываются.
+        """
+        async with async_session_maker() as session:
+            result = await session.execute(select(ImportRecord).where(
+                ImportRecord.digest == digest, ImportRecord.date_from.is_not(None),
+            ))
+            return result.scalars().first()
+
+    @staticmethod
+    async def record(
+            digest: str,
+            kind: str,
+            filename: Optional[str],
+            saved: int,
+            total: int,
+            date_from: Optional[datetime],
+            date_to: Optional[datetime],
+    ) -> ImportRecord:
+        """Сохраняет результат импорта файла или чанка вместе с диапазоном дат его записей"""
+        async def write(session) -> ImportRecord:
+            existing = (await session.execute(
+                select(ImportRecord).where(ImportRecord.digest == digest)
+            )).scalars().first()
+            if existing:
+                # Устаревшая запись без диапазона заменяется новой
+                if existing.date_from is not None:
+                    return existing
+                await session.delete(existing)
+                await session.flush()
+            record = ImportRecord(
+                digest=digest, kind=kind, filename=filename, saved=saved, total=total,
+                date_from=date_from, date_to=date_to,
+            )
+            session.add(record)
+            await session.flush()
+            return record
+
+        return await db_writer.submit(write)
@@ -0,0 +1,34 @@
+import logging
+from ..services.journey_builder import JourneyBuilder
+from ..services.anomaly_scanner import AnomalyScanner
+from ..services.tariff_reconciler import TariffReconciler
+from ..services.analytics_service import AnalyticsService
+from ..services.data_version import data_version
+from ..services.columnar_snapshot import columnar_snapshot
+
+logger = logging.getLogger(__name__)
+
+async def after_ingest():
+    """Инкрементальные обработки после записи новых транзакций. Ошибки не прерывают импорт"""
+    try:
+        await JourneyBuilder.update()
+    except Exception:
+        logger.exception("Не удалось обновить поездки")
+    try:
+        await AnomalyScanner.update()
+    except Exception:
+        logger.exception("Не удалось проверить транзакции на аномалии")
+    try:
+        await TariffReconciler.update()
+    except Exception:
+        logger.exception("Не удалось сверить тарифы")
+    try:
+        await AnalyticsService.update()
+    except Exception:
+        logger.exception("Не удалось обновить агрегаты аналитики")
+    try:
+        await columnar_snapshot.refresh()
+    except Exception:
+        columnar_snapshot.invalidate()
+        logger.exception("Не удалось обновить колоночный снимок")
+    data_version.bump()
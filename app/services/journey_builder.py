@@ -0,0 +1,231 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import AsyncIterable, AsyncIterator, Dict, Optional
+from sqlmodel import select, delete, func, and_, or_
+from ..models.journey import Journey
+from ..models.transaction import Transaction
+from ..services.watermark import Watermark
+from ..services.db_writer import db_writer
+from ..database import async_session_maker
+from ..config import settings
+
+class JourneyBuilder:
+    """
+    Восстановление поездок из отдельных проездов ПВП.
+    Транзакции читаются курсором, упорядоченными по (transponder_id, occurred_at),
+    и группируются за один проход: новая поездка начинается при смене транспондера
+    или при разрыве между проездами больше порога.
+    Пересобираются только поездки, которых могли коснуться новые данные.
+    """
+
+    STATE_KEY = "journey"
+    STREAM_BATCH = 1000
+    FLUSH_BATCH = 500
+    TRANSPONDERS_PER_QUERY = 200
+
+    _lock = asyncio.Lock()
+
+    @staticmethod
+    def gap() -> timedelta:
+        return timedelta(minutes=settings.JOURNEY_GAP_MINUTES)
+
+    @classmethod
+    async def mark_dirty(cls, date_from: datetime):
+        """Помечает поездки начиная с даты как требующие пересборки (после удаления транзакций)"""
+        await Watermark.mark_dirty(cls.STATE_KEY, date_from)
+
+    @classmethod
+    async def _sweep(cls, rows: AsyncIterable) -> AsyncIterator[Journey]:
+        """Один проход по упорядоченным проездам, на выходе - готовые поездки"""
+        gap = cls.gap()
+        current: Optional[Journey] = None
+        async for id_transaction, transponder_id, transponder, occurred_at, pvp_code, paid in rows:
+            if (
+                current is not None
+                and current.transponder_id == transponder_id
+                and occurred_at - current.ended_at <= gap
+            ):
+                current.ended_at = occurred_at
+                current.last_transaction_id = id_transaction
+                current.pvp_path.append(pvp_code)
+                current.trips_count += 1
+                current.total_paid += paid or 0
+                continue
+            if current is not None:
+                yield current
+            current = Journey(
+                transponder_id=transponder_id,
+                transponder=transponder,
+                started_at=occurred_at,
+                ended_at=occurred_at,
+                first_transaction_id=id_transaction,
+                last_transaction_id=id_transaction,
+                pvp_path=[pvp_code],
+                trips_count=1,
+                total_paid=paid or 0,
+            )
+        if current is not None:
+            yield current
+
+    @classmethod
+    async def _stream(cls, session, condition=None) -> int:
+        """Читает транзакции курсором и сохраняет поездки порциями"""
+        query = (
+            select(
+                Transaction.id_transaction, Transaction.transponder_id, Transaction.transponder,
+                Transaction.occurred_at, Transaction.PVP_code, Transaction.paid,
+            )
+            .where(Transaction.transponder_id.is_not(None), Transaction.occurred_at.is_not(None))
+            .order_by(Transaction.transponder_id, Transaction.occurred_at, Transaction.id_transaction)
+            .execution_options(yield_per=cls.STREAM_BATCH)
+        )
+        if condition is not None:
+            query = query.where(condition)
+
+        built = 0
+        pending = []
+        rows = await session.stream(query)
+        async for journey in cls._sweep(rows):
+            pending.append(journey)
+            if len(pending) >= cls.FLUSH_BATCH:
+                session.add_all(pending)
+                await session.flush()
+                built += len(pending)
+                pending = []
+        session.add_all(pending)
+        await session.flush()
+        return built + len(pending)
+
+    @classmethod
+    async def _rebuild(cls, session, starts: Dict[int, datetime]) -> int:
+        """Пересобирает поездки транспондеров начиная с указанных моментов"""
+        built = 0
+        items = list(starts.items())
+        for offset in range(0, len(items), cls.TRANSPONDERS_PER_QUERY):
+            chunk = dict(items[offset:offset + cls.TRANSPONDERS_PER_QUERY])
+            # Начало пересборки сдвигается к началу открытой поездки, которую продолжают новые данные
+            open_starts = (await session.execute(
+                select(Journey.transponder_id, func.min(Journey.started_at))
+                .where(or_(*[
+                    and_(Journey.transponder_id == transponder_id, Journey.ended_at >= start - cls.gap())
+                    for transponder_id, start in chunk.items()
+                ]))
+                .group_by(Journey.transponder_id)
+            )).all()
+            for transponder_id, started_at in open_starts:
+                chunk[transponder_id] = min(chunk[transponder_id], started_at)
+
+            await session.execute(delete(Journey).where(or_(*[
+                and_(Journey.transponder_id == transponder_id, Journey.started_at >= start)
+                for transponder_id, start in chunk.items()
+            ])))
+            built += await cls._stream(session, or_(*[
+                and_(Transaction.transponder_id == transponder_id, Transaction.occurred_at >= start)
+                for transponder_id, start in chunk.items()
+            ]))
+        return built
+
+    @classmethod
+    async def _rebuild_all(cls) -> Dict:
+        """
+        Полная пересборка порциями транспондеров: каждая порция - отдельная операция писателя,
+        чтобы другие записи не ждали пересборки всей истории.
+        """
+        async with async_session_maker() as session:
+            last_id = (await session.execute(select(func.max(Transaction.id_transaction)))).scalar() or 0
+            transponders = (await session.execute(
+                select(Transaction.transponder_id).distinct()
+                .where(Transaction.transponder_id.is_not(None), Transaction.id_transaction <= last_id)
+                .order_by(Transaction.transponder_id)
+            )).scalars().all()
+
+        async def rebuild(session, chunk) -> int:
+            await session.execute(delete(Journey).where(Journey.transponder_id.in_(chunk)))
+            return await cls._stream(session, Transaction.transponder_id.in_(chunk))
+
+        built = 0
+        for offset in range(0, len(transponders), cls.TRANSPONDERS_PER_QUERY):
+            chunk = transponders[offset:offset + cls.TRANSPONDERS_PER_QUERY]
+            built += await db_writer.submit(lambda session, chunk=chunk: rebuild(session, chunk))
+
+        async def finish(session):
+            # Поездки транспондеров, у которых не осталось транзакций
+            await session.execute(delete(Journey).where(Journey.transponder_id.not_in(
+                select(Transaction.transponder_id).where(Transaction.transponder_id.is_not(None))
+            )))
+            Watermark.advance(await Watermark.get(session, cls.STATE_KEY), last_id)
+
+        await db_writer.submit(finish)
+        return {"built": built, "transponders": None, "last_transaction_id": last_id}
+
+    @classmethod
+    async def update(cls, full: bool = False) -> Dict:
+        """
+        Достраивает поездки по транзакциям, появившимся после прошлого запуска.
+        full=True - пересобрать все поездки заново.
+        """
+        async with cls._lock:
+            if full or not await Watermark.position(cls.STATE_KEY):
+                return await cls._rebuild_all()
+
+            async def write(session):
+                state = await Watermark.get(session, cls.STATE_KEY)
+                last_id = (await session.execute(select(func.max(Transaction.id_transaction)))).scalar() or 0
+
+                starts = dict((await session.execute(
+                    select(Transaction.transponder_id, func.min(Transaction.occurred_at))
+                    .where(
+                        Transaction.id_transaction > state.value,
+                        Transaction.id_transaction <= last_id,
+                        Transaction.transponder_id.is_not(None),
+                        Transaction.occurred_at.is_not(None),
+                    )
+                    .group_by(Transaction.transponder_id)
+                )).all())
+                if state.marker is not None:
+                    dirty = (await session.execute(
+                        select(Journey.transponder_id).distinct().where(Journey.ended_at >= state.marker)
+                    )).scalars().all()
+                    for transponder_id in dirty:
+                        starts[transponder_id] = min(starts.get(transponder_id, state.marker), state.marker)
+                built = await cls._rebuild(session, starts)
+
+                Watermark.advance(state, last_id)
+                return {"built": built, "transponders": len(starts), "last_transaction_id": last_id}
+
+            return await db_writer.submit(write)
+
+    @staticmethod
+    async def get_journeys(
+            date_from: datetime | None = None,
+            date_to: datetime | None = None,
+            transponder: str | None = None,
+            page: int = 1,
+            page_size: int = 20,
+    ) -> Dict:
+        from ..services.dimension_cache import dimension_cache
+        query = select(Journey)
+        count_query = select(func.count()).select_from(Journey)
+        conditions = []
+        if transponder:
+            transponder_id = await dimension_cache.find_transponder(transponder)
+            if transponder_id is None:
+                return {"journeys": [], "total": 0, "page": page, "page_size": page_size}
+            conditions.append(Journey.transponder_id == transponder_id)
+        if date_from:
+            conditions.append(Journey.ended_at >= date_from)
+        if date_to:
+            conditions.append(Journey.started_at <= date_to)
+        if conditions:
+            query = query.where(*conditions)
+            count_query = count_query.where(*conditions)
+
+        async with async_session_maker() as session:
+            total = (await session.execute(count_query)).scalar() or 0
+            result = await session.execute(
+                query.order_by(Journey.started_at.desc())
+                .offset((page - 1) * page_size)
+                .limit(page_size)
+            )
+            journeys = result.scalars().all()
+        return {"journeys": journeys, "total": total, "page": page, "page_size": page_size}
@@ -2,10 +2,20 @@ from sqlmodel import select, func
 from typing import List
 from datetime import datetime, date, time
 from ...models.transaction import Transaction
+from ...models.transponder import Transponder
 from ...services.scraper_service import scraper_service
-from ...services.normalize_files import normalize_transponder
+from ...services.dimension_cache import dimension_cache
+from ...services.archive_store import archive_store
+from ...services.columnar_snapshot import columnar_snapshot
+from ...services.projection import parse_fields, to_dicts
 
 class TransactionService:
+    # Поля, которые можно запросить в списке через fields=
+    LIST_FIELDS = (
+        "id_transaction", "occurred_at", "PVP_code", "transponder", "pvp_id", "transponder_id",
+        "vehicle_class", "base_tariff", "discount", "paid", "created_at",
+    )
+
     def __init__(self, session):
         self.session = session
         self.scraper = scraper_service
@@ -17,16 +27,57 @@ class TransactionService:
             transponder: str = "",
             date_from: str | None = None,
             date_to: str | None = None,
+            fields: str | None = None,
     ) -> dict:
+        fields = parse_fields(fields, self.LIST_FIELDS)
         date_from = self.parse_date_optional(date_from)
         date_to = self.parse_date_optional(date_to)
 
         offset = (page - 1) * page_size
 
+        transponder_id = None
+        if transponder:
+            transponder_id = await dimension_cache.find_transponder(transponder)
+            if transponder_id is None:
+                return {"total": 0, "page": page, "items": []}
+
+        if columnar_snapshot.ready:
+            total, items = await self._snapshot_page(fields, transponder_id, date_from, date_to, offset, page_size)
+        else:
+            total, items = await self._sql_page(fields, transponder_id, date_from, date_to, offset, page_size)
+        total, items = await archive_store.page(
+            archive_store.TRANSACTION, total, items, offset, page_size, transponder_id, date_from, date_to, fields
+        )
+
+        return {
+            "total": total,
+            "page": page,
+            "items": items,
+        }
+
+    async def _snapshot_page(self, fields, transponder_id, date_from, date_to, offset, page_size):
+        """Фильтрация и сортировка по колоночному снимку, из БД читается только страница"""
+        total, ids = columnar_snapshot.page(
+            transponder_id,
+            datetime.combine(date_from, time.min) if date_from else None,
+            datetime.combine(date_to, time.max) if date_to else None,
+            offset,
+            page_size,
+        )
+        if not ids:
+            return total, []
+        rows = (await self.session.execute(
+            select(Transaction.id_transaction, *[getattr(Transaction, name) for name in fields])
+            .where(Transaction.id_transaction.in_(ids))
+        )).all()
+        by_id = {row[0]: row[1:] for row in rows}
+        return total, to_dicts(fields, (by_id[i] for i in ids if i in by_id))
+
+    async def _sql_page(self, fields, transponder_id, date_from, date_to, offset, page_size):
         count_query = select(func.count(Transaction.id_transaction))
 
-        if transponder:
-            count_query = count_query.where(Transaction.transponder == transponder)
+        if transponder_id:
+            count_query = count_query.where(Transaction.transponder_id == transponder_id)
 
         if date_from:
             count_query = count_query.where(
@@ -41,14 +92,14 @@ class TransactionService:
         total = (await self.session.execute(count_query)).scalar()
 
         query = (
-            select(Transaction)
+            select(*[getattr(Transaction, name) for name in fields])
             .order_by(Transaction.occurred_at.desc())
             .offset(offset)
             .limit(page_size)
         )
 
-        if transponder:
-            query = query.where(Transaction.transponder == transponder)
+        if transponder_id:
+            query = query.where(Transaction.transponder_id == transponder_id)
 
         if date_from:
             query = query.where(
@@ -60,15 +111,25 @@ class TransactionService:
                 Transaction.occurred_at <= datetime.combine(date_to, time.max)
             )
 
-        items = (await self.session.execute(query)).scalars().all()
+        items = to_dicts(fields, (await self.session.execute(query)).all())
+        return total, items
 
-        return {
-            "total": total,
-            "page": page,
-            "items": items,
-        }
+    async def get_transaction(self, id_transaction: int) -> Transaction | None:
+        return await self.session.get(Transaction, id_transaction)
 
     async def get_stats(self, start, end, start_month, end_month):
+        if columnar_snapshot.ready:
+            stats = columnar_snapshot.stats(
+                {"today": (start, end), "month": (start_month, end_month)},
+                (start_month, end_month),
+            )
+            return {
+                "month_transactions": stats["month"],
+                "today_transactions": stats["today"],
+                "total_transactions": stats["total"],
+                "sum_transactions": stats["sum"],
+            }
+
         sum_query = select(func.sum(Transaction.paid)).where(
             Transaction.occurred_at >= start_month,
             Transaction.occurred_at <= end_month
@@ -98,18 +159,13 @@ class TransactionService:
 
     async def get_transponders(self) -> List[str]:
         query = (
-            select(Transaction.transponder)
-            .distinct()
-            .order_by(Transaction.transponder)
+            select(Transponder.code)
+            .where(Transponder.id_transponder.in_(select(Transaction.transponder_id).distinct()))
+            .order_by(Transponder.code)
         )
 
         rows = await self.session.execute(query)
-        transponders = []
-        for row in rows:
-            if row[0]:
-                transponders.append(normalize_transponder(str(row[0])))
-
-        return sorted(transponders)
+        return [row[0] for row in rows if row[0]]
 
     @staticmethod
     def parse_date_optional(value: str | None) -> date | None:
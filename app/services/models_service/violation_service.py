@@ -1,10 +1,22 @@
 import re
 from typing import Optional
-from sqlmodel import select, func
-from datetime import datetime, date, time
+import pandas as pd
+from sqlmodel import select, func, delete, update, insert, or_, and_, literal, column, cast, Integer, String
+from datetime import datetime, date, time, UTC
 from ...models.violation import Violation
 from ...models.transaction import Transaction
-from ...services.get_date import get_month_range, get_today_range
+from ...models.transponder import Transponder
+from ...models.pvp import PVP
+from ...models.pvp_point import PVPPoint, PVPPointBase, PVPPointCreate
+from ...services.dimension_cache import dimension_cache
+from ...services.archive_store import archive_store
+from ...services.db_writer import db_writer
+from ...database import async_session_maker
+from ...services.projection import parse_fields, to_dicts
+from ...services.rule_matcher import rule_matcher
+from ...services.rule_engine import RuleEngine, CompiledRule, format_minutes
+from ...services.normalize_files import normalize_transponder
+from ...services.get_date import get_month_range, get_today_range, get_last_quarter_range
 
 class ViolationService:
     FORBIDDEN_FULL = [
@@ -22,11 +34,16 @@ class ViolationService:
         "М4-1046км-Воронеж", "М4-1046км-Вор",
     ]
 
-    PVP_636_PATTERN = re.compile(r"м4[-\s]*636", re.IGNORECASE)
+    PVP_636_FRAGMENTS = ["м4-636", "м4 636", "м4636"]
+
+    REASON_FORBIDDEN = "Запрещённый пункт ПВП"
+    REASON_636 = "Проезд через ПВП 636 км"
+
+    # Диапазон ID транзакций, пересчитываемый одной операцией писателя
+    RECOMPUTE_SPAN = 20000
 
     def __init__(self, session):
         self.session = session
-        self.NORMALIZED_FORBIDDEN = {self.normalize_pvp(x) for x in self.FORBIDDEN_FULL}
 
     @staticmethod
     def normalize_pvp(pvp: str) -> str:
@@ -43,44 +60,347 @@ class ViolationService:
         if not transaction.PVP_code or not transaction.occurred_at:
             return None
 
-        pvp_norm = self.normalize_pvp(transaction.PVP_code)
+        reason = (await rule_matcher.evaluate([transaction]))[0]
+        if reason is None:
+            return None
+        return self.build_violation(transaction, reason)
 
-        if self.PVP_636_PATTERN.search(pvp_norm):
-            return Violation(
-                id_transaction=transaction.id_transaction,
-                transponder=transaction.transponder,
-                occurred_at=transaction.occurred_at,
-                PVP_code=transaction.PVP_code,
-                base_tariff=transaction.base_tariff,
-                reason="Проезд через ПВП 636 км"
+    @staticmethod
+    def build_violation(transaction, reason: str) -> Violation:
+        return Violation(
+            id_transaction=transaction.id_transaction,
+            transponder=transaction.transponder,
+            transponder_id=transaction.transponder_id,
+            pvp_id=transaction.pvp_id,
+            occurred_at=transaction.occurred_at,
+            PVP_code=transaction.PVP_code,
+            base_tariff=transaction.base_tariff or 0,
+            reason=reason
+        )
+
+    @classmethod
+    def rule_normalized(cls, rule: PVPPointBase) -> str:
+        if rule.match_type == "contains":
+            return rule.code.lower().strip()
+        return cls.normalize_pvp(rule.code)
+
+    @classmethod
+    def compile_rules(cls, rules: list[PVPPointBase]) -> RuleEngine:
+        """Компилирует правила (упорядоченные по приоритету) в векторный RuleEngine"""
+        ordered = sorted(enumerate(rules), key=lambda item: (item[1].priority, item[0]))
+        compiled = [
+            CompiledRule(
+                match_type=rule.match_type,
+                normalized=getattr(rule, "normalized", None) or cls.rule_normalized(rule),
+                reason=rule.description or cls.REASON_FORBIDDEN,
+                vehicle_class=rule.vehicle_class,
+                time_from=rule.time_from,
+                time_to=rule.time_to,
+                weekdays=rule.weekdays,
+                allowed_transponders=[normalize_transponder(t) for t in rule.allowed_transponders or []] or None,
+                min_tariff=rule.min_tariff,
+                max_tariff=rule.max_tariff,
             )
+            for _, rule in ordered
+        ]
+        return RuleEngine(compiled, cls.normalize_pvp)
+
+    async def seed_rules(self) -> int:
+        """Заполняет таблицу правил списком по умолчанию, если она пуста, и дополняет правила прежних версий"""
+        rules = [
+            PVPPoint(code=fragment, normalized=fragment, description=self.REASON_636,
+                     match_type="contains", priority=0)
+            for fragment in self.PVP_636_FRAGMENTS
+        ]
+        seen = set()
+        for code in self.FORBIDDEN_FULL:
+            normalized = self.normalize_pvp(code)
+            if normalized in seen:
+                continue
+            seen.add(normalized)
+            rules.append(PVPPoint(code=code, normalized=normalized, description=self.REASON_FORBIDDEN))
+
+        async def write(session) -> int:
+            if await session.scalar(select(func.count(PVPPoint.id_PVP))):
+                # Правила прежних версий сохранены без нормализованного кода, без него SQL-проверка их не видит
+                legacy = (await session.execute(select(PVPPoint).where(PVPPoint.normalized == ""))).scalars().all()
+                for point in legacy:
+                    point.normalized = self.rule_normalized(point)
+                return len(legacy)
+            session.add_all(rules)
+            return len(rules)
+
+        seeded = await db_writer.submit(write)
+        if seeded:
+            rule_matcher.invalidate()
+        return seeded
+
+    async def get_rules(self) -> list[PVPPoint]:
+        result = await self.session.execute(select(PVPPoint).order_by(PVPPoint.priority, PVPPoint.id_PVP))
+        return result.scalars().all()
+
+    async def add_rule(self, rule: PVPPointCreate) -> PVPPoint:
+        # Компиляция проверяет формат условий до записи в БД
+        compiled = self.compile_rules([rule]).rules[0]
+        point = PVPPoint(**rule.model_dump(), normalized=compiled.normalized)
+        point.time_from = format_minutes(compiled.minute_from)
+        point.time_to = format_minutes(compiled.minute_to)
+        point.weekdays = ",".join(map(str, compiled.weekdays)) if compiled.weekdays is not None else None
+        if rule.allowed_transponders is not None:
+            point.allowed_transponders = sorted({normalize_transponder(t) for t in rule.allowed_transponders})
+
+        async def write(session) -> PVPPoint:
+            session.add(point)
+            await session.flush()
+            return point
+
+        await db_writer.submit(write)
+        rule_matcher.invalidate()
+        return point
+
+    async def delete_rule(self, id_pvp: int) -> bool:
+        async def write(session) -> int:
+            result = await session.execute(delete(PVPPoint).where(PVPPoint.id_PVP == id_pvp))
+            return result.rowcount or 0
+
+        deleted = await db_writer.submit(write)
+        rule_matcher.invalidate()
+        return bool(deleted)
+
+    @staticmethod
+    def _minutes(column):
+        return cast(func.strftime("%H", column), Integer) * 60 + cast(func.strftime("%M", column), Integer)
+
+    @staticmethod
+    def _rule_minutes(column):
+        return cast(func.substr(column, 1, 2), Integer) * 60 + cast(func.substr(column, 4, 2), Integer)
+
+    @classmethod
+    def _rule_conditions(cls):
+        """SQL-аналог CompiledRule.mask: условия правила PVPPoint для строки Transaction"""
+        minute = cls._minutes(Transaction.occurred_at)
+        minute_from = cls._rule_minutes(PVPPoint.time_from)
+        minute_to = cls._rule_minutes(PVPPoint.time_to)
+        weekday = (cast(func.strftime("%w", Transaction.occurred_at), Integer) + 6) % 7
+        allowed = (
+            select(literal(1))
+            .select_from(func.json_each(PVPPoint.allowed_transponders).table_valued("value"))
+            .where(column("value") == Transaction.transponder)
+            .correlate(Transaction, PVPPoint)
+        )
+        return and_(
+            or_(PVPPoint.vehicle_class.is_(None), Transaction.vehicle_class == PVPPoint.vehicle_class),
+            or_(
+                PVPPoint.time_from.is_(None),
+                and_(minute_from <= minute_to, minute >= minute_from, minute < minute_to),
+                and_(minute_from > minute_to, or_(minute >= minute_from, minute < minute_to)),
+            ),
+            or_(
+                PVPPoint.weekdays.is_(None),
+                func.instr("," + PVPPoint.weekdays + ",", "," + cast(weekday, String) + ",") > 0,
+            ),
+            or_(PVPPoint.allowed_transponders.is_(None), ~allowed.exists()),
+            or_(PVPPoint.min_tariff.is_(None), Transaction.base_tariff >= PVPPoint.min_tariff),
+            or_(PVPPoint.max_tariff.is_(None), Transaction.base_tariff <= PVPPoint.max_tariff),
+        )
 
-        if pvp_norm in self.NORMALIZED_FORBIDDEN:
-            return Violation(
-                id_transaction=transaction.id_transaction,
-                transponder=transaction.transponder,
-                occurred_at=transaction.occurred_at,
-                PVP_code=transaction.PVP_code,
-                base_tariff=transaction.base_tariff,
-                reason="Запрещённый пункт ПВП"
+    @staticmethod
+    def _pvp_matches():
+        return or_(
+            and_(PVPPoint.match_type == "exact", PVPPoint.normalized == PVP.normalized),
+            and_(PVPPoint.match_type == "contains", func.instr(PVP.normalized, PVPPoint.normalized) > 0),
+        )
+
+    @classmethod
+    def _hits(cls, *conditions):
+        """
+        Подзапрос нарушений: транзакции ПВП, попавших хотя бы под одно правило,
+        с причиной самого приоритетного правила, чьи условия выполнены.
+        conditions дополнительно ограничивают транзакции, без них - вся история.
+        """
+        reason = (
+            select(func.coalesce(PVPPoint.description, cls.REASON_FORBIDDEN))
+            .where(cls._pvp_matches(), cls._rule_conditions())
+            .order_by(PVPPoint.priority, PVPPoint.id_PVP)
+            .limit(1)
+            .correlate(PVP, Transaction)
+            .scalar_subquery()
+        )
+        candidate_pvps = select(PVP.id_pvp).where(
+            select(PVPPoint.id_PVP).where(cls._pvp_matches()).correlate(PVP).exists()
+        )
+        rows = (
+            select(Transaction.id_transaction, reason.label("reason"))
+            .join(PVP, PVP.id_pvp == Transaction.pvp_id)
+            .where(Transaction.pvp_id.in_(candidate_pvps), *conditions)
+            .subquery()
+        )
+        return select(rows.c.id_transaction, rows.c.reason).where(rows.c.reason.is_not(None)).subquery("hits")
+
+    async def recompute_all(self) -> dict:
+        """
+        Пересчитывает нарушения по всей истории на стороне БД диапазонами ID транзакций:
+        удаляет устаревшие, обновляет причины и добавляет новые через INSERT ... SELECT.
+        Каждый диапазон - отдельная операция писателя, чтобы другие записи не ждали всей истории.
+        """
+        async with async_session_maker() as session:
+            first_id, last_id = (await session.execute(
+                select(func.min(Transaction.id_transaction), func.max(Transaction.id_transaction))
+            )).one()
+        totals = {"deleted": 0, "updated": 0, "inserted": 0}
+        for low in range((first_id or 1) - 1, last_id or 0, self.RECOMPUTE_SPAN):
+            high = min(low + self.RECOMPUTE_SPAN, last_id)
+            counts = await db_writer.submit(
+                lambda session, low=low, high=high: self._recompute_range(session, low, high)
             )
+            for key, value in counts.items():
+                totals[key] += value
+        # Версия данных повышается писателем после commit
+        return totals
+
+    @classmethod
+    async def _recompute_range(cls, session, low: int, high: int) -> dict:
+        """Операция писателя: пересчёт нарушений транзакций с ID в (low, high]"""
+        hits = cls._hits(Transaction.id_transaction > low, Transaction.id_transaction <= high)
+        in_range = (Violation.id_transaction > low, Violation.id_transaction <= high)
+
+        deleted = await session.execute(
+            delete(Violation)
+            .where(*in_range, Violation.id_transaction.not_in(select(hits.c.id_transaction)))
+            .execution_options(synchronize_session=False)
+        )
 
-        return None
+        new_reason = (
+            select(hits.c.reason)
+            .where(hits.c.id_transaction == Violation.id_transaction)
+            .scalar_subquery()
+        )
+        updated = await session.execute(
+            update(Violation)
+            .where(*in_range, Violation.reason.is_distinct_from(new_reason))
+            .values(reason=new_reason)
+            .execution_options(synchronize_session=False)
+        )
+
+        already = select(Violation.id_transaction).where(Violation.id_transaction == Transaction.id_transaction)
+        source = (
+            select(
+                Transaction.id_transaction,
+                Transaction.transponder,
+                Transaction.transponder_id,
+                Transaction.occurred_at,
+                Transaction.PVP_code,
+                Transaction.pvp_id,
+                func.coalesce(Transaction.base_tariff, 0),
+                hits.c.reason,
+                literal(datetime.now(UTC)),
+            )
+            .join(hits, hits.c.id_transaction == Transaction.id_transaction)
+            .where(~already.exists())
+        )
+        inserted = await session.execute(
+            insert(Violation).from_select(
+                ["id_transaction", "transponder", "transponder_id", "occurred_at", "PVP_code",
+                 "pvp_id", "base_tariff", "reason", "detected_at"],
+                source,
+            )
+        )
+        return {
+            "deleted": deleted.rowcount or 0,
+            "updated": updated.rowcount or 0,
+            "inserted": inserted.rowcount or 0,
+        }
+
+    async def simulate(
+            self,
+            rules: list[PVPPointCreate],
+            date_from: str | None = None,
+            date_to: str | None = None,
+    ) -> dict:
+        """
+        Оценка набора правил без записи нарушений.
+        Правила проверяются только по гистограмме различных значений ПВП (и измерений,
+        которые используют условия правил) за период, поэтому стоимость не зависит от объёма истории.
+        """
+        start, end = get_last_quarter_range()
+        if date_from:
+            start = datetime.combine(self.parse_date_optional(date_from), time.min)
+        if date_to:
+            end = datetime.combine(self.parse_date_optional(date_to), time.max)
+
+        candidate_engine = self.compile_rules(rules)
+        current_engine = await rule_matcher.load()
+        dimensions = {
+            "PVP_code": Transaction.PVP_code,
+            "vehicle_class": Transaction.vehicle_class,
+            "minute_of_day": self._minutes(Transaction.occurred_at),
+            "weekday": (cast(func.strftime("%w", Transaction.occurred_at), Integer) + 6) % 7,
+            "transponder": Transaction.transponder,
+            "base_tariff": Transaction.base_tariff,
+        }
+        needed = ["PVP_code"] + sorted(candidate_engine.columns | current_engine.columns)
+        group_by = [dimensions[name].label(name) for name in needed]
+
+        histogram = (await self.session.execute(
+            select(*group_by, func.count().label("trips"), func.coalesce(func.sum(Transaction.paid), 0).label("paid"))
+            .where(Transaction.occurred_at >= start, Transaction.occurred_at <= end)
+            .group_by(*[dimensions[name] for name in needed])
+        )).all()
+        frame = pd.DataFrame(histogram, columns=needed + ["trips", "paid"])
+
+        candidate_reasons = candidate_engine.evaluate(frame)
+        current_reasons = current_engine.evaluate(frame)
+        frame["reason"] = candidate_reasons
+        hit = frame[pd.notna(candidate_reasons)]
+        current_hit = frame[pd.notna(current_reasons)]
+        by_code = (
+            hit.groupby(["PVP_code", "reason"], as_index=False)[["trips", "paid"]].sum()
+            .sort_values("paid", ascending=False)
+        )
+
+        return {
+            "date_from": start,
+            "date_to": end,
+            "distinct_codes": int(frame["PVP_code"].nunique()),
+            "candidate": {"violations": int(hit["trips"].sum()), "paid": float(hit["paid"].sum())},
+            "current": {"violations": int(current_hit["trips"].sum()), "paid": float(current_hit["paid"].sum())},
+            "by_code": [
+                {"PVP_code": row.PVP_code, "reason": row.reason, "violations": int(row.trips), "paid": float(row.paid)}
+                for row in by_code.itertuples(index=False)
+            ],
+        }
 
     async def process_transactions(self, transactions: list[Transaction]):
-        created = 0
-        existing_result = await self.session.execute(select(Violation.id_transaction))
-        existing_ids = {row[0] for row in existing_result.all()}
+        ids = [tx.id_transaction for tx in transactions]
 
-        for tx in transactions:
-            if tx.id_transaction in existing_ids:
-                continue
-            violation = await self.detect_violation(tx)
-            if violation:
-                self.session.add(violation)
-                created += 1
-        await self.session.commit()
-        return created
+        async def write(session) -> int:
+            # Проверка существующих нарушений в той же транзакции, что и запись
+            existing_result = await session.execute(
+                select(Violation.id_transaction).where(Violation.id_transaction.in_(ids))
+            )
+            existing_ids = {row[0] for row in existing_result.all()}
+            created = 0
+            for tx in transactions:
+                if tx.id_transaction in existing_ids:
+                    continue
+                violation = await self.detect_violation(tx)
+                if violation:
+                    session.add(violation)
+                    created += 1
+            return created
+
+        return await db_writer.submit(write)
+
+    @staticmethod
+    def list_columns() -> dict:
+        """Поля списка нарушений, доступные через fields=: колонки нарушения и оплата из транзакции"""
+        columns = {name: getattr(Violation, name) for name in (
+            "id_violation", "id_transaction", "transponder", "transponder_id", "occurred_at",
+            "PVP_code", "pvp_id", "base_tariff", "reason", "detected_at",
+        )}
+        columns["discount"] = Transaction.discount
+        columns["paid"] = Transaction.paid
+        return columns
 
     async def get_violations(
             self,
@@ -89,18 +409,27 @@ class ViolationService:
             transponder: str = "",
             date_from: str | None = None,
             date_to: str | None = None,
+            fields: str | None = None,
     ):
+        columns = self.list_columns()
+        fields = parse_fields(fields, list(columns))
         date_from = self.parse_date_optional(date_from)
         date_to = self.parse_date_optional(date_to)
         offset = (page - 1) * page_size
 
+        transponder_id = None
+        if transponder:
+            transponder_id = await dimension_cache.find_transponder(transponder)
+            if transponder_id is None:
+                return {"items": [], "total": 0}
+
         base_query = (
             select(Violation)
             .join(Transaction, Transaction.id_transaction == Violation.id_transaction)
         )
 
-        if transponder:
-            base_query = base_query.where(Violation.transponder == transponder)
+        if transponder_id:
+            base_query = base_query.where(Violation.transponder_id == transponder_id)
 
         if date_from:
             base_query = base_query.where(Violation.occurred_at >= datetime.combine(date_from, time.min))
@@ -112,12 +441,13 @@ class ViolationService:
         total = (await self.session.execute(count_query)).scalar()
 
         query = (
-            select(Violation, Transaction.discount, Transaction.paid)
+            select(*[columns[name] for name in fields])
+            .select_from(Violation)
             .join(Transaction, Transaction.id_transaction == Violation.id_transaction)
         )
 
-        if transponder:
-            query = query.where(Violation.transponder == transponder)
+        if transponder_id:
+            query = query.where(Violation.transponder_id == transponder_id)
 
         if date_from:
             query = query.where(Violation.occurred_at >= datetime.combine(date_from, time.min))
@@ -132,14 +462,10 @@ class ViolationService:
             .limit(page_size)
         )
 
-        result = await self.session.execute(query)
-
-        items = []
-        for violation, discount, paid in result.all():
-            v = violation.__dict__.copy()
-            v["discount"] = discount
-            v["paid"] = paid
-            items.append(v)
+        items = to_dicts(fields, (await self.session.execute(query)).all())
+        total, items = await archive_store.page(
+            archive_store.VIOLATION, total, items, offset, page_size, transponder_id, date_from, date_to, fields
+        )
 
         return {
             "items": items,
@@ -184,9 +510,9 @@ class ViolationService:
 
     async def get_transponders(self):
         result = await self.session.execute(
-            select(Violation.transponder)
-            .distinct()
-            .order_by(Violation.transponder)
+            select(Transponder.code)
+            .where(Transponder.id_transponder.in_(select(Violation.transponder_id).distinct()))
+            .order_by(Transponder.code)
         )
         return [row[0] for row in result]
 
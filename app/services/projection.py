@@ -0,0 +1,15 @@
+from typing import Dict, List, Optional, Sequence
+
+def parse_fields(fields: Optional[str], available: Sequence[str]) -> List[str]:
+    """Поля из параметра вида fields=a,b,c в порядке запроса; пустой параметр - все доступные поля"""
+    if not fields:
+        return list(available)
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValueError(f"Неизвестные поля: {', '.join(unknown)}. Доступны: {', '.join(available)}")
+    return names
+
+def to_dicts(names: Sequence[str], rows) -> List[Dict]:
+    """Строки-кортежи запроса в словари без создания ORM-объектов"""
+    return [dict(zip(names, row)) for row in rows]
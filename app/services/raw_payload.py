@@ -0,0 +1,127 @@
+import json
+import zlib
+from datetime import datetime, timedelta, UTC
+from typing import Dict, Optional, Tuple
+from sqlmodel import select, delete, text, inspect
+from ..models.transaction_raw import TransactionRaw
+from ..services.db_writer import db_writer
+from ..database import async_session_maker, engine
+from ..config import settings
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+class RawPayload:
+    """Хранение исходных строк транзакций в сжатом виде в отдельной таблице"""
+
+    CODEC = "zstd" if zstandard else "zlib"
+    MIGRATE_BATCH = 1000
+
+    @classmethod
+    def encode(cls, raw: Dict) -> Tuple[str, bytes]:
+        """Сериализует и сжимает исходную строку"""
+        data = json.dumps(raw, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if cls.CODEC == "zstd":
+            return "zstd", zstandard.ZstdCompressor(level=6).compress(data)
+        return "zlib", zlib.compress(data, 6)
+
+    @staticmethod
+    def decode(codec: str, payload: bytes) -> Dict:
+        """Распаковывает исходную строку"""
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("Для чтения данных требуется пакет zstandard")
+            data = zstandard.ZstdDecompressor().decompress(payload)
+        else:
+            data = zlib.decompress(payload)
+        return json.loads(data)
+
+    @classmethod
+    def build(cls, id_transaction: int, raw: Dict, created_at: Optional[datetime] = None) -> TransactionRaw:
+        """created_at - момент сохранения исходной строки, от него отсчитывается срок хранения"""
+        codec, payload = cls.encode(raw)
+        raw_row = TransactionRaw(id_transaction=id_transaction, codec=codec, payload=payload)
+        if created_at is not None:
+            raw_row.created_at = created_at
+        return raw_row
+
+    @staticmethod
+    async def get(id_transaction: int) -> Optional[Dict]:
+        """Возвращает исходную строку транзакции или None"""
+        async with async_session_maker() as session:
+            raw = await session.get(TransactionRaw, id_transaction)
+            if raw is None:
+                return None
+            return RawPayload.decode(raw.codec, raw.payload)
+
+    @staticmethod
+    async def purge(retention_days: int | None = None) -> int:
+        """Удаляет исходные строки старше срока хранения"""
+        days = settings.RAW_RETENTION_DAYS if retention_days is None else retention_days
+        if days <= 0:
+            return 0
+        border = datetime.now(UTC) - timedelta(days=days)
+
+        async def write(session) -> int:
+            result = await session.execute(delete(TransactionRaw).where(TransactionRaw.created_at < border))
+            return result.rowcount or 0
+
+        return await db_writer.submit(write)
+
+    @classmethod
+    async def migrate_inline(cls) -> int:
+        """
+        Переносит raw_row из таблицы transaction старого формата в сжатую боковую таблицу,
+        затем удаляет колонку и сжимает файл БД, чтобы место действительно освободилось.
+        Срок хранения перенесённых строк отсчитывается от created_at их транзакций.
+        """
+        async with engine.connect() as conn:
+            columns = await conn.run_sync(
+                lambda sync_conn: [c["name"] for c in inspect(sync_conn).get_columns("transaction")]
+            )
+        if "raw_row" not in columns:
+            return 0
+
+        async def write(session) -> int:
+            """Одна порция переноса; 0 - переносить больше нечего"""
+            rows = (await session.execute(text(
+                'SELECT id_transaction, raw_row, created_at FROM "transaction" '
+                'WHERE raw_row IS NOT NULL LIMIT :limit'
+            ), {"limit": cls.MIGRATE_BATCH})).all()
+            if not rows:
+                return 0
+            ids = [row[0] for row in rows]
+            existing = set((await session.execute(
+                select(TransactionRaw.id_transaction).where(TransactionRaw.id_transaction.in_(ids))
+            )).scalars().all())
+            for id_transaction, raw_row, created_at in rows:
+                raw = json.loads(raw_row) if isinstance(raw_row, str) else raw_row
+                if id_transaction in existing or not raw:
+                    continue
+                if isinstance(created_at, str):
+                    created_at = datetime.fromisoformat(created_at)
+                session.add(cls.build(id_transaction, raw, created_at))
+            await session.execute(
+                text('UPDATE "transaction" SET raw_row = NULL WHERE id_transaction IN ({})'.format(
+                    ",".join(str(i) for i in ids)
+                ))
+            )
+            return len(rows)
+
+        moved = 0
+        while True:
+            batch = await db_writer.submit(write)
+            if not batch:
+                break
+            moved += batch
+
+        async def drop_column(session):
+            await session.execute(text('ALTER TABLE "transaction" DROP COLUMN raw_row'))
+
+        await db_writer.submit(drop_column)
+        async with engine.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text("VACUUM"))
+        return moved
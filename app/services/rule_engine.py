@@ -0,0 +1,160 @@
+from typing import Callable, Dict, Iterable, List, Optional, Set
+import numpy as np
+import pandas as pd
+
+
+def parse_minutes(value: str | None) -> Optional[int]:
+    """Переводит время суток 'ЧЧ:ММ' в минуты от полуночи"""
+    if value is None or value == "":
+        return None
+    hours, minutes = str(value).strip().split(":")[:2]
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"Некорректное время суток: {value}")
+    return hours * 60 + minutes
+
+
+def format_minutes(value: int | None) -> Optional[str]:
+    return None if value is None else f"{value // 60:02d}:{value % 60:02d}"
+
+
+def parse_weekdays(value: str | None) -> Optional[List[int]]:
+    """Разбирает список дней недели '0,1,2' (0 - понедельник)"""
+    if value is None or str(value).strip() == "":
+        return None
+    days = sorted({int(part) for part in str(value).split(",") if part.strip()})
+    if any(day < 0 or day > 6 for day in days):
+        raise ValueError(f"Некорректные дни недели: {value}")
+    return days
+
+
+class CompiledRule:
+    """Правило, скомпилированное в векторные предикаты над батчем транзакций"""
+
+    def __init__(
+            self,
+            match_type: str,
+            normalized: str,
+            reason: str,
+            vehicle_class: Optional[int] = None,
+            time_from: Optional[str] = None,
+            time_to: Optional[str] = None,
+            weekdays: Optional[str] = None,
+            allowed_transponders: Optional[Iterable[str]] = None,
+            min_tariff: Optional[float] = None,
+            max_tariff: Optional[float] = None,
+    ):
+        if match_type not in ("exact", "contains"):
+            raise ValueError(f"Неизвестный способ сравнения: {match_type}")
+        self.match_type = match_type
+        self.normalized = normalized
+        self.reason = reason
+        self.vehicle_class = vehicle_class
+        self.minute_from = parse_minutes(time_from)
+        self.minute_to = parse_minutes(time_to)
+        if (self.minute_from is None) != (self.minute_to is None):
+            raise ValueError("Интервал времени задаётся обеими границами")
+        self.weekdays = parse_weekdays(weekdays)
+        self.allowed_transponders = list(allowed_transponders) if allowed_transponders else None
+        self.min_tariff = min_tariff
+        self.max_tariff = max_tariff
+
+    def matches_pvp(self, normalized: str) -> bool:
+        if self.match_type == "exact":
+            return normalized == self.normalized
+        return self.normalized in normalized
+
+    @property
+    def columns(self) -> Set[str]:
+        """Колонки батча, от которых зависит правило помимо PVP_code"""
+        needed = set()
+        if self.vehicle_class is not None:
+            needed.add("vehicle_class")
+        if self.minute_from is not None:
+            needed.add("minute_of_day")
+        if self.weekdays is not None:
+            needed.add("weekday")
+        if self.allowed_transponders is not None:
+            needed.add("transponder")
+        if self.min_tariff is not None or self.max_tariff is not None:
+            needed.add("base_tariff")
+        return needed
+
+    def mask(self, frame: pd.DataFrame, mask: np.ndarray) -> np.ndarray:
+        """Сужает маску совпавших по ПВП строк условиями правила"""
+        if self.vehicle_class is not None:
+            mask &= (frame["vehicle_class"] == self.vehicle_class).to_numpy(dtype=bool)
+        if self.minute_from is not None:
+            minutes = frame["minute_of_day"].to_numpy()
+            if self.minute_from <= self.minute_to:
+                mask &= (minutes >= self.minute_from) & (minutes < self.minute_to)
+            else:
+                mask &= (minutes >= self.minute_from) | (minutes < self.minute_to)
+        if self.weekdays is not None:
+            mask &= frame["weekday"].isin(self.weekdays).to_numpy(dtype=bool)
+        if self.allowed_transponders is not None:
+            mask &= ~frame["transponder"].isin(self.allowed_transponders).to_numpy(dtype=bool)
+        if self.min_tariff is not None:
+            mask &= (frame["base_tariff"] >= self.min_tariff).to_numpy(dtype=bool)
+        if self.max_tariff is not None:
+            mask &= (frame["base_tariff"] <= self.max_tariff).to_numpy(dtype=bool)
+        return mask
+
+
+class RuleEngine:
+    """
+    Вычисляет правила над целыми батчами.
+    Совпадение по ПВП считается один раз на уникальный код, условия - масками NumPy/pandas.
+    Правила передаются упорядоченными по приоритету, строке назначается первое совпавшее.
+    """
+
+    def __init__(self, rules: List[CompiledRule], normalizer: Callable[[str], str]):
+        self.rules = rules
+        self.normalizer = normalizer
+        self._normalized: Dict[str, str] = {}
+
+    @property
+    def columns(self) -> Set[str]:
+        needed = set()
+        for rule in self.rules:
+            needed |= rule.columns
+        return needed
+
+    @staticmethod
+    def prepare(frame: pd.DataFrame) -> pd.DataFrame:
+        """Добавляет производные колонки времени суток и дня недели, если их нет"""
+        if "occurred_at" in frame and ("minute_of_day" not in frame or "weekday" not in frame):
+            occurred = pd.to_datetime(frame["occurred_at"])
+            frame = frame.assign(
+                minute_of_day=occurred.dt.hour * 60 + occurred.dt.minute,
+                weekday=occurred.dt.weekday,
+            )
+        return frame
+
+    def evaluate(self, frame: pd.DataFrame) -> np.ndarray:
+        """Возвращает массив причин нарушения (None там, где правила не сработали)"""
+        reasons = np.full(len(frame), None, dtype=object)
+        if not len(frame) or not self.rules:
+            return reasons
+        frame = self.prepare(frame.reset_index(drop=True))
+        codes, uniques = pd.factorize(frame["PVP_code"].fillna(""))
+        normalized = []
+        for code in uniques:
+            if code not in self._normalized:
+                self._normalized[code] = self.normalizer(code)
+            normalized.append(self._normalized[code])
+
+        assigned = np.zeros(len(frame), dtype=bool)
+        for rule in self.rules:
+            pvp_hits = np.fromiter((rule.matches_pvp(n) for n in normalized), dtype=bool, count=len(normalized))
+            if not pvp_hits.any():
+                continue
+            mask = pvp_hits[codes] & ~assigned
+            if not mask.any():
+                continue
+            mask = rule.mask(frame, mask)
+            reasons[mask] = rule.reason
+            assigned |= mask
+            if assigned.all():
+                break
+        return reasons
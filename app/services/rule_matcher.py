@@ -0,0 +1,57 @@
+import asyncio
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+from sqlmodel import select
+from ..models.pvp_point import PVPPoint
+from ..database import async_session_maker
+from ..services.rule_engine import RuleEngine
+
+class RuleMatcher:
+    """
+    Кэш правил запрещённых ПВП в памяти процесса.
+    Правила компилируются в RuleEngine один раз и переиспользуются при записи батчей.
+    Семантика совпадает с recompute_all: exact - равенство нормализованных кодов,
+    contains - вхождение подстроки, при нескольких совпадениях берётся правило с меньшим priority.
+    """
+
+    def __init__(self):
+        self._engine: Optional[RuleEngine] = None
+        self._lock = asyncio.Lock()
+        # Счётчик сбросов: load, во время которого правила изменились, не должен публиковать старый набор
+        self._generation = 0
+
+    async def load(self) -> RuleEngine:
+        async with self._lock:
+            while self._engine is None:
+                from ..services.models_service.violation_service import ViolationService
+                generation = self._generation
+                async with async_session_maker() as session:
+                    result = await session.execute(
+                        select(PVPPoint).order_by(PVPPoint.priority, PVPPoint.id_PVP)
+                    )
+                    points = result.scalars().all()
+                engine = ViolationService.compile_rules(points)
+                if generation == self._generation:
+                    self._engine = engine
+            return self._engine
+
+    def invalidate(self):
+        """Сбрасывает кэш после изменения правил"""
+        self._generation += 1
+        self._engine = None
+
+    async def evaluate(self, transactions: List) -> np.ndarray:
+        """Причины нарушений для списка транзакций (None, если правила не сработали)"""
+        engine = await self.load()
+        frame = pd.DataFrame({
+            "PVP_code": [t.PVP_code for t in transactions],
+            "occurred_at": [t.occurred_at for t in transactions],
+            "vehicle_class": [t.vehicle_class for t in transactions],
+            "transponder": [t.transponder for t in transactions],
+            "base_tariff": [t.base_tariff for t in transactions],
+        })
+        return engine.evaluate(frame)
+
+
+rule_matcher = RuleMatcher()
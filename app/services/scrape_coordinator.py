@@ -0,0 +1,153 @@
+import asyncio
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from ..services.avtodor_manager import avtodor_manager
+
+logger = logging.getLogger(__name__)
+
+class ScrapeJob:
+    """Скрапинг диапазона дней, результат которого ждут все присоединившиеся запросы"""
+
+    def __init__(self, date_from: date, date_to: date):
+        self.date_from = date_from
+        self.date_to = date_to
+        self.future = asyncio.get_running_loop().create_future()
+        # Исключение забирают ожидающие; без них оно не должно попадать в лог как необработанное
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.requests = 1
+
+    def touches(self, date_from: date, date_to: date) -> bool:
+        """Пересекается или смыкается с диапазоном"""
+        return date_from <= self.date_to + timedelta(days=1) and self.date_from <= date_to + timedelta(days=1)
+
+    def uncovered(self, date_from: date, date_to: date) -> List[Tuple[date, date]]:
+        """Части диапазона, которые не входят в это задание"""
+        pieces = []
+        if date_from < self.date_from:
+            pieces.append((date_from, min(date_to, self.date_from - timedelta(days=1))))
+        if date_to > self.date_to:
+            pieces.append((max(date_from, self.date_to + timedelta(days=1)), date_to))
+        return pieces
+
+    def as_dict(self) -> Dict:
+        return {"date_from": self.date_from, "date_to": self.date_to, "requests": self.requests}
+
+
+class ScrapeCoordinator:
+    """
+    Единая очередь скрапинга личного кабинета.
+    Браузер один, поэтому задания выполняются строго по очереди. Запрос, покрытый выполняющимся заданием,
+    присоединяется к нему; непокрытые части сливаются с пересекающимися или смежными заданиями в очереди.
+    Все присоединившиеся получают общий результат, и удаление диапазона перед записью
+    не затирает данные соседнего скрапинга.
+    """
+
+    def __init__(self, runner: Callable[[datetime, datetime], Awaitable[Dict]]):
+        self._runner = runner
+        self._running: Optional[ScrapeJob] = None
+        self._pending: List[ScrapeJob] = []
+        self._worker: Optional[asyncio.Task] = None
+
+    def _enqueue(self, date_from: date, date_to: date) -> Tuple[ScrapeJob, bool]:
+        """Ставит диапазон в очередь, сливая его с касающимися заданиями; True - создано новое задание"""
+        touching = [job for job in self._pending if job.touches(date_from, date_to)]
+        if not touching:
+            job = ScrapeJob(date_from, date_to)
+            self._pending.append(job)
+            return job, True
+        target = touching[0]
+        target.date_from = min([date_from] + [job.date_from for job in touching])
+        target.date_to = max([date_to] + [job.date_to for job in touching])
+        target.requests += 1
+        for job in touching[1:]:
+            # Поглощённое задание завершается вместе с тем, в которое оно влилось
+            self._pending.remove(job)
+            target.requests += job.requests
+            target.future.add_done_callback(lambda f, job=job: self._copy(f, job.future))
+        return target, False
+
+    @staticmethod
+    def _copy(source: asyncio.Future, target: asyncio.Future):
+        if target.done():
+            return
+        if source.cancelled():
+            target.cancel()
+        elif source.exception() is not None:
+            target.set_exception(source.exception())
+        else:
+            target.set_result(source.result())
+
+    def submit(self, date_from: date, date_to: date) -> Tuple[List[ScrapeJob], str]:
+        """
+        Регистрирует запрос и возвращает задания, которые его покрывают, и статус:
+        started - запущен новый скрапинг, joined - запрос уже выполняется, queued - ждёт очереди.
+        """
+        if isinstance(date_from, datetime):
+            date_from = date_from.date()
+        if isinstance(date_to, datetime):
+            date_to = date_to.date()
+        if date_to < date_from:
+            raise ValueError("Дата окончания раньше даты начала")
+
+        jobs = []
+        pieces = [(date_from, date_to)]
+        running = self._running
+        if running is not None and date_from <= running.date_to and running.date_from <= date_to:
+            running.requests += 1
+            jobs.append(running)
+            pieces = running.uncovered(date_from, date_to)
+        created = []
+        for start, end in pieces:
+            job, new = self._enqueue(start, end)
+            jobs.append(job)
+            if new:
+                created.append(job)
+
+        if not created:
+            status = "joined"
+        elif running is None and self._pending[0] is created[0]:
+            status = "started"
+        else:
+            status = "queued"
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._work())
+        return jobs, status
+
+    async def scrape(self, date_from: date, date_to: date) -> Dict:
+        """Скрапинг диапазона через очередь; ждёт общий результат всех покрывающих заданий"""
+        jobs, _ = self.submit(date_from, date_to)
+        results = await asyncio.gather(*[asyncio.shield(job.future) for job in jobs])
+        if len(results) == 1:
+            return results[0]
+        return {
+            "success": all(result.get("success") for result in results),
+            "scraped_count": sum(result.get("scraped_count", 0) for result in results),
+            "saved_count": sum(result.get("saved_count", 0) for result in results),
+            "message": "; ".join(result.get("message", "") for result in results),
+        }
+
+    async def _work(self):
+        while self._pending:
+            job = self._pending.pop(0)
+            self._running = job
+            try:
+                result = await self._runner(
+                    datetime.combine(job.date_from, time.min), datetime.combine(job.date_to, time.min)
+                )
+            except Exception as error:
+                logger.exception("Скрапинг %s - %s завершился ошибкой", job.date_from, job.date_to)
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(result)
+            finally:
+                self._running = None
+
+    def status(self) -> Dict:
+        return {
+            "running": self._running.as_dict() if self._running else None,
+            "pending": [job.as_dict() for job in self._pending],
+        }
+
+
+scrape_coordinator = ScrapeCoordinator(avtodor_manager.sync_transactions)
@@ -0,0 +1,114 @@
+from datetime import date, datetime, timedelta, UTC
+from typing import Dict, List, Optional, Set, Tuple
+from sqlmodel import select, update
+from ..models.scrape_run import ScrapeRun
+from ..models.scrape_checkpoint import ScrapeCheckpoint
+from ..services.db_writer import db_writer
+from ..database import async_session_maker
+from ..config import settings
+
+class ScrapeRuns:
+    """
+    Журнал скрапингов с контрольными точками по дням.
+    День фиксируется в БД вместе с его поездками, поэтому сбой посреди длинного диапазона
+    теряет только текущий день. Повторный скрапинг того же периода в пределах SCRAPE_RESUME_HOURS
+    пропускает дни, сохранённые незавершёнными запусками, и продолжает с первого несохранённого.
+    Вчерашний и сегодняшний дни не пропускаются: кабинет ещё дописывает по ним поездки.
+    """
+
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    # Незавершённый запуск, дни которого подхватил более поздний запуск
+    RESUMED = "resumed"
+
+    UNFINISHED = (RUNNING, FAILED)
+
+    @staticmethod
+    def days(date_from: date, date_to: date) -> List[date]:
+        return [date_from + timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+
+    @staticmethod
+    def open_from() -> date:
+        """Первый день, который ещё не закрыт и всегда скрапится заново"""
+        return date.today() - timedelta(days=1)
+
+    @classmethod
+    def _resumable(cls):
+        border = datetime.now(UTC) - timedelta(hours=settings.SCRAPE_RESUME_HOURS)
+        return ScrapeRun.status.in_(cls.UNFINISHED), ScrapeRun.started_at >= border
+
+    @classmethod
+    async def start(cls, date_from: date, date_to: date) -> Tuple[int, Set[date]]:
+        """Регистрирует запуск; возвращает его ID и дни, уже сохранённые прерванными запусками"""
+        async def write(session) -> Tuple[int, Set[date]]:
+            done = set((await session.execute(
+                select(ScrapeCheckpoint.day)
+                .join(ScrapeRun, ScrapeRun.id_run == ScrapeCheckpoint.id_run)
+                .where(
+                    *cls._resumable(),
+                    ScrapeCheckpoint.day >= date_from,
+                    ScrapeCheckpoint.day <= date_to,
+                    ScrapeCheckpoint.day < cls.open_from(),
+                )
+            )).scalars().all())
+            # Запуски, целиком вошедшие в новый, продолжает он
+            await session.execute(
+                update(ScrapeRun)
+                .where(*cls._resumable(), ScrapeRun.date_from >= date_from, ScrapeRun.date_to <= date_to)
+                .values(status=cls.RESUMED, finished_at=datetime.now(UTC))
+            )
+            run = ScrapeRun(
+                date_from=date_from, date_to=date_to,
+                days_total=len(cls.days(date_from, date_to)), days_done=len(done),
+            )
+            session.add(run)
+            await session.flush()
+            return run.id_run, done
+
+        return await db_writer.submit(write)
+
+    @staticmethod
+    async def checkpoint(session, id_run: int, day: date, scraped: int, saved: int):
+        """Операция писателя: отмечает день сохранённым; выполняется в транзакции с его поездками"""
+        session.add(ScrapeCheckpoint(id_run=id_run, day=day, scraped=scraped, saved=saved))
+        await session.execute(
+            update(ScrapeRun).where(ScrapeRun.id_run == id_run).values(days_done=ScrapeRun.days_done + 1)
+        )
+
+    @classmethod
+    async def finish(cls, id_run: int, error: Optional[str] = None):
+        async def write(session):
+            await session.execute(
+                update(ScrapeRun).where(ScrapeRun.id_run == id_run).values(
+                    status=cls.FAILED if error else cls.DONE,
+                    error=error,
+                    finished_at=datetime.now(UTC),
+                )
+            )
+
+        await db_writer.submit(write)
+
+    @classmethod
+    async def interrupted(cls) -> List[ScrapeRun]:
+        """
+        Прерванные запуски, которые ещё можно продолжить: упавшие и оставшиеся running
+        после остановки приложения. Запуски, вошедшие в более широкие, не дублируются.
+        """
+        async with async_session_maker() as session:
+            runs = (await session.execute(
+                select(ScrapeRun).where(*cls._resumable()).order_by(ScrapeRun.started_at)
+            )).scalars().all()
+        kept = []
+        for run in sorted(runs, key=lambda run: run.date_to - run.date_from, reverse=True):
+            if not any(other.date_from <= run.date_from and run.date_to <= other.date_to for other in kept):
+                kept.append(run)
+        return kept
+
+    @staticmethod
+    async def recent(limit: int = 20) -> List[Dict]:
+        async with async_session_maker() as session:
+            runs = (await session.execute(
+                select(ScrapeRun).order_by(ScrapeRun.id_run.desc()).limit(limit)
+            )).scalars().all()
+        return [run.model_dump() for run in runs]
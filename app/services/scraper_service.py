@@ -1,15 +1,16 @@
-from ..services.web_scraper.browser_manager import browser_manager
+from ..services.web_scraper.avtodor_session import avtodor_session
 from ..services.avtodor_manager import avtodor_manager
+from ..services.scrape_coordinator import scrape_coordinator
 from datetime import datetime
 
 class ScraperService:
     def __init__(self):
         self.manager = avtodor_manager
-        self.browser = browser_manager
+        self.session = avtodor_session
 
     async def scrape_range(self, date_from: datetime, date_to: datetime) -> dict:
         try:
-            result = await self.manager.sync_transactions(date_from, date_to)
+            result = await scrape_coordinator.scrape(date_from, date_to)
             return result
         except Exception as e:
             raise Exception(f"Ошибка при обновлении данных за диапазон: {e}")
@@ -20,7 +21,7 @@ class ScraperService:
             status = await self.manager.check_status()
             is_ready = status["initialized"] and status["authenticated"]
             if not is_ready:
-                is_ready = await self.browser.init
+                is_ready = await self.session.call(self.session.ensure_authenticated)
             return is_ready
         except Exception:
             return False
@@ -40,7 +41,7 @@ class ScraperService:
 
     async def reset_session(self):
         """Сбрасывает сессию"""
-        await self.browser.close
-        await self.browser.init
+        await self.session.call(self.session.close)
+        await self.session.call(self.session.initialize)
 
 scraper_service = ScraperService()
\ No newline at end of file
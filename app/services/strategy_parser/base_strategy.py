@@ -1,8 +1,13 @@
 from abc import ABC, abstractmethod
+from typing import Iterator
 import pandas as pd
 
 class BaseStrategy(ABC):
 
     @abstractmethod
     def parse(self, file) -> pd.DataFrame:
-        raise NotImplementedError("Метод parse должен быть реализован в дочернем классе")
\ No newline at end of file
+        raise NotImplementedError("Метод parse должен быть реализован в дочернем классе")
+
+    def iter_chunks(self, file, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """Потоковый разбор; по умолчанию файл разбирается целиком одним чанком"""
+        yield self.parse(file)
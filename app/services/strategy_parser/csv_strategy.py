@@ -1,7 +1,12 @@
 import pandas as pd
+from typing import Iterator
 from .base_strategy import BaseStrategy
 
 class CsvStrategy(BaseStrategy):
 
     def parse(self, file) -> pd.DataFrame:
-        return pd.read_csv(file, encoding="utf-8", sep=";")
\ No newline at end of file
+        return pd.read_csv(file, encoding="utf-8", sep=";")
+
+    def iter_chunks(self, file, chunk_size: int) -> Iterator[pd.DataFrame]:
+        with pd.read_csv(file, encoding="utf-8", sep=";", chunksize=chunk_size) as reader:
+            yield from reader
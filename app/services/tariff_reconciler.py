@@ -0,0 +1,354 @@
+import asyncio
+from datetime import datetime, UTC
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sqlmodel import select, delete, func, and_
+from ..models.tariff_delta import TariffDelta
+from ..models.tariff_reference import TariffReference
+from ..models.transaction import Transaction
+from ..services.watermark import Watermark
+from ..services.db_writer import db_writer
+from ..database import async_session_maker
+from ..config import settings
+
+class TariffReconciler:
+    """
+    Сверка тарифов.
+    Для каждой транзакции ожидаемая оплата считается как base_tariff × (1 − discount/100),
+    базовая стоимость сравнивается с эталоном для пары (ПВП, класс ТС) - медианой по недавним данным.
+    Расчёт идёт векторно над батчами, обрабатываются только новые строки и группы, у которых сменился эталон.
+    """
+
+    STATE_KEY = "tariff"
+    BATCH_SIZE = 5000
+    PVPS_PER_QUERY = 500
+
+    COLUMNS = [
+        "id_transaction", "transponder_id", "transponder", "occurred_at", "pvp_id", "PVP_code",
+        "vehicle_class", "base_tariff", "discount", "paid",
+    ]
+
+    _lock = asyncio.Lock()
+
+    @staticmethod
+    def _key(pvp_id, vehicle_class) -> Tuple[int, int]:
+        return int(pvp_id), -1 if vehicle_class is None else int(vehicle_class)
+
+    @staticmethod
+    def _numeric(series: pd.Series) -> pd.Series:
+        # Старые загрузки могли сохранить '-' вместо пустых чисел
+        return pd.to_numeric(series, errors="coerce")
+
+    @staticmethod
+    def _histogram_query(pvp_ids: Optional[List[int]]):
+        """
+        Гистограмма (ПВП, класс, тариф) -> количество за последние TARIFF_REFERENCE_MONTHS месяцев данных
+        каждой пары (ПВП, класс): окно отсчитывается от её последнего проезда, а не от текущей даты
+        """
+        vehicle_class = func.coalesce(Transaction.vehicle_class, -1)
+        scope = [Transaction.pvp_id.is_not(None), Transaction.base_tariff.is_not(None)]
+        if pvp_ids is not None:
+            scope.append(Transaction.pvp_id.in_(pvp_ids))
+        query = select(Transaction.pvp_id, Transaction.PVP_code, Transaction.vehicle_class,
+                       Transaction.base_tariff, func.count())
+        months = settings.TARIFF_REFERENCE_MONTHS
+        if months > 0:
+            latest = (
+                select(Transaction.pvp_id, vehicle_class.label("vehicle_class"),
+                       func.max(Transaction.occurred_at).label("latest"))
+                .where(*scope)
+                .group_by(Transaction.pvp_id, vehicle_class)
+                .subquery()
+            )
+            query = query.join(latest, and_(
+                latest.c.pvp_id == Transaction.pvp_id, latest.c.vehicle_class == vehicle_class,
+            ))
+            scope.append(Transaction.occurred_at >= func.datetime(latest.c.latest, f"-{months} months"))
+        return query.where(*scope).group_by(Transaction.pvp_id, Transaction.vehicle_class, Transaction.base_tariff)
+
+    @classmethod
+    async def build_references(
+            cls, session, pvp_ids: Optional[List[int]] = None,
+    ) -> Tuple[Dict[Tuple[int, int], float], set]:
+        """
+        Пересчитывает эталоны ПВП из pvp_ids (None - всех) по недавней гистограмме тарифов:
+        после повышения тарифа эталоном становится новая цена, а не медиана всей истории.
+        Возвращает все действующие эталоны и ключи групп, у которых они изменились.
+        """
+        previous = {
+            cls._key(ref.pvp_id, ref.vehicle_class): ref.tariff
+            for ref in (await session.execute(select(TariffReference))).scalars().all()
+            if ref.samples >= settings.TARIFF_REFERENCE_MIN_SAMPLES
+        }
+        if pvp_ids is None:
+            rows = (await session.execute(cls._histogram_query(None))).all()
+            await session.execute(delete(TariffReference))
+            kept = {}
+        else:
+            pvp_ids = sorted(set(pvp_ids))
+            rows = []
+            for offset in range(0, len(pvp_ids), cls.PVPS_PER_QUERY):
+                chunk = pvp_ids[offset:offset + cls.PVPS_PER_QUERY]
+                rows += (await session.execute(cls._histogram_query(chunk))).all()
+                await session.execute(delete(TariffReference).where(TariffReference.pvp_id.in_(chunk)))
+            touched = set(pvp_ids)
+            kept = {key: tariff for key, tariff in previous.items() if key[0] not in touched}
+            previous = {key: tariff for key, tariff in previous.items() if key[0] in touched}
+        histogram = pd.DataFrame(rows, columns=["pvp_id", "PVP_code", "vehicle_class", "base_tariff", "count"])
+        if histogram.empty:
+            return kept, set(previous)
+
+        keys = ["pvp_id", "vehicle_class"]
+        histogram["base_tariff"] = cls._numeric(histogram["base_tariff"])
+        histogram["vehicle_class"] = cls._numeric(histogram["vehicle_class"]).fillna(-1).astype(int)
+        histogram = histogram.dropna(subset=["base_tariff"])
+        histogram = histogram.groupby(keys + ["base_tariff"], as_index=False).agg(
+            PVP_code=("PVP_code", "first"), count=("count", "sum")
+        )
+        histogram = histogram.sort_values(keys + ["base_tariff"], kind="stable")
+        grouped = histogram.groupby(keys, sort=False)
+        histogram["cumulative"] = grouped["count"].cumsum()
+        histogram["samples"] = grouped["count"].transform("sum")
+        # Взвешенная медиана: первое значение, на котором накопленная частота достигает половины
+        medians = (
+            histogram[histogram["cumulative"] * 2 >= histogram["samples"]]
+            .groupby(keys, sort=False).first().reset_index()
+        )
+
+        now = datetime.now(UTC)
+        session.add_all([
+            TariffReference(
+                pvp_id=int(row.pvp_id),
+                PVP_code=row.PVP_code,
+                vehicle_class=None if row.vehicle_class == -1 else int(row.vehicle_class),
+                tariff=float(row.base_tariff),
+                samples=int(row.samples),
+                updated_at=now,
+            )
+            for row in medians.itertuples(index=False)
+        ])
+        usable = medians[medians["samples"] >= settings.TARIFF_REFERENCE_MIN_SAMPLES]
+        references = {
+            (int(pvp_id), int(vehicle_class)): float(tariff)
+            for pvp_id, vehicle_class, tariff in zip(usable["pvp_id"], usable["vehicle_class"], usable["base_tariff"])
+        }
+        changed = {
+            key for key in set(previous) | set(references)
+            if previous.get(key) != references.get(key)
+        }
+        return {**kept, **references}, changed
+
+    @classmethod
+    def evaluate(cls, frame: pd.DataFrame, references: Dict[Tuple[int, int], float]) -> pd.DataFrame:
+        """Векторный расчёт ожидаемой оплаты и отклонений; возвращает только строки с расхождениями"""
+        if frame.empty:
+            return frame
+        base = cls._numeric(frame["base_tariff"])
+        discount = cls._numeric(frame["discount"]).fillna(0)
+        paid = cls._numeric(frame["paid"])
+        expected = (base * (1 - discount / 100)).round(2)
+        paid_delta = (paid - expected).round(2)
+
+        vehicle_class = cls._numeric(frame["vehicle_class"]).fillna(-1).astype(int)
+        lookup = pd.Series(references, dtype=float)
+        if len(lookup):
+            index = pd.MultiIndex.from_arrays([frame["pvp_id"].astype(int), vehicle_class])
+            reference = pd.Series(lookup.reindex(index).to_numpy(), index=frame.index)
+        else:
+            reference = pd.Series(np.nan, index=frame.index)
+        tariff_delta = (base - reference).round(2)
+
+        paid_over = (paid_delta > settings.TARIFF_TOLERANCE).fillna(False)
+        paid_mismatch = (paid_delta.abs() > settings.TARIFF_TOLERANCE).fillna(False)
+        tariff_over = (
+            tariff_delta > np.maximum(reference * settings.TARIFF_REFERENCE_TOLERANCE_PCT / 100,
+                                      settings.TARIFF_TOLERANCE)
+        ).fillna(False)
+        flagged = (paid_mismatch | tariff_over).to_numpy(dtype=bool)
+
+        result = frame.loc[flagged].copy()
+        result["base_tariff"] = base[flagged]
+        result["discount"] = discount[flagged].astype(int)
+        result["paid"] = paid[flagged]
+        result["vehicle_class"] = vehicle_class[flagged].where(vehicle_class[flagged] != -1)
+        result["expected_paid"] = expected[flagged]
+        result["paid_delta"] = paid_delta[flagged]
+        result["reference_tariff"] = reference[flagged]
+        result["tariff_delta"] = tariff_delta[flagged]
+        result["overcharge"] = (paid_over | tariff_over)[flagged]
+        return result
+
+    @staticmethod
+    def _to_models(result: pd.DataFrame) -> List[TariffDelta]:
+        records = result.astype(object).where(result.notna(), None).to_dict("records")
+        return [TariffDelta(**record) for record in records]
+
+    @classmethod
+    async def _reconcile(cls, session, references, condition) -> Tuple[int, int]:
+        """Проверяет транзакции под условием порциями по возрастанию ID"""
+        checked = flagged = 0
+        last_id = 0
+        columns = [getattr(Transaction, name) for name in cls.COLUMNS]
+        while True:
+            rows = (await session.execute(
+                select(*columns)
+                .where(condition, Transaction.id_transaction > last_id,
+                       Transaction.pvp_id.is_not(None), Transaction.base_tariff.is_not(None))
+                .order_by(Transaction.id_transaction)
+                .limit(cls.BATCH_SIZE)
+            )).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            frame = pd.DataFrame(rows, columns=cls.COLUMNS)
+            result = cls.evaluate(frame, references)
+            if not result.empty:
+                session.add_all(cls._to_models(result))
+                await session.flush()
+            checked += len(frame)
+            flagged += len(result)
+        return checked, flagged
+
+    @classmethod
+    async def _reconcile_all(cls) -> Dict:
+        """
+        Полная сверка диапазонами ID: каждый диапазон - отдельная операция писателя,
+        чтобы другие записи не ждали сверки всей истории.
+        """
+        async def prepare(session):
+            first_id, last_id = (await session.execute(
+                select(func.min(Transaction.id_transaction), func.max(Transaction.id_transaction))
+            )).one()
+            references, _ = await cls.build_references(session)
+            return (first_id or 1) - 1, last_id or 0, references
+
+        low, last_id, references = await db_writer.submit(prepare)
+
+        async def reconcile(session, low: int, high: int) -> Tuple[int, int]:
+            await session.execute(delete(TariffDelta).where(
+                TariffDelta.id_transaction > low, TariffDelta.id_transaction <= high,
+            ))
+            return await cls._reconcile(session, references, and_(
+                Transaction.id_transaction > low, Transaction.id_transaction <= high,
+            ))
+
+        checked = flagged = 0
+        for start in range(low, last_id, cls.BATCH_SIZE):
+            end = min(start + cls.BATCH_SIZE, last_id)
+            range_checked, range_flagged = await db_writer.submit(
+                lambda session, start=start, end=end: reconcile(session, start, end)
+            )
+            checked += range_checked
+            flagged += range_flagged
+
+        async def finish(session):
+            # Расхождения транзакций, удалённых до начала сверки
+            await session.execute(delete(TariffDelta).where(TariffDelta.id_transaction <= low))
+            Watermark.advance(await Watermark.get(session, cls.STATE_KEY), last_id)
+
+        await db_writer.submit(finish)
+        return {
+            "checked": checked,
+            "flagged": flagged,
+            "references": len(references),
+            "changed_references": None,
+            "last_transaction_id": last_id,
+        }
+
+    @classmethod
+    async def update(cls, full: bool = False) -> Dict:
+        """
+        Сверяет транзакции, появившиеся после прошлого запуска,
+        и перепроверяет группы, эталон которых изменился. full=True - перепроверить всё.
+        """
+        async with cls._lock:
+            if full or not await Watermark.position(cls.STATE_KEY):
+                return await cls._reconcile_all()
+
+            async def write(session):
+                state = await Watermark.get(session, cls.STATE_KEY)
+                last_id = (await session.execute(select(func.max(Transaction.id_transaction)))).scalar() or 0
+                # Эталоны пересчитываются только для ПВП, по которым пришли новые транзакции
+                touched = (await session.execute(
+                    select(Transaction.pvp_id).distinct().where(
+                        Transaction.id_transaction > state.value,
+                        Transaction.id_transaction <= last_id,
+                        Transaction.pvp_id.is_not(None),
+                    )
+                )).scalars().all()
+                references, changed = await cls.build_references(session, touched)
+
+                checked, flagged = await cls._reconcile(session, references, and_(
+                    Transaction.id_transaction > state.value,
+                    Transaction.id_transaction <= last_id,
+                ))
+                # Группы со сменившимся эталоном перепроверяются по ПВП целиком, со всеми классами
+                changed_pvps = sorted({pvp_id for pvp_id, _ in changed})
+                for offset in range(0, len(changed_pvps), cls.PVPS_PER_QUERY):
+                    chunk = changed_pvps[offset:offset + cls.PVPS_PER_QUERY]
+                    await session.execute(delete(TariffDelta).where(
+                        TariffDelta.id_transaction <= state.value,
+                        TariffDelta.pvp_id.in_(chunk),
+                    ))
+                    group_checked, group_flagged = await cls._reconcile(session, references, and_(
+                        Transaction.id_transaction <= state.value,
+                        Transaction.pvp_id.in_(chunk),
+                    ))
+                    checked += group_checked
+                    flagged += group_flagged
+
+                Watermark.advance(state, last_id)
+                return {
+                    "checked": checked,
+                    "flagged": flagged,
+                    "references": len(references),
+                    "changed_references": len(changed),
+                    "last_transaction_id": last_id,
+                }
+
+            return await db_writer.submit(write)
+
+    @staticmethod
+    async def get_references() -> List[TariffReference]:
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(TariffReference).order_by(TariffReference.PVP_code, TariffReference.vehicle_class)
+            )
+            return result.scalars().all()
+
+    @staticmethod
+    async def get_deltas(
+            overcharge_only: bool = True,
+            date_from: datetime | None = None,
+            date_to: datetime | None = None,
+            transponder: str | None = None,
+            page: int = 1,
+            page_size: int = 50,
+    ) -> Dict:
+        from ..services.dimension_cache import dimension_cache
+        conditions = []
+        if overcharge_only:
+            conditions.append(TariffDelta.overcharge.is_(True))
+        if transponder:
+            transponder_id = await dimension_cache.find_transponder(transponder)
+            if transponder_id is None:
+                return {"items": [], "total": 0, "page": page}
+            conditions.append(TariffDelta.transponder_id == transponder_id)
+        if date_from:
+            conditions.append(TariffDelta.occurred_at >= date_from)
+        if date_to:
+            conditions.append(TariffDelta.occurred_at <= date_to)
+
+        async with async_session_maker() as session:
+            total = (await session.execute(
+                select(func.count()).select_from(TariffDelta).where(*conditions)
+            )).scalar() or 0
+            result = await session.execute(
+                select(TariffDelta).where(*conditions)
+                .order_by(TariffDelta.occurred_at.desc())
+                .offset((page - 1) * page_size)
+                .limit(page_size)
+            )
+            items = result.scalars().all()
+        return {"items": items, "total": total, "page": page}
@@ -0,0 +1,40 @@
+from datetime import datetime, UTC
+from ..models.sync_state import SyncState
+from ..services.db_writer import db_writer
+from ..database import async_session_maker
+
+class Watermark:
+    """Позиция инкрементальной обработки транзакций: последний обработанный ID и дата для пересчёта"""
+
+    @staticmethod
+    async def get(session, key: str) -> SyncState:
+        state = await session.get(SyncState, key)
+        if state is None:
+            state = SyncState(key=key, value=0)
+            session.add(state)
+        return state
+
+    @staticmethod
+    async def position(key: str) -> int:
+        """Последний обработанный ID без участия писателя; 0 - обработка ещё не запускалась"""
+        async with async_session_maker() as session:
+            state = await session.get(SyncState, key)
+            return state.value if state is not None else 0
+
+    @staticmethod
+    def advance(state: SyncState, last_id: int):
+        # ID не переиспользуются, поэтому позиция не откатывается, даже если старые строки удалены архивацией
+        state.value = max(state.value or 0, last_id)
+        state.marker = None
+        state.updated_at = datetime.now(UTC)
+
+    @classmethod
+    async def mark_dirty(cls, key: str, date_from: datetime):
+        """Помечает данные начиная с даты как требующие пересчёта (после удаления транзакций)"""
+        async def write(session):
+            state = await cls.get(session, key)
+            if state.marker is None or date_from < state.marker:
+                state.marker = date_from
+            state.updated_at = datetime.now(UTC)
+
+        await db_writer.submit(write)
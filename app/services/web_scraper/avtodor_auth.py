@@ -1,3 +1,4 @@
+from urllib.parse import urlsplit
 from selenium.webdriver.common.by import By
 from ...config import settings
 
@@ -11,6 +12,23 @@ class AvtodorAuth:
         self.browser = browser
         self.is_authenticated = False
         self._username = None
+        # Без драйвера сессии нет; после перезапуска её восстанавливает restore_session
+        browser.on_shutdown(self._on_browser_shutdown)
+
+    def _on_browser_shutdown(self):
+        self.is_authenticated = False
+
+    def restore_session(self, headless: bool = True) -> bool:
+        """
+        Поднимает остановленный браузер с сохранёнными cookies и проверяет, что сессия жива.
+        """
+        if not self.browser.can_restore:
+            return False
+        if self.browser.restore(headless=headless) and self.check_session_active():
+            self.is_authenticated = True
+            return True
+        self.browser.close()
+        return False
 
     def login(self, username: str, password: str, retries: int = 2) -> bool:
         """
@@ -100,10 +118,10 @@ class AvtodorAuth:
         Проверяет активность текущей сессии, возвращает True если сессия активна.
         """
         try:
-            self.browser.get("https://lk.avtodor-tr.ru/account/movement")
+            self.browser.get(f"{settings.CABINET_URL}/account/movement")
             self.browser.sleep(0.5)
             current = self.browser.driver.current_url
-            return "lk.avtodor-tr.ru" in current and "auth" not in current
+            return urlsplit(settings.CABINET_URL).netloc in current and "auth" not in current
         except Exception:
             return False
 
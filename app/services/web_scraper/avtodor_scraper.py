@@ -1,6 +1,14 @@
+import logging
 import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
+from ...services.web_scraper.snapshot_parser import SnapshotParser
+from ...config import settings
+
+logger = logging.getLogger(__name__)
 
 class AvtodorScraper:
     """
@@ -55,7 +63,7 @@ class AvtodorScraper:
         """
         if not self.auth.is_authenticated:
             raise RuntimeError("Session is not authenticated")
-        self.browser.get("https://lk.avtodor-tr.ru/account")
+        self.browser.get(f"{settings.CABINET_URL}/account")
         try:
             el = self.browser.wait((By.CSS_SELECTOR, "div.green"), timeout=10)
             return el.text.strip()
@@ -99,7 +107,7 @@ class AvtodorScraper:
         if not self.auth.is_authenticated:
             raise RuntimeError("Session is not authenticated")
         try:
-            self.browser.get("https://lk.avtodor-tr.ru/account/movement")
+            self.browser.get(f"{settings.CABINET_URL}/account/movement")
             self.browser.sleep(0.5)
             try:
                 date_from_input = self.browser.find(By.XPATH,
@@ -113,12 +121,12 @@ class AvtodorScraper:
                                                       "input[name='date_to'], input[data-test='date-to']")
 
             self._enter_date(date_from_input, date_from)
-            time.sleep(0.5)
+            self.browser.sleep(0.5)
             self._click_ok_button()
             self._enter_date(date_to_input, date_to)
-            time.sleep(0.5)
+            self.browser.sleep(0.5)
             self._click_ok_button()
-            time.sleep(1)
+            self.browser.sleep(1)
         except Exception:
             pass
         try:
@@ -127,30 +135,63 @@ class AvtodorScraper:
             self.browser.sleep(0.5)
         self._scroll_to_load_all()
         self.browser.sleep(1)
+        if settings.SCRAPE_CAPTURE_DIR:
+            self._capture(self.browser.driver.page_source, date_from, date_to)
+        if settings.SCRAPE_SNAPSHOT_PARSER and SnapshotParser.available():
+            trips = self._parse_snapshot()
+            if trips is not None:
+                return trips
+        return self.extract_rows()
+
+    def _parse_snapshot(self) -> Optional[list]:
+        """
+        Поездки из HTML страницы одним проходом lxml.
+        Разбор HTML не знает вычисленных стилей, поэтому результат сверяется с WebDriver
+        по числу строк таблицы и первым SCRAPE_SNAPSHOT_CHECK_ROWS поездкам; при расхождении возвращает None.
+        """
+        trips = SnapshotParser.parse(self.browser.driver.page_source)
+        rows = self._rows()
+        expected = self.extract_rows(rows[:settings.SCRAPE_SNAPSHOT_CHECK_ROWS])
+        if len(trips) > len(rows) or trips[:len(expected)] != expected:
+            logger.warning("Разбор HTML расходится с WebDriver, поездки читаются через драйвер")
+            return None
+        return trips
+
+    def _rows(self) -> list:
         try:
             wrapper = self.browser.find(By.CSS_SELECTOR, "div.el-table__body-wrapper")
-            rows = wrapper.find_elements(By.CSS_SELECTOR, "tbody tr.el-table__row")
+            return wrapper.find_elements(By.CSS_SELECTOR, "tbody tr.el-table__row")
         except Exception:
-            rows = self.browser.finds(By.CSS_SELECTOR, ".el-table__row")
+            return self.browser.finds(By.CSS_SELECTOR, ".el-table__row")
+
+    def extract_rows(self, rows: Optional[list] = None) -> list:
+        """
+        Поездки из таблицы открытой страницы через элементы WebDriver.
+        """
+        if rows is None:
+            rows = self._rows()
         trips = []
         for row in rows:
             try:
                 cols = row.find_elements(By.CSS_SELECTOR, "td, .cell")
-                def col(i):
-                    try:
-                        return cols[i].text.strip()
-                    except Exception:
-                        return "N/A"
-                trip = {
-                    "road": col(2),
-                    "transponder": col(4),
-                    "date": col(6),
-                    "amount": col(8),
-                    "discount": col(10),
-                    "paid": col(12),
-                }
-                if any(v and v != "N/A" for v in trip.values()):
+                trip = SnapshotParser.trip([self._cell_text(col) for col in cols])
+                if trip is not None:
                     trips.append(trip)
             except Exception:
                 continue
-        return trips
\ No newline at end of file
+        return trips
+
+    @staticmethod
+    def _cell_text(cell) -> str:
+        try:
+            return cell.text.strip()
+        except Exception:
+            return "N/A"
+
+    @staticmethod
+    def _capture(html: str, date_from: str, date_to: str):
+        """Сохраняет HTML страницы движения в SCRAPE_CAPTURE_DIR для офлайн-проверки разбора"""
+        folder = Path(settings.SCRAPE_CAPTURE_DIR)
+        folder.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        (folder / f"movement_{date_from}_{date_to}_{stamp}.html").write_text(html, encoding="utf-8")
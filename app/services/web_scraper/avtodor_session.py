@@ -1,18 +1,37 @@
+from typing import Any, Callable, Optional
 from ...config import settings
-from ...services.web_scraper.browser_manager import BrowserManager
+from ...services.web_scraper.browser_manager import browser_manager
 from ...services.web_scraper.avtodor_auth import AvtodorAuth
 from ...services.web_scraper.avtodor_scraper import AvtodorScraper
 
 class AvtodorSession:
     """
     Фасад для работы с Avtodor: управляет браузером, авторизацией и скрапингом.
+    Синхронные методы выполняются в потоке браузера, из асинхронного кода они вызываются через call.
     """
 
-    def __init__(self):
-        self.browser = BrowserManager()
+    def __init__(self, browser=browser_manager):
+        self.browser = browser
         self.auth = AvtodorAuth(self.browser)
         self.scraper = AvtodorScraper(self.browser, self.auth)
 
+    async def call(self, fn: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """Выполняет метод сессии в потоке браузера с таймаутом (по умолчанию BROWSER_COMMAND_TIMEOUT)"""
+        timeout = settings.BROWSER_COMMAND_TIMEOUT if timeout is None else timeout
+        return await self.browser.worker.call(fn, *args, timeout=timeout)
+
+    def ensure_authenticated(self, headless: bool = True) -> bool:
+        """
+        Авторизуется, если сессия ещё не авторизована.
+        Перед этим перезапускает разросшийся браузер и восстанавливает сессию из cookies.
+        """
+        self.browser.maintain()
+        if self.is_authenticated():
+            return True
+        if self.auth.restore_session(headless=headless):
+            return True
+        return self.initialize(headless=headless)
+
     def initialize(self, headless: bool = True) -> bool:
         """
         Инициализирует браузер и пытается выполнить авторизацию по настройкам.
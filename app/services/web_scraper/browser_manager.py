@@ -1,21 +1,51 @@
+import logging
 import threading
-import time
+from datetime import datetime, UTC
+from typing import Callable, Dict, List, Optional
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
+from ...services.web_scraper.browser_worker import BrowserWorker, BrowserCommandCancelled
+from ...config import settings
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
 
 class BrowserManager:
     """
     Менеджер браузерного драйвера Selenium.
     Отвечает за инициализацию, закрытие и базовые утилиты для работы с драйвером.
+    Методы вызываются из потока worker: асинхронный код ставит их туда через worker.call.
+
+    Жизненный цикл: после BROWSER_MAX_NAVIGATIONS переходов или при превышении BROWSER_MAX_RSS_MB
+    браузер перезапускается, после BROWSER_IDLE_MINUTES простоя - выключается. Cookies при этом
+    сохраняются, и следующая команда поднимает браузер с уже авторизованной сессией.
     """
 
     def __init__(self):
         self._driver = None
         self._lock = threading.RLock()
+        self._cookies: Optional[List[Dict]] = None
+        self._shutdown_listeners: List[Callable[[], None]] = []
+        self.profile: Optional[str] = None
+        self.navigations = 0
+        self.recycles = 0
+        self.idle_shutdowns = 0
+        self.started_at: Optional[datetime] = None
+        self.last_used_at: Optional[datetime] = None
+        self.worker = BrowserWorker(
+            "browser",
+            idle_timeout=settings.BROWSER_IDLE_MINUTES * 60 or None,
+            on_idle=self._on_idle,
+            after_command=self._after_command,
+        )
 
     @property
     def driver(self):
@@ -24,40 +54,200 @@ class BrowserManager:
         """
         return self._driver
 
-    def init(self, headless: bool = False, window_size: str = "1366,768"):
+    LEAN = "lean"
+    FULL = "full"
+
+    # Лёгкий профиль не грузит то, что скрапингу не нужно: картинки, шрифты, медиа и счётчики
+    BLOCKED_URLS = [
+        "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+        "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+        "*.mp4", "*.webm", "*.mp3", "*.ogg",
+        "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+        "*mc.yandex.ru*", "*top-fwz1.mail.ru*", "*vk.com/rtrg*", "*facebook.net*",
+    ]
+
+    @classmethod
+    def options(cls, profile: str, headless: bool = False, window_size: str = "1366,768") -> Options:
+        """
+        Параметры Chrome для профиля: full - обычный браузер, lean - headless без лишних загрузок.
+        """
+        if profile not in (cls.LEAN, cls.FULL):
+            raise ValueError(f"Неизвестный профиль браузера: {profile}")
+        options = Options()
+        if headless or profile == cls.LEAN:
+            options.add_argument("--headless=new")
+        options.add_argument(f"--window-size={window_size}")
+        options.add_argument("--disable-popup-blocking")
+        options.add_argument("--disable-blink-features=AutomationControlled")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--disable-extensions")
+        options.add_argument("--disable-infobars")
+        if profile == cls.LEAN:
+            # Команды ждут нужные элементы сами, полной загрузки страницы ждать не нужно
+            options.page_load_strategy = "eager"
+            options.add_argument("--disable-gpu")
+            options.add_argument("--disable-background-networking")
+            options.add_argument("--disable-component-update")
+            options.add_argument("--disable-default-apps")
+            options.add_argument("--disable-sync")
+            options.add_argument("--mute-audio")
+            options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        options.add_experimental_option("useAutomationExtension", False)
+        return options
+
+    @classmethod
+    def block_resources(cls, driver):
+        """Запрещает загрузку ресурсов из BLOCKED_URLS через CDP"""
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": cls.BLOCKED_URLS})
+
+    def init(self, headless: bool = False, window_size: str = "1366,768", profile: Optional[str] = None):
         """
         Инициализирует Chrome WebDriver (если ещё не инициализирован).
+        Профиль по умолчанию берётся из BROWSER_PROFILE; lean всегда запускается headless.
         """
         with self._lock:
             if self._driver is not None:
                 return
-            options = Options()
-            if headless:
-                options.add_argument("--headless=new")
-            options.add_argument(f"--window-size={window_size}")
-            options.add_argument("--disable-popup-blocking")
-            options.add_argument("--disable-blink-features=AutomationControlled")
-            options.add_argument("--no-sandbox")
-            options.add_argument("--disable-dev-shm-usage")
-            options.add_argument("--disable-extensions")
-            options.add_argument("--disable-infobars")
-            options.add_experimental_option("excludeSwitches", ["enable-automation"])
-            options.add_experimental_option("useAutomationExtension", False)
+            profile = profile or settings.BROWSER_PROFILE
+            options = self.options(profile, headless, window_size)
             service = Service(ChromeDriverManager().install())
             self._driver = webdriver.Chrome(service=service, options=options)
             self._driver.implicitly_wait(2)
+            if profile == self.LEAN:
+                try:
+                    self.block_resources(self._driver)
+                except Exception:
+                    logger.exception("Не удалось включить блокировку ресурсов")
+            self.profile = profile
+            self.navigations = 0
+            self.started_at = datetime.now(UTC)
+
+    def on_shutdown(self, listener: Callable[[], None]):
+        """Подписка на остановку драйвера: закрытие, перезапуск или выключение по простою"""
+        self._shutdown_listeners.append(listener)
+
+    def _quit(self):
+        if self._driver:
+            try:
+                self._driver.quit()
+            except Exception:
+                pass
+            self._driver = None
+            self.started_at = None
+            for listener in self._shutdown_listeners:
+                listener()
 
     def close(self):
         """
         Закрывает браузер и освобождает ресурсы.
         """
         with self._lock:
-            if self._driver:
+            self._cookies = None
+            self._quit()
+
+    def suspend(self):
+        """
+        Останавливает браузер, запоминая cookies для восстановления сессии.
+        """
+        with self._lock:
+            if self._driver is None:
+                return
+            try:
+                # CDP отдаёт cookies всех доменов, включая домен авторизации
+                self._cookies = self._driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+            except Exception:
                 try:
-                    self._driver.quit()
+                    self._cookies = self._driver.get_cookies()
                 except Exception:
-                    pass
-                self._driver = None
+                    self._cookies = None
+            self._quit()
+
+    @property
+    def can_restore(self) -> bool:
+        return self._driver is None and bool(self._cookies)
+
+    def restore(self, headless: bool = True) -> bool:
+        """
+        Поднимает остановленный браузер и возвращает в него сохранённые cookies.
+        """
+        with self._lock:
+            cookies = self._cookies
+            if not cookies:
+                return False
+            self.init(headless=headless)
+            try:
+                self._driver.execute_cdp_cmd("Network.setCookies", {"cookies": cookies})
+            except Exception:
+                logger.exception("Не удалось восстановить cookies браузера")
+                return False
+            return True
+
+    def rss_mb(self) -> Optional[float]:
+        """
+        Память процессов chromedriver и Chrome в МБ; None без psutil или без драйвера.
+        """
+        driver = self._driver
+        if psutil is None or driver is None:
+            return None
+        try:
+            root = psutil.Process(driver.service.process.pid)
+            processes = [root] + root.children(recursive=True)
+        except Exception:
+            return None
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                continue
+        return round(total / 1024 / 1024, 1)
+
+    def _after_command(self):
+        self.last_used_at = datetime.now(UTC)
+
+    def maintain(self) -> Optional[str]:
+        """
+        Перезапускает браузер после лимита переходов или памяти; возвращает причину перезапуска.
+        Вызывается перед очередной операцией, а не внутри неё, чтобы не терять сессию посреди работы.
+        """
+        if self._driver is None:
+            return None
+        reason = None
+        if settings.BROWSER_MAX_NAVIGATIONS and self.navigations >= settings.BROWSER_MAX_NAVIGATIONS:
+            reason = f"{self.navigations} переходов"
+        else:
+            rss = self.rss_mb()
+            if rss is not None and settings.BROWSER_MAX_RSS_MB and rss > settings.BROWSER_MAX_RSS_MB:
+                reason = f"{rss} МБ памяти"
+        if reason:
+            logger.info("Браузер перезапускается: %s", reason)
+            self.suspend()
+            self.recycles += 1
+        return reason
+
+    def _on_idle(self):
+        if self._driver is not None:
+            logger.info("Браузер выключен после простоя")
+            self.suspend()
+            self.idle_shutdowns += 1
+
+    def stats(self) -> Dict:
+        return {
+            "running": self._driver is not None,
+            "profile": self.profile,
+            "current_command": self.worker.current,
+            "navigations": self.navigations,
+            "recycles": self.recycles,
+            "idle_shutdowns": self.idle_shutdowns,
+            "rss_mb": self.rss_mb(),
+            "psutil": psutil is not None,
+            "session_saved": bool(self._cookies),
+            "started_at": self.started_at,
+            "last_used_at": self.last_used_at,
+        }
 
     def get(self, url: str):
         """
@@ -66,6 +256,7 @@ class BrowserManager:
         if self._driver is None:
             raise RuntimeError("Driver not initialized")
         self._driver.get(url)
+        self.navigations += 1
 
     def wait(self, selector: tuple, timeout: int = 20):
         """
@@ -125,11 +316,11 @@ class BrowserManager:
             raise RuntimeError("Driver not initialized")
         return self._driver.execute_script(script, *args)
 
-    @staticmethod
-    def sleep(seconds: float):
+    def sleep(self, seconds: float):
         """
-        Безопасная пауза (обёртка над time.sleep).
+        Пауза, на которой прерывается команда, которую перестали ждать.
         """
-        time.sleep(seconds)
+        if self.worker.interrupted.wait(seconds):
+            raise BrowserCommandCancelled("Команда браузера прервана")
 
 browser_manager = BrowserManager()
\ No newline at end of file
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+class BrowserCommandCancelled(BaseException):
+    """
+    Команда браузера прервана: ожидающий её вызов отменён или истёк таймаут.
+    Наследуется от BaseException, чтобы его не проглатывали повторы и except Exception в коде скрапинга.
+    """
+
+
+class BrowserWorker:
+    """
+    Собственный поток браузера.
+    Все обращения к драйверу выполняются в нём строго по очереди, поэтому драйвер никогда не трогают
+    два потока сразу, а ожидания WebDriver не занимают ни цикл событий, ни общий пул потоков.
+    """
+
+    def __init__(
+            self,
+            name: str = "browser",
+            idle_timeout: Optional[float] = None,
+            on_idle: Optional[Callable[[], None]] = None,
+            after_command: Optional[Callable[[], None]] = None,
+    ):
+        self._name = name
+        # Хуки жизненного цикла выполняются в этом же потоке между командами
+        self.idle_timeout = idle_timeout
+        self._on_idle = on_idle
+        self._after_command = after_command
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # Выставляется, когда вызывающий перестал ждать выполняющуюся команду
+        self.interrupted = threading.Event()
+        self.current: Optional[str] = None
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+
+    def _hook(self, hook: Optional[Callable[[], None]]):
+        if hook is None:
+            return
+        try:
+            hook()
+        except BaseException:
+            logger.exception("Ошибка обслуживания браузера")
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.idle_timeout or None)
+            except queue.Empty:
+                self._hook(self._on_idle)
+                continue
+            if item is None:
+                return
+            future, fn, args, kwargs = item
+            # Команда, отменённая до начала, просто снимается с очереди
+            if not future.set_running_or_notify_cancel():
+                continue
+            self.interrupted.clear()
+            self.current = getattr(fn, "__name__", repr(fn))
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as error:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+            finally:
+                self.current = None
+            self._hook(self._after_command)
+
+    def in_worker(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Ставит команду в очередь потока браузера"""
+        self._ensure_thread()
+        future = Future()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    async def call(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Выполняет команду в потоке браузера и ждёт результат.
+        При отмене или таймауте команда из очереди снимается, а выполняющаяся прерывается
+        на ближайшей паузе BrowserManager.sleep.
+        """
+        if self.in_worker():
+            return fn(*args, **kwargs)
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            if future.running():
+                self.interrupted.set()
+            raise
+
+    def stop(self):
+        """Завершает поток после уже поставленных команд"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._queue.put(None)
+            self._thread = None
@@ -0,0 +1,105 @@
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+class SnapshotParser:
+    """
+    Разбор сохранённого HTML страницы движения по счёту без WebDriver.
+    Возвращает те же словари поездок, что и обход элементов через Selenium, но одним проходом
+    по дереву вместо отдельного запроса к драйверу на каждую ячейку.
+    """
+
+    # Ячейки выбираются как "td, .cell": в списке чередуются td и вложенный div.cell, поэтому индексы чётные
+    COLUMNS = {"road": 2, "transponder": 4, "date": 6, "amount": 8, "discount": 10, "paid": 12}
+
+    ROWS = (
+        "//div[contains(concat(' ', normalize-space(@class), ' '), ' el-table__body-wrapper ')]"
+        "//tbody/tr[contains(concat(' ', normalize-space(@class), ' '), ' el-table__row ')]"
+    )
+    ANY_ROWS = "//*[contains(concat(' ', normalize-space(@class), ' '), ' el-table__row ')]"
+    CELLS = ".//td | .//*[contains(concat(' ', normalize-space(@class), ' '), ' cell ')]"
+
+    # Элементы, на границах которых innerText переносит строку
+    BLOCK_TAGS = {
+        "address", "article", "aside", "blockquote", "dd", "div", "dl", "dt", "footer", "form",
+        "h1", "h2", "h3", "h4", "h5", "h6", "header", "li", "ol", "p", "pre", "section", "table", "tr", "ul",
+    }
+    SKIP_TAGS = {"script", "style", "template", "noscript"}
+
+    # Выражения компилируются один раз, а не на каждую строку таблицы
+    _rows = etree.XPath(ROWS) if etree else None
+    _any_rows = etree.XPath(ANY_ROWS) if etree else None
+    _cells = etree.XPath(CELLS) if etree else None
+
+    @staticmethod
+    def available() -> bool:
+        return etree is not None
+
+    @classmethod
+    def trip(cls, texts: List[str]) -> Optional[Dict]:
+        """Поездка из текстов ячеек строки; None, если строка пустая"""
+        def col(index):
+            return texts[index] if index < len(texts) else "N/A"
+
+        trip = {name: col(index) for name, index in cls.COLUMNS.items()}
+        if any(v and v != "N/A" for v in trip.values()):
+            return trip
+        return None
+
+    @classmethod
+    def text(cls, element) -> str:
+        """Видимый текст элемента как у WebElement.text: блоки с новой строки, пробелы схлопнуты"""
+        if len(element) == 0:
+            return " ".join((element.text or "").split())
+        parts = []
+
+        def walk(node):
+            tag = node.tag if isinstance(node.tag, str) else None
+            if tag in cls.SKIP_TAGS:
+                return
+            if tag is not None:
+                block = tag in cls.BLOCK_TAGS
+                if block or tag == "br":
+                    parts.append("\n")
+                if node.text:
+                    parts.append(node.text)
+                for child in node:
+                    walk(child)
+                    if child.tail:
+                        parts.append(child.tail)
+                if block:
+                    parts.append("\n")
+
+        walk(element)
+        lines = (" ".join(line.split()) for line in "".join(parts).split("\n"))
+        return "\n".join(line for line in lines if line)
+
+    @classmethod
+    def parse(cls, html: str) -> List[Dict]:
+        """Поездки из HTML страницы движения по счёту"""
+        if not cls.available():
+            raise RuntimeError("Для разбора снимков требуется пакет lxml")
+        if not html or not html.strip():
+            return []
+        document = etree.fromstring(html, etree.HTMLParser())
+        if document is None:
+            return []
+        rows = cls._rows(document) or cls._any_rows(document)
+        wanted = set(cls.COLUMNS.values())
+        trips = []
+        for row in rows:
+            cells = cls._cells(row)
+            # Текст нужен только ячейкам из COLUMNS, остальные не обходятся
+            texts = [cls.text(cell) if index in wanted else "" for index, cell in enumerate(cells)]
+            trip = cls.trip(texts)
+            if trip is not None:
+                trips.append(trip)
+        return trips
+
+    @classmethod
+    def parse_file(cls, path: Path) -> List[Dict]:
+        return cls.parse(Path(path).read_text(encoding="utf-8"))
@@ -3,11 +3,14 @@ let prevBtnId = "prevBtnTransaction";
 let nextBtnId = "nextBtnTransaction";
 let showingTextId = "showingText";
 let apiUrl = "/transactions/info";
+// Только колонки, которые выводит таблица
+const listFields = "id_transaction,occurred_at,PVP_code,transponder,base_tariff,discount,paid";
 let refreshBtnId = "refreshBtn";
 let filterTriggerId = "sourceFilter";
 let currentPage = 1;
 const pageSize = 50;
 let totalItems = 0;
+let currentItems = [];
 let currentFilters = {};
 let scrapeFrom = null;
 let scrapeTo = null;
@@ -188,6 +191,7 @@ async function loadData(page = 1) {
         const params = new URLSearchParams({
             page: currentPage,
             page_size: pageSize,
+            fields: listFields,
             ...currentFilters
         });
 
@@ -197,7 +201,8 @@ async function loadData(page = 1) {
         const data = await response.json();
         totalItems = data.total || 0;
 
-        renderTable(data.items || [], formatDateTime);
+        currentItems = data.items || [];
+        renderTable(currentItems, formatDateTime);
         updatePagination();
         updateShowingText();
     } catch (err) {
@@ -232,6 +237,64 @@ function toggleDateRangeForm() {
     }
 }
 
+// Лента изменений: новые и удалённые транзакции вносятся в открытую таблицу без перезагрузки страницы
+let changeSource = null;
+
+// Попадает ли строка под текущие фильтры (даты сравниваются как ГГГГ-ММ-ДД)
+function matchesFilters(item) {
+    if (currentFilters.transponder && item.transponder !== currentFilters.transponder) return false;
+    const day = (item.occurred_at || "").slice(0, 10);
+    if (currentFilters.date_from && day < currentFilters.date_from) return false;
+    if (currentFilters.date_to && day > currentFilters.date_to) return false;
+    return true;
+}
+
+// Применяет порцию изменений к таблице, счётчику строк и карточкам статистики
+function applyChanges(changes) {
+    if (changes.reset) {
+        loadData(currentPage);
+        loadDashboardDataTransactions();
+        return;
+    }
+    const part = changes.transactions;
+    if (!part.upserted.length && !part.deleted.length) return;
+
+    const deleted = new Set(part.deleted.map(d => d.id));
+    totalItems -= part.deleted.filter(matchesFilters).length;
+    let items = currentItems.filter(t => !deleted.has(t.id_transaction));
+
+    const upserted = part.upserted.filter(matchesFilters);
+    totalItems += upserted.length;
+    // Новые строки встают в таблицу только на первой странице: остальные страницы при вставке сдвигаются
+    if (currentPage === 1 && upserted.length) {
+        items = items.concat(upserted).sort((a, b) => (b.occurred_at || "").localeCompare(a.occurred_at || ""));
+        items = items.slice(0, pageSize);
+    }
+    if (items.length < Math.min(pageSize, totalItems - (currentPage - 1) * pageSize)) {
+        // После удалений страница опустела сильнее, чем можно дополнить на месте
+        loadData(currentPage);
+    } else {
+        currentItems = items;
+        renderTable(currentItems, formatDateTime);
+        updatePagination();
+        updateShowingText();
+    }
+    loadDashboardDataTransactions();
+}
+
+// Подписывается на SSE-поток изменений начиная с текущего номера
+async function subscribeChanges() {
+    if (!window.EventSource || changeSource) return;
+    try {
+        const response = await fetch('/changes');
+        const data = await response.json();
+        changeSource = new EventSource(`/changes/stream?since=${data.seq}`);
+        changeSource.onmessage = event => applyChanges(JSON.parse(event.data));
+    } catch (err) {
+        console.error("Ошибка подписки на изменения:", err);
+    }
+}
+
 // Инициализирует страницу транзакций
 function init() {
     if (!document.getElementById(tableId)) return;
@@ -353,6 +416,56 @@ async function uploadFile(file) {
     }
 }
 
+async function uploadFiles(files) {
+    const formData = new FormData();
+    for (const file of files) {
+        formData.append('files', file);
+    }
+    try {
+        isScraping = true;
+        const progressBar = document.getElementById("scrapeProgress");
+        progressBar.style.width = "0%";
+        updateProgress();
+
+        const response = await fetch('/transactions/import-batch', {
+            method: 'POST',
+            body: formData
+        })
+        if (!response.ok) {
+            const text = await response.text();
+            console.error("Server error:", response.status, text);
+            throw new Error(`Ошибка загрузки файлов: ${response.status}`);
+        }
+
+        const data = await response.json();
+        const failed = data.files.filter(f => f.error);
+        if (failed.length) {
+            alert("Не удалось загрузить:\n" + failed.map(f => `${f.file}: ${f.error}`).join("\n"));
+        }
+
+        loadData(1);
+        loadDashboardDataTransactions();
+        isScraping = false;
+    } catch(err) {
+        console.error('Ошибка:', err)
+    }
+}
+
+function scrapeFiles() {
+    const input = document.createElement('input');
+    input.type = 'file';
+    input.multiple = true;
+    input.accept = '.csv,.xlsx,.xls,.pdf,.zip';
+
+    input.onchange = function(event) {
+        const files = Array.from(event.target.files);
+        if (!files.length) return;
+        uploadFiles(files);
+    };
+
+    input.click();
+}
+
 function scrapeFile(fileType = null) {
     const input = document.createElement('input');
     input.type = 'file';
@@ -384,6 +497,7 @@ function scrapeFile(fileType = null) {
 }
 
 window.scrapeFile = scrapeFile;
+window.scrapeFiles = scrapeFiles;
 window.scrapeDay = scrapeDay;
 window.scrapeWeek = scrapeWeek;
 window.scrapeMonth = scrapeMonth;
@@ -396,4 +510,5 @@ document.addEventListener("DOMContentLoaded", () => {
     init();
     loadDashboardDataTransactions();
     loadTransponders();
+    subscribeChanges();
 });
\ No newline at end of file
@@ -4,6 +4,8 @@ let prevBtnId = "prevBtnViolation";
 let nextBtnId = "nextBtnViolation";
 let showingTextId = "showingText";
 let apiUrl = "/violations/info";
+// Только колонки, которые выводит таблица
+const listFields = "id_violation,occurred_at,PVP_code,transponder,base_tariff,discount,paid";
 let refreshBtnId = "refreshBtn";
 let filterTriggerId = "sourceFilter";
 
@@ -11,6 +13,7 @@ let filterTriggerId = "sourceFilter";
 let currentPage = 1;
 const pageSize = 50;
 let totalItems = 0;
+let currentItems = [];
 let currentFilters = {};
 
 // Загружает статистику транзакций для дашборда
@@ -162,6 +165,7 @@ async function loadData(page = 1){
         const params = new URLSearchParams({
             page: currentPage,
             page_size: pageSize,
+            fields: listFields,
             ...currentFilters
         });
 
@@ -171,7 +175,8 @@ async function loadData(page = 1){
         const data = await response.json();
         totalItems = data.total || 0;
 
-        renderTable(data.items || [], formatDateTime);
+        currentItems = data.items || [];
+        renderTable(currentItems, formatDateTime);
         updatePagination();
         updateShowingText();
     } catch (err) {
@@ -187,6 +192,64 @@ function applyFilters() {
     loadData(1);
 }
 
+// Лента изменений: новые и удалённые нарушения вносятся в открытую таблицу без перезагрузки страницы
+let changeSource = null;
+
+// Попадает ли строка под текущие фильтры (даты сравниваются как ГГГГ-ММ-ДД)
+function matchesFilters(item) {
+    if (currentFilters.transponder && item.transponder !== currentFilters.transponder) return false;
+    const day = (item.occurred_at || "").slice(0, 10);
+    if (currentFilters.date_from && day < currentFilters.date_from) return false;
+    if (currentFilters.date_to && day > currentFilters.date_to) return false;
+    return true;
+}
+
+// Применяет порцию изменений к таблице, счётчику строк и карточкам статистики
+function applyChanges(changes) {
+    if (changes.reset) {
+        loadData(currentPage);
+        loadDashboardDataViolations();
+        return;
+    }
+    const part = changes.violations;
+    if (!part.upserted.length && !part.deleted.length) return;
+
+    const deleted = new Set(part.deleted.map(d => d.id));
+    totalItems -= part.deleted.filter(matchesFilters).length;
+    let items = currentItems.filter(t => !deleted.has(t.id_violation));
+
+    const upserted = part.upserted.filter(matchesFilters);
+    totalItems += upserted.length;
+    // Новые строки встают в таблицу только на первой странице: остальные страницы при вставке сдвигаются
+    if (currentPage === 1 && upserted.length) {
+        items = items.concat(upserted).sort((a, b) => (b.occurred_at || "").localeCompare(a.occurred_at || ""));
+        items = items.slice(0, pageSize);
+    }
+    if (items.length < Math.min(pageSize, totalItems - (currentPage - 1) * pageSize)) {
+        // После удалений страница опустела сильнее, чем можно дополнить на месте
+        loadData(currentPage);
+    } else {
+        currentItems = items;
+        renderTable(currentItems, formatDateTime);
+        updatePagination();
+        updateShowingText();
+    }
+    loadDashboardDataViolations();
+}
+
+// Подписывается на SSE-поток изменений начиная с текущего номера
+async function subscribeChanges() {
+    if (!window.EventSource || changeSource) return;
+    try {
+        const response = await fetch('/changes');
+        const data = await response.json();
+        changeSource = new EventSource(`/changes/stream?since=${data.seq}`);
+        changeSource.onmessage = event => applyChanges(JSON.parse(event.data));
+    } catch (err) {
+        console.error("Ошибка подписки на изменения:", err);
+    }
+}
+
 // Инициализирует страницу транзакций
 function init() {
     if (!document.getElementById(tableId)) return;
@@ -219,4 +282,5 @@ document.addEventListener("DOMContentLoaded", () => {
     init();
     loadDashboardDataViolations();
     loadTransponders();
+    subscribeChanges();
 });
\ No newline at end of file
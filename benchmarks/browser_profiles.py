@@ -0,0 +1,67 @@
+"""
+Сравнение профилей браузера: время загрузки страниц, объём загруженного и память Chrome.
+
+    python -m benchmarks.browser_profiles https://lk.avtodor-tr.ru/ --repeat 5
+
+Без адресов открывается страница входа LOGIN_URL. Нужны Chrome и psutil.
+"""
+import argparse
+import statistics
+import time
+from typing import Dict, List
+from app.services.web_scraper.browser_manager import BrowserManager
+from app.config import settings
+
+RESOURCES_SCRIPT = """
+return performance.getEntriesByType('resource').reduce(
+    (total, entry) => [total[0] + 1, total[1] + (entry.transferSize || 0)], [0, 0]
+);
+"""
+
+
+def run_profile(profile: str, urls: List[str], repeat: int) -> Dict:
+    browser = BrowserManager()
+    started = time.perf_counter()
+    browser.init(headless=True, profile=profile)
+    startup = time.perf_counter() - started
+    loads, requests, transferred, memory = [], [], [], []
+    try:
+        for _ in range(repeat):
+            for url in urls:
+                started = time.perf_counter()
+                browser.get(url)
+                loads.append(time.perf_counter() - started)
+                count, size = browser.execute_script(RESOURCES_SCRIPT)
+                requests.append(count)
+                transferred.append(size)
+                memory.append(browser.rss_mb() or 0)
+    finally:
+        browser.close()
+    return {
+        "profile": profile,
+        "startup_s": round(startup, 2),
+        "load_median_s": round(statistics.median(loads), 3),
+        "load_max_s": round(max(loads), 3),
+        "requests": round(statistics.mean(requests), 1),
+        "transferred_kb": round(statistics.mean(transferred) / 1024, 1),
+        "rss_peak_mb": max(memory),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("urls", nargs="*")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--profiles", nargs="+", default=[BrowserManager.FULL, BrowserManager.LEAN])
+    args = parser.parse_args()
+    urls = args.urls or [settings.LOGIN_URL]
+
+    results = [run_profile(profile, urls, args.repeat) for profile in args.profiles]
+    columns = list(results[0])
+    print("\t".join(columns))
+    for result in results:
+        print("\t".join(str(result[column]) for column in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Локальная замена личного кабинета Т-Pass для прогонов скрапинга без сети.
+
+    python -m benchmarks.mock_cabinet --trips 20000 --days 90 --port 8800
+
+Повторяет то, на что опирается скрапер: форму входа, блок баланса на /account и таблицу el-table
+на /account/movement с полями дат, календарём с кнопкой OK и подгрузкой строк при прокрутке.
+Приложение запускается с LOGIN_URL=http://127.0.0.1:8800/auth/login и CABINET_URL=http://127.0.0.1:8800.
+"""
+import argparse
+import asyncio
+import secrets
+from datetime import date, datetime, timedelta
+from html import escape
+from typing import Dict, List, Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, RedirectResponse
+from benchmarks.synthetic import synthetic_trips, row_html, table_html, format_amount
+
+LOGIN_PAGE = """<html><head><meta charset="utf-8"><title>Вход</title></head><body>
+<form method="post" action="/auth/login" class="login-form">
+  <div class="error">{error}</div>
+  <input id="username" name="username" type="text" placeholder="Логин">
+  <input id="password" name="password" type="password" placeholder="Пароль">
+  <button type="submit">Войти</button>
+</form></body></html>"""
+
+ACCOUNT_PAGE = """<html><head><meta charset="utf-8"><title>Личный кабинет</title></head><body>
+<div id="app"><div class="account">Баланс: <div class="green">{balance}</div>
+<a href="/account/movement">Движение по счёту</a></div></div></body></html>"""
+
+MOVEMENT_PAGE = """<html><head><meta charset="utf-8"><title>Движение по счёту</title>
+<style>.el-table {{ height: 600px; overflow-y: auto; }} td {{ height: 40px; }}</style></head><body>
+<div id="app"><div class="movement">
+  <div class="el-form-item"><label>Дата с</label><div class="el-date-editor"><input class="el-input__inner" value="{date_from}"></div></div>
+  <div class="el-form-item"><label>Дата по</label><div class="el-date-editor"><input class="el-input__inner" value="{date_to}"></div></div>
+  <div class="el-picker-panel el-date-picker" style="display: none"><button type="button" class="el-button"><span>OK</span></button></div>
+  {table}
+</div></div>
+<script>
+const PAGE_SIZE = {page_size};
+const table = document.querySelector(".el-table");
+const tbody = table.querySelector(".el-table__body-wrapper tbody");
+const inputs = document.querySelectorAll(".el-date-editor input");
+const picker = document.querySelector(".el-date-picker");
+let offset = 0, loading = false, finished = false, generation = 0;
+
+async function more() {{
+  if (loading || finished) return;
+  loading = true;
+  const current = generation;
+  const params = new URLSearchParams({{
+    date_from: inputs[0].value, date_to: inputs[1].value, offset: offset, limit: PAGE_SIZE,
+  }});
+  const html = await (await fetch("/account/movement/rows?" + params)).text();
+  if (current !== generation) return;
+  tbody.insertAdjacentHTML("beforeend", html);
+  const added = (html.match(/<tr/g) || []).length;
+  offset += added;
+  finished = added < PAGE_SIZE;
+  loading = false;
+}}
+
+function reload() {{
+  generation += 1;
+  offset = 0;
+  loading = false;
+  finished = false;
+  tbody.innerHTML = "";
+  more();
+}}
+
+table.addEventListener("scroll", () => {{
+  if (table.scrollTop + table.clientHeight >= table.scrollHeight - 100) more();
+}});
+inputs.forEach((input) => {{
+  input.addEventListener("focus", () => {{ picker.style.display = "block"; }});
+  input.addEventListener("change", reload);
+  input.addEventListener("keydown", (event) => {{ if (event.key === "Enter") reload(); }});
+}});
+picker.querySelector("button").addEventListener("click", () => {{
+  picker.style.display = "none";
+  reload();
+}});
+more();
+</script></body></html>"""
+
+
+def _parse_day(value: str) -> Optional[date]:
+    try:
+        return datetime.strptime(value.strip(), "%d.%m.%Y").date()
+    except ValueError:
+        return None
+
+
+def create_app(
+        trips: List[Dict],
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        balance: float = 12345.67,
+        page_size: int = 50,
+        latency_ms: int = 0,
+) -> FastAPI:
+    """Кабинет над готовым списком поездок; без username и password принимается любой непустой вход"""
+    app = FastAPI(title="Mock T-Pass cabinet")
+    sessions = set()
+    last_day = max((trip["occurred_at"].date() for trip in trips), default=date.today())
+
+    def authorized(request: Request) -> bool:
+        return request.cookies.get("session") in sessions
+
+    @app.get("/auth/login")
+    async def login_form(error: str = ""):
+        return HTMLResponse(LOGIN_PAGE.format(error=escape(error)))
+
+    @app.post("/auth/login")
+    async def login(request: Request):
+        form = await request.form()
+        login_ok = form.get("username") and form.get("password")
+        if username is not None or password is not None:
+            login_ok = form.get("username") == username and form.get("password") == password
+        if not login_ok:
+            return RedirectResponse("/auth/login?error=Неверный логин или пароль", status_code=303)
+        token = secrets.token_hex(16)
+        sessions.add(token)
+        response = RedirectResponse("/account", status_code=303)
+        response.set_cookie("session", token)
+        return response
+
+    @app.get("/account")
+    async def account(request: Request):
+        if not authorized(request):
+            return RedirectResponse("/auth/login", status_code=303)
+        return HTMLResponse(ACCOUNT_PAGE.format(balance=format_amount(balance)))
+
+    @app.get("/account/movement")
+    async def movement(request: Request):
+        if not authorized(request):
+            return RedirectResponse("/auth/login", status_code=303)
+        return HTMLResponse(MOVEMENT_PAGE.format(
+            date_from=(last_day - timedelta(days=6)).strftime("%d.%m.%Y"),
+            date_to=last_day.strftime("%d.%m.%Y"),
+            table=table_html([]),
+            page_size=page_size,
+        ))
+
+    @app.get("/account/movement/rows")
+    async def movement_rows(request: Request, date_from: str, date_to: str, offset: int = 0, limit: int = 50):
+        if not authorized(request):
+            return HTMLResponse("", status_code=401)
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        start, end = _parse_day(date_from), _parse_day(date_to)
+        if start is None or end is None:
+            return HTMLResponse("")
+        selected = [trip for trip in trips if start <= trip["occurred_at"].date() <= end]
+        page = selected[offset:offset + limit]
+        return HTMLResponse("\n".join(row_html(offset + number + 1, trip) for number, trip in enumerate(page)))
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--trips", type=int, default=5000, help="количество синтетических поездок")
+    parser.add_argument("--days", type=int, default=30, help="поездки распределяются по последним N дням")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--page-size", type=int, default=50, help="строк на одну подгрузку при прокрутке")
+    parser.add_argument("--latency", type=int, default=0, help="задержка подгрузки строк, мс")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+
+
+def build_app(args) -> FastAPI:
+    date_to = date.today() - timedelta(days=1)
+    date_from = date_to - timedelta(days=args.days - 1)
+    trips = synthetic_trips(args.trips, date_from, date_to, seed=args.seed)
+    return create_app(
+        trips, args.username, args.password, page_size=args.page_size, latency_ms=args.latency,
+    )
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    args = parser.parse_args()
+    print(f"LOGIN_URL=http://{args.host}:{args.port}/auth/login CABINET_URL=http://{args.host}:{args.port}")
+    uvicorn.run(build_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
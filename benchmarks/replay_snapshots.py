@@ -0,0 +1,92 @@
+"""
+Прогон разбора страницы движения по сохранённым снимкам.
+
+    python -m benchmarks.replay_snapshots data/snapshots
+    python -m benchmarks.replay_snapshots /tmp/corpus --generate 5 --rows 3000 --selenium
+
+Снимки пишет скрапер при заданном SCRAPE_CAPTURE_DIR. --generate создаёт синтетический корпус,
+--selenium дополнительно открывает каждый снимок в браузере и сравнивает с обходом элементов WebDriver.
+"""
+import argparse
+import time
+from datetime import date
+from pathlib import Path
+from typing import List
+from app.services.avtodor_data import AvtodorData
+from app.services.web_scraper.snapshot_parser import SnapshotParser
+from benchmarks.synthetic import synthetic_trips, movement_html
+
+
+def generate(folder: Path, files: int, rows: int):
+    folder.mkdir(parents=True, exist_ok=True)
+    for number in range(files):
+        trips = synthetic_trips(rows, date(2025, 1, 1), date(2025, 3, 31), seed=number)
+        (folder / f"synthetic_{number:03d}_{rows}.html").write_text(movement_html(trips), encoding="utf-8")
+
+
+def timed(fn, *args, repeat: int = 1):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def selenium_extract(paths: List[Path]):
+    from app.services.web_scraper.browser_manager import BrowserManager
+    from app.services.web_scraper.avtodor_scraper import AvtodorScraper
+
+    browser = BrowserManager()
+    browser.init(headless=True, profile=BrowserManager.LEAN)
+    scraper = AvtodorScraper(browser, auth=None)
+    try:
+        for path in paths:
+            browser.get(path.resolve().as_uri())
+            yield path, timed(scraper.extract_rows)
+    finally:
+        browser.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("corpus", type=Path)
+    parser.add_argument("--generate", type=int, default=0, metavar="FILES")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--selenium", action="store_true")
+    args = parser.parse_args()
+
+    if args.generate:
+        generate(args.corpus, args.generate, args.rows)
+    paths = sorted(args.corpus.glob("*.html"))
+    if not paths:
+        parser.error(f"в {args.corpus} нет снимков *.html")
+
+    parsed = {}
+    total_rows = total_time = unparsed = 0
+    print("file\trows\tlxml_ms\trows_per_s")
+    for path in paths:
+        html = path.read_text(encoding="utf-8")
+        elapsed, trips = timed(SnapshotParser.parse, html, repeat=args.repeat)
+        parsed[path] = trips
+        total_rows += len(trips)
+        total_time += elapsed
+        # Строки, которые не разобрал бы и AvtodorData: без даты транзакция не сохранится
+        unparsed += sum(AvtodorData.parse_trip_data(trip)["occurred_at"] is None for trip in trips)
+        print(f"{path.name}\t{len(trips)}\t{elapsed * 1000:.1f}\t{len(trips) / elapsed:.0f}")
+    print(f"total\t{total_rows}\t{total_time * 1000:.1f}\t{total_rows / total_time:.0f}\tno_date={unparsed}")
+
+    if args.selenium:
+        selenium_time = 0
+        print("file\tselenium_ms\tspeedup\tsame_rows")
+        for path, (elapsed, trips) in selenium_extract(paths):
+            selenium_time += elapsed
+            lxml_time, _ = timed(SnapshotParser.parse, path.read_text(encoding="utf-8"))
+            print(f"{path.name}\t{elapsed * 1000:.1f}\t{elapsed / lxml_time:.0f}x\t{trips == parsed[path]}")
+        print(f"total\t{selenium_time * 1000:.1f}\t{selenium_time / total_time:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
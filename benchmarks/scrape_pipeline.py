@@ -0,0 +1,101 @@
+"""
+Сквозной прогон скрапинга против локального кабинета: вход, обход дней, разбор, запись в БД и пересчёты.
+
+    python -m benchmarks.scrape_pipeline --trips 20000 --days 30 --profile lean
+
+Кабинет поднимается в этом же процессе, приложение работает с временной базой SQLite.
+Нужны Chrome и uvicorn.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from benchmarks.mock_cabinet import add_arguments, build_app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_cabinet(app, port: int):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def run(date_from: date, date_to: date):
+    # Настройки читаются при импорте, поэтому приложение импортируется после подмены окружения
+    from sqlmodel import select, func
+    from app.database import init_db, async_session_maker
+    from app.models.transaction import Transaction
+    from app.services.db_writer import db_writer
+    from app.services.avtodor_manager import avtodor_manager
+    from app.services.web_scraper.avtodor_session import avtodor_session
+
+    await init_db()
+    db_writer.start()
+    try:
+        started = time.perf_counter()
+        if not await avtodor_session.call(avtodor_session.ensure_authenticated):
+            raise RuntimeError("Не удалось войти в локальный кабинет")
+        login = time.perf_counter() - started
+
+        started = time.perf_counter()
+        result = await avtodor_manager.sync_transactions(
+            datetime.combine(date_from, datetime.min.time()), datetime.combine(date_to, datetime.min.time())
+        )
+        scrape = time.perf_counter() - started
+
+        async with async_session_maker() as session:
+            stored = (await session.execute(select(func.count()).select_from(Transaction))).scalar()
+        stats = avtodor_session.browser.stats()
+    finally:
+        await avtodor_session.call(avtodor_session.close)
+        avtodor_session.browser.worker.stop()
+        await db_writer.stop()
+
+    days = (date_to - date_from).days + 1
+    print(f"profile\t{stats['profile']}")
+    print(f"login_s\t{login:.2f}")
+    print(f"scrape_s\t{scrape:.2f}\t({scrape / days:.2f} s/day)")
+    print(f"scraped\t{result['scraped_count']}\t({result['scraped_count'] / scrape:.0f} trips/s)")
+    print(f"saved\t{result['saved_count']}\tstored={stored}")
+    print(f"navigations\t{stats['navigations']}\trecycles={stats['recycles']}\trss_mb={stats['rss_mb']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument("--profile", default="lean", choices=["lean", "full"])
+    parser.add_argument("--database", help="файл SQLite, по умолчанию временный")
+    args = parser.parse_args()
+
+    port = free_port()
+    start_cabinet(build_app(args), port)
+    database = args.database or os.path.join(tempfile.mkdtemp(), "pipeline.db")
+    os.environ.update({
+        "LOGIN_URL": f"http://127.0.0.1:{port}/auth/login",
+        "CABINET_URL": f"http://127.0.0.1:{port}",
+        "AVTODOR_USERNAME": args.username or "benchmark",
+        "AVTODOR_PASSWORD": args.password or "benchmark",
+        "DATABASE_URL": f"sqlite+aiosqlite:///{database}",
+        "BROWSER_PROFILE": args.profile,
+        "DEBUG": "false",
+    })
+
+    date_to = date.today() - timedelta(days=1)
+    asyncio.run(run(date_to - timedelta(days=args.days - 1), date_to))
+
+
+if __name__ == "__main__":
+    main()
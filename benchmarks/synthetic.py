@@ -0,0 +1,95 @@
+"""
+Синтетические поездки и страница движения по счёту в разметке el-table личного кабинета.
+"""
+import random
+from datetime import date, datetime, timedelta
+from html import escape
+from typing import Dict, List
+
+MONTHS = [
+    "января", "февраля", "марта", "апреля", "мая", "июня",
+    "июля", "августа", "сентября", "октября", "ноября", "декабря",
+]
+
+PVPS = [
+    "М4-1046км-Мск", "М4-620-Рос", "М4-636-Вор", "М4-1184-Крс", "М11-58-Сол",
+    "М11-97-Кли", "М11-147-Кон", "М11-208-Твр", "М3-124-Мал", "М1-33-Одн",
+]
+
+TRANSPONDERS = [f"30865950000065{number:05d}" for number in range(5200, 5240)]
+
+
+def format_date(value: datetime) -> str:
+    return f"{value.day} {MONTHS[value.month - 1]} {value.year} {value:%H:%M}"
+
+
+def format_amount(value: float) -> str:
+    return f"{value:,.2f}".replace(",", " ").replace(".", ",") + " ₽"
+
+
+def synthetic_trips(count: int, date_from: date, date_to: date, seed: int = 0) -> List[Dict]:
+    """Поездки, равномерно разбросанные по дням диапазона; новые сначала, как в кабинете"""
+    rng = random.Random(seed)
+    span = max(1, int((datetime.combine(date_to, datetime.max.time())
+                       - datetime.combine(date_from, datetime.min.time())).total_seconds() // 60))
+    trips = []
+    for _ in range(count):
+        occurred_at = datetime.combine(date_from, datetime.min.time()) + timedelta(minutes=rng.randrange(span))
+        vehicle_class = rng.choice([1, 1, 1, 2, 3, 4])
+        amount = rng.choice([150, 230, 310, 480, 620, 900]) * vehicle_class
+        discount = rng.choice([0, 0, 0, 10, 20, 35])
+        trips.append({
+            "occurred_at": occurred_at,
+            "pvp": rng.choice(PVPS),
+            "vehicle_class": vehicle_class,
+            "transponder": rng.choice(TRANSPONDERS),
+            "amount": amount,
+            "discount": discount,
+            "paid": round(amount * (1 - discount / 100), 2),
+        })
+    trips.sort(key=lambda trip: trip["occurred_at"], reverse=True)
+    return trips
+
+
+def _cell(index: int, content: str) -> str:
+    return f'<td class="el-table_1_column_{index} is-left"><div class="cell">{content}</div></td>'
+
+
+def row_html(number: int, trip: Dict) -> str:
+    """Строка таблицы: № | ПВП и класс | транспондер | дата | тариф | скидка | оплачено"""
+    cells = [
+        _cell(1, str(number)),
+        _cell(2, f'<div>{escape(trip["pvp"])}</div><div>{trip["vehicle_class"]}</div>'),
+        _cell(3, escape(trip["transponder"])),
+        _cell(4, format_date(trip["occurred_at"])),
+        _cell(5, format_amount(trip["amount"])),
+        _cell(6, f'{trip["discount"]} %'),
+        _cell(7, format_amount(trip["paid"])),
+    ]
+    return f'<tr class="el-table__row">{"".join(cells)}</tr>'
+
+
+def table_html(trips: List[Dict], offset: int = 0) -> str:
+    rows = "\n".join(row_html(offset + number + 1, trip) for number, trip in enumerate(trips))
+    header = "".join(
+        f"<th><div class=\"cell\">{title}</div></th>"
+        for title in ("№", "ПВП", "Транспондер", "Дата", "Тариф", "Скидка", "Оплачено")
+    )
+    return (
+        '<div class="el-table el-table--fit el-table--enable-row-hover el-table--enable-row-transition">'
+        f'<div class="el-table__header-wrapper"><table><thead><tr>{header}</tr></thead></table></div>'
+        f'<div class="el-table__body-wrapper"><table class="el-table__body"><tbody>\n{rows}\n</tbody></table></div>'
+        "</div>"
+    )
+
+
+def movement_html(trips: List[Dict]) -> str:
+    """Отрисованная страница движения по счёту со всеми строками, как её сохраняет режим захвата"""
+    return (
+        '<html><head><meta charset="utf-8"><title>Движение по счёту</title></head><body>'
+        '<div id="app"><div class="movement">'
+        '<label>Дата с</label><div><input class="el-input__inner"></div>'
+        '<label>Дата по</label><div><input class="el-input__inner"></div>'
+        f"{table_html(trips)}"
+        "</div></div></body></html>"
+    )
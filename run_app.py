@@ -4,6 +4,7 @@ import webbrowser
 import time
 from tkinter import Tk, filedialog
 import threading
+import multiprocessing
 import uvicorn
 from pathlib import Path
 
@@ -74,4 +75,5 @@ def main():
         time.sleep(1)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file